@@ -0,0 +1,85 @@
+"""Сериализация строк .values() для JSON API.
+
+Представления выбирают из базы только колонки запрошенных полей (?fields=)
+и связей (?expand=), а ответ собирается из словарей, без создания
+экземпляров моделей.
+"""
+from django.core.files.storage import default_storage
+
+
+class FieldsError(ValueError):
+    """Запрошено поле или связь, которых у ресурса нет."""
+
+
+def split(param):
+    return [name for name in (param or "").split(",") if name]
+
+
+def image_url(name):
+    return default_storage.url(name) if name else None
+
+
+class Relation:
+    """Связь: по умолчанию её id, с ?expand= — вложенный объект.
+
+    fields — имена полей вложенного объекта и их колонки; колонка поля id
+    должна быть внешним ключом, чтобы id связи читался без JOIN.
+    """
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.column = fields["id"]
+
+
+class RowSerializer:
+    def __init__(self, fields, relations=None, transforms=None,
+                 required=("id",)):
+        self.fields = fields
+        self.relations = relations or {}
+        self.transforms = transforms or {}
+        self.required = required
+
+    def parse(self, fields_param=None, expand_param=None):
+        """Поля и раскрываемые связи из параметров запроса."""
+        fields = split(fields_param) or [*self.fields, *self.relations]
+        unknown = [
+            name for name in fields
+            if name not in self.fields and name not in self.relations
+        ]
+        if unknown:
+            raise FieldsError(f"Неизвестные поля: {', '.join(unknown)}")
+        expand = split(expand_param)
+        unknown = [name for name in expand if name not in self.relations]
+        if unknown:
+            raise FieldsError(f"Нельзя раскрыть: {', '.join(unknown)}")
+        return fields, expand
+
+    def columns(self, fields, expand):
+        """Колонки для .values(): только нужные ответу."""
+        columns = dict.fromkeys(self.required)
+        for name in fields:
+            if name in self.fields:
+                columns[self.fields[name]] = None
+            elif name in expand:
+                relation = self.relations[name]
+                columns.update(dict.fromkeys(relation.fields.values()))
+            else:
+                columns[self.relations[name].column] = None
+        return list(columns)
+
+    def serialize(self, row, fields, expand):
+        data = {}
+        for name in fields:
+            if name in self.fields:
+                value = row[self.fields[name]]
+                transform = self.transforms.get(name)
+                data[name] = transform(value) if transform else value
+                continue
+            relation = self.relations[name]
+            if name not in expand or row[relation.column] is None:
+                data[name] = row[relation.column]
+                continue
+            data[name] = {
+                key: row[column] for key, column in relation.fields.items()
+            }
+        return data
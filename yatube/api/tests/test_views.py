@@ -0,0 +1,192 @@
+from datetime import datetime, timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+AUTHOR = "api_author"
+READER = "api_reader"
+GROUP_SLUG = "api_group"
+POST_LIST_URL = reverse("api:v1:post_list")
+FOLLOW_URL = reverse("api:v1:follow_posts")
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username=AUTHOR, first_name="Лев", last_name="Толстой"
+        )
+        cls.reader = User.objects.create_user(username=READER)
+        cls.group = Group.objects.create(
+            title="Группа API", slug=GROUP_SLUG, description="Описание"
+        )
+        for number in range(13):
+            Post.objects.create(
+                text=f"Пост {number}",
+                author=cls.author,
+                group=cls.group if number % 2 else None,
+            )
+        start = datetime(2020, 1, 1)
+        for number, post in enumerate(Post.objects.order_by("pk")):
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=start + timedelta(days=number // 2)
+            )
+        cls.expected = list(
+            Post.objects.order_by("-pub_date", "-pk").values_list(
+                "pk", flat=True
+            )
+        )
+        cls.post = Post.objects.get(pk=cls.expected[0])
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text="Комментарий"
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_list_returns_ids_of_relations_by_default(self):
+        data = self.client.get(POST_LIST_URL).json()
+        first = data["results"][0]
+        self.assertEqual(first["id"], self.expected[0])
+        self.assertEqual(first["author"], self.author.pk)
+        self.assertEqual(
+            set(first),
+            {
+                "id", "text", "pub_date", "image", "image_width",
+                "image_height", "author", "group",
+            },
+        )
+
+    def test_comment_counts_are_not_served_stale(self):
+        post_url = reverse("api:v1:post_detail", args=(self.post.pk,))
+        profile_url = reverse("api:v1:profile_detail", args=(READER,))
+        self.assertEqual(self.client.get(post_url).json()["comment_count"], 1)
+        self.assertEqual(
+            self.client.get(profile_url).json()["comment_count"], 1
+        )
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text="Ещё комментарий"
+        )
+        self.assertEqual(self.client.get(post_url).json()["comment_count"], 2)
+        self.assertEqual(
+            self.client.get(profile_url).json()["comment_count"], 2
+        )
+        comment.delete()
+        self.assertEqual(
+            self.client.get(profile_url).json()["comment_count"], 1
+        )
+        Post.objects.get(pk=self.post.pk).delete()
+        self.assertEqual(
+            self.client.get(profile_url).json()["comment_count"], 0
+        )
+
+    def test_sparse_fields_and_expanded_relations(self):
+        data = self.client.get(
+            POST_LIST_URL, {"fields": "id,author,group", "expand": "author"}
+        ).json()
+        for item in data["results"]:
+            self.assertEqual(set(item), {"id", "author", "group"})
+            self.assertEqual(
+                item["author"],
+                {
+                    "id": self.author.pk,
+                    "username": AUTHOR,
+                    "first_name": "Лев",
+                    "last_name": "Толстой",
+                },
+            )
+        data = self.client.get(
+            POST_LIST_URL, {"fields": "group", "expand": "group"}
+        ).json()
+        groups = [item["group"] for item in data["results"]]
+        self.assertIn(None, groups)
+        self.assertIn(
+            {"id": self.group.pk, "slug": GROUP_SLUG, "title": "Группа API"},
+            groups,
+        )
+
+    def test_unknown_fields_are_rejected(self):
+        for params in ({"fields": "id,password"}, {"expand": "text"}):
+            with self.subTest(params=params):
+                response = self.client.get(POST_LIST_URL, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("error", response.json())
+
+    def test_cursor_walks_feed_in_order(self):
+        seen = []
+        params = {"limit": 5, "fields": "id"}
+        while True:
+            data = self.client.get(POST_LIST_URL, params).json()
+            seen.extend(item["id"] for item in data["results"])
+            if data["next_cursor"] is None:
+                break
+            params["cursor"] = data["next_cursor"]
+        self.assertEqual(seen, self.expected)
+
+    def test_list_is_one_query(self):
+        params = {"expand": "author,group"}
+        with self.assertNumQueries(1):
+            self.client.get(POST_LIST_URL, params)
+
+    def test_group_and_profile_endpoints(self):
+        url = reverse("api:v1:group_posts", args=(GROUP_SLUG,))
+        ids = [item["id"] for item in self.client.get(url).json()["results"]]
+        self.assertEqual(
+            ids,
+            [
+                pk for pk in self.expected
+                if Post.objects.get(pk=pk).group_id == self.group.pk
+            ],
+        )
+        data = self.client.get(
+            reverse("api:v1:group_detail", args=(GROUP_SLUG,))
+        ).json()
+        self.assertEqual(data["post_count"], 6)
+        data = self.client.get(
+            reverse("api:v1:profile_detail", args=(AUTHOR,))
+        ).json()
+        self.assertEqual(data["post_count"], 13)
+        url = reverse("api:v1:profile_posts", args=(READER,))
+        self.assertEqual(self.client.get(url).json()["results"], [])
+        url = reverse("api:v1:post_comments", args=(self.post.pk,))
+        data = self.client.get(url, {"expand": "author"}).json()
+        self.assertEqual(data["results"][0]["author"]["username"], READER)
+
+    def test_missing_objects_return_json_404(self):
+        for url in (
+            reverse("api:v1:post_detail", args=(0,)),
+            reverse("api:v1:group_posts", args=("missing",)),
+            reverse("api:v1:profile_detail", args=("missing",)),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json(), {"error": "Не найдено"})
+
+    def test_conditional_get(self):
+        url = reverse("api:v1:post_detail", args=(self.post.pk,))
+        response = self.client.get(url)
+        etag = response["ETag"]
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.get(pk=self.post.pk).save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_follow_feed_is_private(self):
+        self.assertEqual(self.client.get(FOLLOW_URL).status_code, 401)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.force_login(self.reader)
+        response = self.client.get(FOLLOW_URL, {"fields": "id"})
+        self.assertEqual(
+            [item["id"] for item in response.json()["results"]],
+            self.expected,
+        )
+        self.assertIn("private", response["Cache-Control"])
+        response = self.client.get(
+            FOLLOW_URL, {"fields": "id"}, HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(response.status_code, 304)
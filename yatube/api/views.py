@@ -0,0 +1,234 @@
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                set_response_etag)
+from django.views.decorators.http import require_safe
+
+from posts.cache import (author_stamps, cache_public_page, feed_stamps,
+                         group_stamps, post_stamps)
+from posts.models import Comment, Group, Post, User, UserCounters
+from posts.paginate_utils import CursorPaginator
+from posts.timeline import timeline_posts
+
+from .serializers import FieldsError, Relation, RowSerializer, image_url
+
+AUTHOR = Relation(
+    {
+        "id": "author_id",
+        "username": "author__username",
+        "first_name": "author__first_name",
+        "last_name": "author__last_name",
+    }
+)
+GROUP = Relation(
+    {"id": "group_id", "slug": "group__slug", "title": "group__title"}
+)
+POST_FIELDS = {
+    "id": "id",
+    "text": "text",
+    "pub_date": "pub_date",
+    "image": "image",
+    "image_width": "image_width",
+    "image_height": "image_height",
+}
+# Комментарий сбрасывает штамп поста, но не штампы лент, групп и авторов:
+# число комментариев отдают только пост и некэшируемая лента подписок.
+POSTS = RowSerializer(
+    fields=POST_FIELDS,
+    relations={"author": AUTHOR, "group": GROUP},
+    transforms={"image": image_url},
+    required=("id", "pub_date"),
+)
+COUNTED_POSTS = RowSerializer(
+    fields={**POST_FIELDS, "comment_count": "comment_count"},
+    relations={"author": AUTHOR, "group": GROUP},
+    transforms={"image": image_url},
+    required=("id", "pub_date"),
+)
+COMMENTS = RowSerializer(
+    fields={
+        "id": "id",
+        "post": "post_id",
+        "text": "text",
+        "pub_date": "pub_date",
+    },
+    relations={"author": AUTHOR},
+    required=("id", "pub_date"),
+)
+GROUPS = RowSerializer(
+    fields={
+        "id": "id",
+        "slug": "slug",
+        "title": "title",
+        "description": "description",
+        "post_count": "post_count",
+    },
+)
+PROFILES = RowSerializer(
+    fields={
+        "id": "id",
+        "username": "username",
+        "first_name": "first_name",
+        "last_name": "last_name",
+        "post_count": "counters__post_count",
+        "comment_count": "counters__comment_count",
+        "follower_count": "counters__follower_count",
+        "following_count": "counters__following_count",
+    },
+)
+
+
+def error(message, status):
+    return JsonResponse({"error": message}, status=status)
+
+
+def json_response(data):
+    return JsonResponse(data, json_dumps_params={"ensure_ascii": False})
+
+
+def page_size(request):
+    try:
+        limit = int(request.GET.get("limit", settings.API_PAGE_SIZE))
+    except ValueError:
+        return None
+    if limit < 1:
+        return None
+    return min(limit, settings.API_MAX_PAGE_SIZE)
+
+
+def page_response(request, queryset, serializer):
+    """Страница строк по курсору (pub_date, id), новые сначала."""
+    try:
+        fields, expand = serializer.parse(
+            request.GET.get("fields"), request.GET.get("expand")
+        )
+    except FieldsError as exception:
+        return error(str(exception), 400)
+    limit = page_size(request)
+    if limit is None:
+        return error("limit должен быть положительным числом", 400)
+    rows = queryset.values(*serializer.columns(fields, expand))
+    page = CursorPaginator(rows, limit).get_page(request.GET.get("cursor"))
+    return json_response(
+        {
+            "results": [
+                serializer.serialize(row, fields, expand) for row in page
+            ],
+            "next_cursor": page.next_cursor,
+            "previous_cursor": page.previous_cursor,
+        }
+    )
+
+
+def object_response(request, queryset, serializer):
+    try:
+        fields, expand = serializer.parse(
+            request.GET.get("fields"), request.GET.get("expand")
+        )
+    except FieldsError as exception:
+        return error(str(exception), 400)
+    row = queryset.values(*serializer.columns(fields, expand)).first()
+    if row is None:
+        return error("Не найдено", 404)
+    return json_response(serializer.serialize(row, fields, expand))
+
+
+@require_safe
+@cache_public_page(feed_stamps)
+def post_list(request):
+    return page_response(request, Post.objects.all(), POSTS)
+
+
+@require_safe
+@cache_public_page(post_stamps)
+def post_detail(request, post_id):
+    return object_response(
+        request, Post.objects.filter(pk=post_id), COUNTED_POSTS
+    )
+
+
+@require_safe
+@cache_public_page(post_stamps)
+def post_comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        return error("Не найдено", 404)
+    return page_response(
+        request, Comment.objects.filter(post_id=post_id), COMMENTS
+    )
+
+
+@require_safe
+@cache_public_page(feed_stamps)
+def group_list(request):
+    try:
+        fields, _ = GROUPS.parse(request.GET.get("fields"))
+    except FieldsError as exception:
+        return error(str(exception), 400)
+    rows = Group.objects.order_by("title").values(*GROUPS.columns(fields, ()))
+    return json_response(
+        {"results": [GROUPS.serialize(row, fields, ()) for row in rows]}
+    )
+
+
+@require_safe
+@cache_public_page(group_stamps)
+def group_detail(request, slug):
+    return object_response(request, Group.objects.filter(slug=slug), GROUPS)
+
+
+@require_safe
+@cache_public_page(group_stamps)
+def group_posts(request, slug):
+    group_id = (
+        Group.objects.filter(slug=slug).values_list("pk", flat=True).first()
+    )
+    if group_id is None:
+        return error("Не найдено", 404)
+    return page_response(
+        request, Post.objects.filter(group_id=group_id), POSTS
+    )
+
+
+@require_safe
+@cache_public_page(author_stamps)
+def profile_detail(request, username):
+    author = User.objects.filter(username=username).first()
+    if author is None:
+        return error("Не найдено", 404)
+    # Строку счётчиков заводит первый просмотр профиля.
+    UserCounters.for_user(author)
+    return object_response(
+        request, User.objects.filter(pk=author.pk), PROFILES
+    )
+
+
+@require_safe
+@cache_public_page(author_stamps)
+def profile_posts(request, username):
+    author_id = (
+        User.objects.filter(username=username)
+        .values_list("pk", flat=True)
+        .first()
+    )
+    if author_id is None:
+        return error("Не найдено", 404)
+    return page_response(
+        request, Post.objects.filter(author_id=author_id), POSTS
+    )
+
+
+@require_safe
+def follow_posts(request):
+    """Лента подписок: личная, поэтому ETag считается по содержимому."""
+    if not request.user.is_authenticated:
+        return error("Нужна авторизация", 401)
+    response = page_response(
+        request, timeline_posts(request.user), COUNTED_POSTS
+    )
+    patch_cache_control(response, private=True)
+    if response.status_code != 200:
+        return response
+    set_response_etag(response)
+    return get_conditional_response(
+        request, etag=response["ETag"], response=response
+    )
@@ -0,0 +1,279 @@
+"""Двухуровневый кэш: LRU в памяти процесса перед общим кэшем.
+
+Локальный уровень снимает сетевые и дисковые обращения к общему кэшу для
+горячих ключей. Чтобы процессы не отдавали устаревшие значения, каждая
+запись добавляет ключ в сообщение об инвалидации. Раз в SYNC_INTERVAL
+секунд и в конце запроса процесс публикует накопленное сообщение в общий
+кэш (счётчик последовательности и список ключей), дочитывает чужие
+сообщения и выбрасывает перечисленные ключи из памяти.
+Если сообщения потеряны (вытеснены или их слишком много), локальный
+уровень очищается целиком. LOCAL_TIMEOUT ограничивает срок жизни
+локальной копии даже при потерянном сообщении.
+
+Номер сообщения занимается через add() общего кэша, поэтому add() должен
+быть атомарным: файловый кэш для общего уровня не подходит.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+
+SEQUENCE_KEY = "two_tier:sequence"
+MESSAGE_KEY = "two_tier:message:{}"
+CLEAR = "__clear__"
+# Сколько номеров пробовать занять, прежде чем отправить очистку.
+CLAIM_ATTEMPTS = 10
+# Общие кэши, у которых add() — это проверка и запись по отдельности.
+NON_ATOMIC_BACKENDS = (
+    "django.core.cache.backends.filebased.FileBasedCache",
+)
+
+
+class TwoTierCache(BaseCache):
+    def __init__(self, server, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._shared_alias = options.get("SHARED", "shared")
+        backend = settings.CACHES.get(self._shared_alias, {}).get("BACKEND")
+        if backend in NON_ATOMIC_BACKENDS:
+            raise ImproperlyConfigured(
+                f"{backend} не подходит для общего уровня TwoTierCache: "
+                "его add() не атомарен"
+            )
+        self._max_entries = options.get("LOCAL_MAX_ENTRIES", 1000)
+        self._local_timeout = options.get("LOCAL_TIMEOUT", 5)
+        self._sync_interval = options.get("SYNC_INTERVAL", 0.5)
+        self._log_size = options.get("INVALIDATION_LOG_SIZE", 1000)
+        self._message_timeout = options.get("MESSAGE_TIMEOUT", 60)
+        self._local = OrderedDict()
+        self._lock = threading.RLock()
+        self._seen = None
+        self._own_messages = set()
+        self._unpublished = []
+        self._next_sync = 0
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    # Локальный уровень
+
+    def _local_get(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return False, None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._local[key]
+                return False, None
+            self._local.move_to_end(key)
+            return True, value
+
+    def _local_set(self, key, value):
+        with self._lock:
+            self._local[key] = (value, time.monotonic() + self._local_timeout)
+            self._local.move_to_end(key)
+            while len(self._local) > self._max_entries:
+                self._local.popitem(last=False)
+
+    def _local_delete(self, keys):
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+
+    # Сообщения об инвалидации
+
+    def _sequence(self):
+        return self.shared.get(SEQUENCE_KEY, 0)
+
+    def _publish(self, keys):
+        with self._lock:
+            self._unpublished.extend(keys)
+
+    def _flush(self):
+        with self._lock:
+            keys, self._unpublished = self._unpublished, []
+        if not keys:
+            return
+        sequence = self._claim(list(keys))
+        with self._lock:
+            self._own_messages.add(sequence)
+
+    def _claim(self, keys):
+        """Пишет сообщение под свободным номером и возвращает номер.
+
+        incr атомарен не везде (у кэша в базе это чтение и запись), и два
+        процесса могут получить один номер. Номер занимает add(): он не
+        перезаписывает чужое сообщение, а при занятом номере счётчик
+        сдвигается снова. Если занять номер не удалось, под последним
+        записывается очистка: она покрывает и чужие, и свои ключи.
+        """
+        for _ in range(CLAIM_ATTEMPTS):
+            try:
+                sequence = self.shared.incr(SEQUENCE_KEY)
+            except ValueError:
+                self.shared.add(SEQUENCE_KEY, 0, timeout=None)
+                sequence = self.shared.incr(SEQUENCE_KEY)
+            if self.shared.add(
+                MESSAGE_KEY.format(sequence), keys, self._message_timeout
+            ):
+                return sequence
+        self.shared.set(
+            MESSAGE_KEY.format(sequence), [CLEAR], self._message_timeout
+        )
+        return sequence
+
+    def _sync(self):
+        now = time.monotonic()
+        if now < self._next_sync:
+            return
+        self._next_sync = now + self._sync_interval
+        self._flush()
+        latest = self._sequence()
+        with self._lock:
+            if self._seen is None:
+                self._seen = latest
+                return
+            if latest < self._seen:
+                # Общий кэш очищен или перезапущен: счётчик начался заново.
+                self._seen = latest
+                self._local.clear()
+                return
+            if latest == self._seen:
+                return
+            pending = [
+                sequence
+                for sequence in range(self._seen + 1, latest + 1)
+                if sequence not in self._own_messages
+            ]
+            self._own_messages = {
+                sequence
+                for sequence in self._own_messages
+                if sequence > latest
+            }
+            self._seen = latest
+        if len(pending) > self._log_size:
+            self._local_clear()
+            return
+        messages = self.shared.get_many(
+            [MESSAGE_KEY.format(sequence) for sequence in pending]
+        )
+        if len(messages) < len(pending):
+            self._local_clear()
+            return
+        for keys in messages.values():
+            if CLEAR in keys:
+                self._local_clear()
+                return
+            self._local_delete(keys)
+
+    def _local_clear(self):
+        with self._lock:
+            self._local.clear()
+
+    # API кэша Django
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version)
+        if added:
+            full_key = self.make_key(key, version)
+            self._local_set(full_key, value)
+            self._publish([full_key])
+        return added
+
+    def get(self, key, default=None, version=None):
+        self._sync()
+        full_key = self.make_key(key, version)
+        found, value = self._local_get(full_key)
+        if found:
+            return value
+        value = self.shared.get(key, self, version)
+        if value is self:
+            return default
+        self._local_set(full_key, value)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version)
+        full_key = self.make_key(key, version)
+        self._local_set(full_key, value)
+        self._publish([full_key])
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self.shared.delete(key, version)
+        full_key = self.make_key(key, version)
+        self._local_delete([full_key])
+        self._publish([full_key])
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        result = {}
+        missing = []
+        for key in keys:
+            found, value = self._local_get(self.make_key(key, version))
+            if found:
+                result[key] = value
+            else:
+                missing.append(key)
+        if missing:
+            fetched = self.shared.get_many(missing, version)
+            for key, value in fetched.items():
+                self._local_set(self.make_key(key, version), value)
+            result.update(fetched)
+        return result
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version)
+        full_keys = []
+        for key, value in data.items():
+            full_key = self.make_key(key, version)
+            full_keys.append(full_key)
+            if key in failed:
+                self._local_delete([full_key])
+            else:
+                self._local_set(full_key, value)
+        self._publish(full_keys)
+        return failed
+
+    def delete_many(self, keys, version=None):
+        self.shared.delete_many(keys, version)
+        full_keys = [self.make_key(key, version) for key in keys]
+        self._local_delete(full_keys)
+        self._publish(full_keys)
+
+    def has_key(self, key, version=None):
+        found, _ = self._local_get(self.make_key(key, version))
+        return found or self.shared.has_key(key, version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version)
+        full_key = self.make_key(key, version)
+        self._local_delete([full_key])
+        self._publish([full_key])
+        return value
+
+    def clear(self):
+        # Счётчик переживает очистку, иначе другие процессы не заметят
+        # сообщение о ней: номер совпал бы с уже прочитанным.
+        sequence = self._sequence() + 1
+        self.shared.clear()
+        self._local_clear()
+        self.shared.set(SEQUENCE_KEY, sequence, timeout=None)
+        self.shared.set(
+            MESSAGE_KEY.format(sequence), [CLEAR], self._message_timeout
+        )
+        with self._lock:
+            self._unpublished = []
+            self._own_messages.add(sequence)
+
+    def close(self, **kwargs):
+        self._flush()
+        self.shared.close(**kwargs)
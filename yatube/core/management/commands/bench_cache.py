@@ -0,0 +1,108 @@
+import multiprocessing
+import random
+import statistics
+import time
+from bisect import bisect
+from itertools import accumulate
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+def zipf_weights(keys, exponent):
+    return list(
+        accumulate(1 / rank ** exponent for rank in range(1, keys + 1))
+    )
+
+
+def run_worker(args):
+    """Нагрузка одного процесса: чтения с досчётом промахов и записи."""
+    alias, seed, ops, cumulative, write_ratio, payload = args
+    connections.close_all()
+    cache = caches[alias]
+    rng = random.Random(seed)
+    total = cumulative[-1]
+    hits = misses = 0
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(ops):
+        key = f"bench:{bisect(cumulative, rng.random() * total)}"
+        op_started = time.perf_counter()
+        if rng.random() < write_ratio:
+            cache.set(key, payload)
+        elif cache.get(key) is None:
+            misses += 1
+            cache.set(key, payload)
+        else:
+            hits += 1
+        latencies.append(time.perf_counter() - op_started)
+    return hits, misses, latencies, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнить долю попаданий и задержки кэша при разном числе "
+        "процессов. Бэкенд задаётся переменной окружения YATUBE_CACHE."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--alias", default="default")
+        parser.add_argument(
+            "--workers",
+            default="1,2,4,8",
+            help="Число процессов через запятую",
+        )
+        parser.add_argument(
+            "--ops",
+            type=int,
+            default=20000,
+            help="Общее число операций, делится между процессами",
+        )
+        parser.add_argument("--keys", type=int, default=2000)
+        parser.add_argument("--zipf", type=float, default=1.1)
+        parser.add_argument("--write-ratio", type=float, default=0.02)
+        parser.add_argument("--payload", type=int, default=2048)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        cache = caches[options["alias"]]
+        cumulative = zipf_weights(options["keys"], options["zipf"])
+        payload = b"x" * options["payload"]
+        context = multiprocessing.get_context("fork")
+        self.stdout.write(
+            f"Бэкенд: {cache.__class__.__module__}."
+            f"{cache.__class__.__name__}"
+        )
+        for workers in map(int, options["workers"].split(",")):
+            cache.clear()
+            jobs = [
+                (
+                    options["alias"],
+                    options["seed"] * 1000 + number,
+                    options["ops"] // workers,
+                    cumulative,
+                    options["write_ratio"],
+                    payload,
+                )
+                for number in range(workers)
+            ]
+            with context.Pool(workers) as pool:
+                results = pool.map(run_worker, jobs)
+            self.report(workers, results)
+
+    def report(self, workers, results):
+        hits = sum(result[0] for result in results)
+        misses = sum(result[1] for result in results)
+        latencies = sorted(
+            latency for result in results for latency in result[2]
+        )
+        elapsed = max(result[3] for result in results)
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        self.stdout.write(
+            f"процессов: {workers:>2} | "
+            f"попаданий: {hits / max(hits + misses, 1):6.1%} | "
+            f"p50: {statistics.median(latencies) * 1000:.3f} мс | "
+            f"p99: {p99 * 1000:.3f} мс | "
+            f"операций/с: {len(latencies) / elapsed:,.0f}"
+        )
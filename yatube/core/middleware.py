@@ -0,0 +1,206 @@
+"""Учёт SQL-запросов и профилирование отдельных запросов.
+
+QueryInspectMiddleware считает запросы к базе и ищет N+1. Для доли
+запросов SQL_INSPECT_SAMPLE_RATE все обращения к базе проходят через
+execute_wrapper: считаются число и время запросов и «отпечатки» — текст
+SQL без литералов и с одним %s вместо списков IN. Отпечаток,
+повторившийся SQL_INSPECT_REPEAT_THRESHOLD раз, попадает в лог вместе с
+местом вызова: шаблоном и строкой тега, а также кодом проекта. Итоги
+уходят в заголовок Server-Timing. Остальные запросы обслуживаются без
+обёртки: на них тратится только один вызов random().
+
+ProfileMiddleware снимает профиль запроса (core.profiling) по просьбе
+персонала или для случайной доли запросов.
+
+TemplateTimingMiddleware для доли TEMPLATE_TIMING_SAMPLE_RATE запросов
+меряет отрисовку шаблонов, тегов и фильтров (core.template_timing).
+"""
+import logging
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.urls import reverse
+
+from . import template_timing
+from .profiling import RequestProfile
+
+logger = logging.getLogger(__name__)
+
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+PLACEHOLDER_LISTS = re.compile(r"%s(?:\s*,\s*%s)+")
+TEMPLATE_MODULE = os.path.join("django", "template", "base.py")
+# Сколько ступеней места вызова выводить в лог
+STACK_DEPTH = 4
+
+
+def add_server_timing(response, *metrics):
+    """Дописывает метрики к заголовку Server-Timing других middleware."""
+    existing = response.get("Server-Timing")
+    response["Server-Timing"] = ", ".join(
+        (existing, *metrics) if existing else metrics
+    )
+
+
+def fingerprint(sql):
+    """Форма запроса: без литералов и с одним %s вместо списка."""
+    return PLACEHOLDER_LISTS.sub("%s", LITERALS.sub("?", sql))
+
+
+def call_site(frame):
+    """Шаблоны со строками тегов и код проекта, откуда пришёл запрос."""
+    # Другие обёртки execute_wrapper (например, в замерах) — не источник.
+    outer = frame
+    while outer is not None:
+        if outer.f_code.co_name == "_execute_with_wrappers":
+            frame = outer
+            break
+        outer = outer.f_back
+    steps = []
+    while frame is not None and len(steps) < STACK_DEPTH:
+        code = frame.f_code
+        if (
+            code.co_name == "render_annotated"
+            and code.co_filename.endswith(TEMPLATE_MODULE)
+        ):
+            node = frame.f_locals.get("self")
+            origin = getattr(node, "origin", None)
+            token = getattr(node, "token", None)
+            if origin is not None and token is not None:
+                step = f"{origin.template_name}:{token.lineno}"
+                if step not in steps:
+                    steps.append(step)
+        elif (
+            code.co_filename.startswith(settings.BASE_DIR)
+            and "site-packages" not in code.co_filename
+        ):
+            path = os.path.relpath(code.co_filename, settings.BASE_DIR)
+            steps.append(f"{path}:{frame.f_lineno} {code.co_name}")
+        frame = frame.f_back
+    return " ← ".join(steps) or "?"
+
+
+class QueryRecorder:
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+        self.shape_seconds = defaultdict(float)
+        self.sites = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            shape = fingerprint(sql)
+            self.count += 1
+            self.seconds += elapsed
+            self.shapes[shape] += 1
+            self.shape_seconds[shape] += elapsed
+            # Стек снимается один раз на отпечаток, когда тот становится
+            # подозрительным, а не на каждый запрос.
+            if self.shapes[shape] == self.threshold:
+                self.sites[shape] = call_site(sys._getframe(1))
+
+    def repeated(self):
+        """Повторяющиеся отпечатки, самые частые первыми."""
+        return [
+            (shape, count) for shape, count in self.shapes.most_common()
+            if count >= self.threshold
+        ]
+
+
+class QueryInspectMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.SQL_INSPECT_SAMPLE_RATE:
+            return self.get_response(request)
+        recorder = QueryRecorder(settings.SQL_INSPECT_REPEAT_THRESHOLD)
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+        for shape, count in recorder.repeated():
+            logger.warning(
+                "N+1 в %s %s: %s одинаковых запросов (%.1f мс) из %s: %s",
+                request.method,
+                request.path,
+                count,
+                recorder.shape_seconds[shape] * 1000,
+                recorder.sites[shape],
+                shape,
+            )
+        # Запросы потоковых ответов выполняются позже и сюда не попадут.
+        add_server_timing(
+            response,
+            f'db;dur={recorder.seconds * 1000:.1f};'
+            f'desc="{recorder.count} SQL"',
+            f"app;dur={elapsed * 1000:.1f}",
+        )
+        return response
+
+
+class ProfileMiddleware:
+    """Профиль запроса по заголовку X-Profile или ?profile от персонала.
+
+    Кроме того, профилируется доля PROFILE_SAMPLE_RATE всех запросов.
+    Ссылка на профиль возвращается в заголовке X-Profile.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def wanted(self, request):
+        if request.path.startswith(reverse("core:profiles")):
+            return False
+        # Пользователь загружается лениво: без просьбы о профиле его не
+        # трогаем, чтобы не добавлять запросы к сессии и пользователю.
+        if "HTTP_X_PROFILE" in request.META or "profile" in request.GET:
+            user = getattr(request, "user", None)
+            if user is not None and user.is_staff:
+                return True
+        return random.random() < settings.PROFILE_SAMPLE_RATE
+
+    def __call__(self, request):
+        if not self.wanted(request):
+            return self.get_response(request)
+        with RequestProfile() as profile:
+            response = self.get_response(request)
+        name = profile.save(request, response)
+        response["X-Profile"] = reverse("core:profile_detail", args=[name])
+        return response
+
+
+class TemplateTimingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.TEMPLATE_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+        with template_timing.RenderRecorder() as recorder:
+            response = self.get_response(request)
+        match = request.resolver_match
+        template_timing.record(
+            match.view_name if match else "", recorder
+        )
+        add_server_timing(
+            response,
+            f"render;dur={recorder.total * 1000:.1f};"
+            f'desc="{sum(calls for calls, _ in recorder.items.values())} '
+            f'renders"',
+        )
+        return response
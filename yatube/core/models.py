@@ -1,8 +1,16 @@
+from contextvars import ContextVar
+
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models.signals import class_prepared
+from django.dispatch import receiver
 
 User = get_user_model()
 
+# Сохранять заданную pub_date вместо текущего времени. Флаг ставит
+# posts.bulk.explicit_pub_date; ContextVar не виден другим потокам.
+keep_pub_date = ContextVar("keep_pub_date", default=False)
+
 
 class CreatedModel(models.Model):
     """Абстрактная модель. Добавляет дату создания."""
@@ -21,3 +29,26 @@ class CreatedModel(models.Model):
 
     def __str__(self):
         return f"{self.text[:15]}... "
+
+
+@receiver(class_prepared)
+def keep_explicit_pub_date(sender, **kwargs):
+    """Учит pub_date моделей с датой создания сохранять заданное значение.
+
+    Поле остаётся обычным DateTimeField, а pre_save подменяется у его
+    экземпляра в конкретной модели.
+    """
+    if not issubclass(sender, CreatedModel) or sender._meta.abstract:
+        return
+    field = sender._meta.get_field("pub_date")
+    if "pre_save" in vars(field):
+        return
+    auto_pre_save = field.pre_save
+
+    def pre_save(model_instance, add):
+        value = getattr(model_instance, field.attname)
+        if keep_pub_date.get() and value is not None:
+            return value
+        return auto_pre_save(model_instance, add)
+
+    field.pre_save = pre_save
@@ -0,0 +1,226 @@
+"""Профили отдельных запросов: выборка стеков, pstats и флейм-граф.
+
+Пока запрос выполняется, соседний поток раз в PROFILE_INTERVAL секунд
+снимает стек его потока через sys._current_frames(), а cProfile
+собирает pstats. Узлы шаблонов подписываются именем шаблона, строкой и
+тегом, поэтому во флейм-графе видно, что именно тратит время: include
+карточки, тег thumbnail или фильтр linebreaks.
+
+Профили лежат в PROFILE_DIR: у каждого файл свёрнутых стеков
+(.collapsed, формат flamegraph.pl), дамп pstats (.prof) и описание
+(.json). Когда профилей больше PROFILE_MAX_FILES, старые удаляются.
+"""
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+
+TEMPLATE_MODULE = os.path.join("django", "template", "base.py")
+SITE_PACKAGES = "site-packages" + os.sep
+# Высота строки флейм-графа, ширина SVG и самый узкий выводимый
+# прямоугольник в пикселях
+ROW_HEIGHT = 17
+GRAPH_WIDTH = 1200
+MIN_WIDTH = 0.5
+CHAR_WIDTH = 7
+
+
+def frame_label(frame):
+    code = frame.f_code
+    if (
+        code.co_name == "render_annotated"
+        and code.co_filename.endswith(TEMPLATE_MODULE)
+    ):
+        node = frame.f_locals.get("self")
+        origin = getattr(node, "origin", None)
+        token = getattr(node, "token", None)
+        if origin is not None and token is not None:
+            contents = " ".join(token.contents.split())[:40]
+            return f"{origin.template_name}:{token.lineno} {contents}"
+    path = code.co_filename
+    if path.startswith(settings.BASE_DIR):
+        path = os.path.relpath(path, settings.BASE_DIR)
+    elif SITE_PACKAGES in path:
+        path = path.split(SITE_PACKAGES, 1)[1]
+    else:
+        path = os.path.basename(path)
+    # «;» разделяет ступени в свёрнутом формате.
+    return f"{path}:{code.co_name}".replace(";", ",")
+
+
+class StackSampler:
+    """Поток, который снимает стек другого потока с заданным шагом."""
+
+    def __init__(self, interval, root):
+        self.interval = interval
+        # Ступени выше root (сервер и middleware до профиля) не пишутся.
+        self.root = root
+        self.stacks = Counter()
+        self.target = threading.get_ident()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            labels = []
+            while frame is not None and frame is not self.root:
+                labels.append(frame_label(frame))
+                frame = frame.f_back
+            if labels:
+                self.stacks[";".join(reversed(labels))] += 1
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+
+class RequestProfile:
+    """cProfile и выборка стеков вокруг одного запроса."""
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.sampler = None
+        self.started = self.duration = 0
+
+    def __enter__(self):
+        self.sampler = StackSampler(
+            settings.PROFILE_INTERVAL, sys._getframe(1)
+        )
+        self.sampler.__enter__()
+        self.started = time.perf_counter()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.disable()
+        self.duration = time.perf_counter() - self.started
+        self.sampler.__exit__(*exc_info)
+
+    def save(self, request, response):
+        """Записывает профиль и вытесняет старые; возвращает его имя."""
+        directory = settings.PROFILE_DIR
+        os.makedirs(directory, exist_ok=True)
+        match = request.resolver_match
+        name = f"{time.time():.6f}-{uuid.uuid4().hex[:8]}"
+        base = os.path.join(directory, name)
+        self.profiler.dump_stats(base + ".prof")
+        with open(base + ".collapsed", "w", encoding="utf-8") as output:
+            for stack, count in self.sampler.stacks.most_common():
+                output.write(f"{stack} {count}\n")
+        meta = {
+            "name": name,
+            "view": match.view_name if match else "",
+            "method": request.method,
+            "path": request.get_full_path(),
+            "status": response.status_code,
+            "duration_ms": round(self.duration * 1000, 1),
+            "samples": sum(self.sampler.stacks.values()),
+            "created": time.time(),
+        }
+        # Описание пишется последним: без него профиль не виден в списке.
+        with open(base + ".json", "w", encoding="utf-8") as output:
+            json.dump(meta, output, ensure_ascii=False)
+        trim(directory, settings.PROFILE_MAX_FILES)
+        return name
+
+
+def trim(directory, limit):
+    """Удаляет самые старые профили сверх limit."""
+    names = sorted(
+        entry[:-len(".json")]
+        for entry in os.listdir(directory)
+        if entry.endswith(".json")
+    )
+    for name in names[:max(len(names) - limit, 0)]:
+        for suffix in (".json", ".prof", ".collapsed"):
+            try:
+                os.remove(os.path.join(directory, name + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def recent(directory=None):
+    """Описания профилей, новые первыми."""
+    directory = directory or settings.PROFILE_DIR
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for entry in sorted(os.listdir(directory), reverse=True):
+        if not entry.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, entry), encoding="utf-8") as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            # Профиль могли вытеснить между listdir и чтением.
+            continue
+    return profiles
+
+
+def profile_path(name, suffix):
+    """Путь к файлу профиля; имя проверяется, чтобы не выйти из папки."""
+    if os.path.basename(name) != name or name.startswith("."):
+        raise FileNotFoundError(name)
+    path = os.path.join(settings.PROFILE_DIR, name + suffix)
+    if not os.path.exists(path):
+        raise FileNotFoundError(name)
+    return path
+
+
+def load_stacks(name):
+    stacks = Counter()
+    with open(profile_path(name, ".collapsed"), encoding="utf-8") as lines:
+        for line in lines:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            if stack:
+                stacks[stack] += int(count)
+    return stacks
+
+
+def flame_rects(stacks, width=GRAPH_WIDTH):
+    """Прямоугольники флейм-графа: x, y, ширина, подпись и доля."""
+    tree = {}
+    for stack, count in stacks.items():
+        node = tree
+        for label in stack.split(";"):
+            entry = node.setdefault(label, [0, {}])
+            entry[0] += count
+            node = entry[1]
+    total = sum(stacks.values())
+    rects = []
+
+    def walk(children, x, depth):
+        for label, (count, grandchildren) in sorted(children.items()):
+            span = count / total * width
+            if span < MIN_WIDTH:
+                x += span
+                continue
+            rects.append(
+                {
+                    "x": round(x, 2),
+                    "y": depth * ROW_HEIGHT,
+                    "width": round(span, 2),
+                    "label": label,
+                    # Подпись, которая помещается в прямоугольник
+                    "text": label[:int(span // CHAR_WIDTH) - 1],
+                    "samples": count,
+                    "share": count / total,
+                }
+            )
+            walk(grandchildren, x, depth + 1)
+            x += span
+
+    if total:
+        walk(tree, 0, 0)
+    return rects
@@ -0,0 +1,171 @@
+"""Время отрисовки шаблонов, include, тегов и фильтров.
+
+install() один раз оборачивает Template.render (через него отрисовывается
+и каждый include), функции компиляции тегов TEMPLATE_TIMING_TAGS и
+фильтры TEMPLATE_TIMING_FILTERS во всех библиотеках движка Django.
+Обёртки меряют время, только когда в потоке запущен RenderRecorder;
+иначе они стоят одну проверку атрибута threading.local.
+
+Итоги замеренных запросов складываются по представлениям в памяти
+процесса (render_metrics): число запросов и для каждого шаблона, тега и
+фильтра — число вызовов и суммарное время с вложенными.
+"""
+import functools
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.template import Template, engines
+from django.template.backends.django import DjangoTemplates
+
+_state = threading.local()
+_lock = threading.Lock()
+_views = {}
+_installed = False
+
+
+class RenderRecorder:
+    """Замеры отрисовки одного запроса в текущем потоке."""
+
+    def __init__(self):
+        self.items = defaultdict(lambda: [0, 0.0])
+        self.total = 0.0
+        self.depth = 0
+
+    def __enter__(self):
+        _state.recorder = self
+        return self
+
+    def __exit__(self, *exc_info):
+        _state.recorder = None
+
+    def measure(self, key, func, *args):
+        self.depth += 1
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.depth -= 1
+            item = self.items[key]
+            item[0] += 1
+            item[1] += elapsed
+            # Вложенные шаблоны и теги уже вошли во время внешних.
+            if not self.depth:
+                self.total += elapsed
+
+
+def timed(key, func, *args):
+    recorder = getattr(_state, "recorder", None)
+    if recorder is None:
+        return func(*args)
+    return recorder.measure(key, func, *args)
+
+
+def timed_tag(name, compile_function):
+    @functools.wraps(compile_function)
+    def compile_timed(parser, token):
+        node = compile_function(parser, token)
+        render = node.render
+        node.render = functools.partial(timed, f"tag:{name}", render)
+        return node
+
+    compile_timed.timed = True
+    return compile_timed
+
+
+def timed_filter(name, filter_function):
+    @functools.wraps(filter_function)
+    def filter_timed(*args, **kwargs):
+        recorder = getattr(_state, "recorder", None)
+        if recorder is None:
+            return filter_function(*args, **kwargs)
+        return recorder.measure(
+            f"filter:{name}", functools.partial(filter_function, **kwargs),
+            *args
+        )
+
+    filter_timed.timed = True
+    return filter_timed
+
+
+def install():
+    """Оборачивает шаблоны, теги и фильтры; повторно не оборачивает."""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    # Не _render: его на время тестов подменяет тестовое окружение Django.
+    render = Template.render
+
+    def render_timed(self, context):
+        key = f"template:{self.name or '<string>'}"
+        return timed(key, render, self, context)
+
+    Template.render = render_timed
+    for backend in engines.all():
+        if not isinstance(backend, DjangoTemplates):
+            continue
+        engine = backend.engine
+        for library in (
+            *engine.template_builtins, *engine.template_libraries.values()
+        ):
+            wrap(library.tags, settings.TEMPLATE_TIMING_TAGS, timed_tag)
+            wrap(
+                library.filters, settings.TEMPLATE_TIMING_FILTERS,
+                timed_filter,
+            )
+
+
+def wrap(registry, names, wrapper):
+    for name in names:
+        function = registry.get(name)
+        if function is not None and not getattr(function, "timed", False):
+            registry[name] = wrapper(name, function)
+
+
+def record(view, recorder):
+    """Добавляет замеры запроса к итогам его представления."""
+    with _lock:
+        metrics = _views.setdefault(
+            view, {"requests": 0, "render_ms": 0.0, "items": {}}
+        )
+        metrics["requests"] += 1
+        metrics["render_ms"] += recorder.total * 1000
+        for key, (calls, seconds) in recorder.items.items():
+            item = metrics["items"].setdefault(key, [0, 0.0])
+            item[0] += calls
+            item[1] += seconds * 1000
+
+
+def render_metrics():
+    """Итоги по представлениям: средние на запрос и суммы по элементам."""
+    with _lock:
+        return {
+            view: {
+                "requests": metrics["requests"],
+                "render_ms_avg": round(
+                    metrics["render_ms"] / metrics["requests"], 3
+                ),
+                "items": {
+                    key: {
+                        "calls": calls,
+                        "total_ms": round(total, 3),
+                        "ms_per_request": round(
+                            total / metrics["requests"], 3
+                        ),
+                    }
+                    for key, (calls, total) in sorted(
+                        metrics["items"].items(),
+                        key=lambda entry: -entry[1][1],
+                    )
+                },
+            }
+            for view, metrics in sorted(_views.items())
+        }
+
+
+def reset():
+    with _lock:
+        _views.clear()
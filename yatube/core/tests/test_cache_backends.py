@@ -0,0 +1,104 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+
+from ..cache_backends import MESSAGE_KEY, SEQUENCE_KEY, TwoTierCache
+
+SHARED_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "default",
+    },
+    "shared": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "two-tier-shared",
+    },
+}
+
+
+def two_tier(**options):
+    """Отдельный экземпляр — как кэш другого процесса."""
+    options = {"SHARED": "shared", "SYNC_INTERVAL": 0, **options}
+    return TwoTierCache(None, {"OPTIONS": options})
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class TwoTierCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.first = two_tier()
+        self.second = two_tier()
+        self.first.clear()
+
+    def test_value_is_served_from_local_tier(self):
+        self.first.set("key", "value")
+        self.assertEqual(self.second.get("key"), "value")
+        self.second.shared.delete("key")
+        self.assertEqual(self.second.get("key"), "value")
+
+    def test_write_invalidates_other_processes(self):
+        self.first.set("key", "old")
+        self.assertEqual(self.second.get("key"), "old")
+        self.first.set("key", "new")
+        self.first.close()
+        self.assertEqual(self.second.get("key"), "new")
+        self.first.delete("key")
+        self.first.close()
+        self.assertIsNone(self.second.get("key"))
+
+    def test_incr_invalidates_other_processes(self):
+        self.first.set("counter", 1)
+        self.assertEqual(self.second.get("counter"), 1)
+        self.first.incr("counter")
+        self.first.close()
+        self.assertEqual(self.second.get("counter"), 2)
+
+    def test_clear_drops_local_tier_everywhere(self):
+        self.first.set("key", "value")
+        self.assertEqual(self.second.get("key"), "value")
+        self.first.clear()
+        self.assertIsNone(self.second.get("key"))
+
+    def test_lost_messages_clear_local_tier(self):
+        self.first.set("key", "old")
+        self.assertEqual(self.second.get("key"), "old")
+        self.first.set("key", "new")
+        self.first.close()
+        latest = self.first.shared.get(SEQUENCE_KEY)
+        self.first.shared.delete(MESSAGE_KEY.format(latest))
+        self.assertEqual(self.second.get("key"), "new")
+
+    def test_writers_with_same_sequence_keep_both_messages(self):
+        reader = two_tier()
+        for key in ("a", "b"):
+            self.first.set(key, "old")
+            self.assertEqual(reader.get(key), "old")
+        self.first.set("a", "new")
+        self.first.close()
+        # Неатомарный incr: второй процесс прочитал счётчик до записи.
+        self.second.shared.decr(SEQUENCE_KEY)
+        self.second.set("b", "new")
+        self.second.close()
+        self.assertEqual(reader.get("a"), "new")
+        self.assertEqual(reader.get("b"), "new")
+
+    def test_file_cache_is_refused_as_shared_tier(self):
+        caches = {
+            **SHARED_CACHES,
+            "shared": {
+                "BACKEND": (
+                    "django.core.cache.backends.filebased.FileBasedCache"
+                ),
+                "LOCATION": "/tmp/two-tier-shared",
+            },
+        }
+        with override_settings(CACHES=caches):
+            with self.assertRaises(ImproperlyConfigured):
+                two_tier()
+
+    def test_local_tier_evicts_least_recently_used(self):
+        cache = two_tier(LOCAL_MAX_ENTRIES=2)
+        for key in ("a", "b", "c"):
+            cache.set(key, key)
+        cache.shared.delete_many(["a", "b", "c"])
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("b"), "b")
+        self.assertEqual(cache.get("c"), "c")
@@ -0,0 +1,76 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.template import engines
+from django.test import RequestFactory, TestCase, override_settings
+from mixer.backend.django import mixer
+
+from posts.models import Group, Post
+
+from ..middleware import QueryInspectMiddleware, fingerprint
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+CARDS = engines["django"].from_string(
+    "{% for post in posts %}{{ post.group.title }}{% endfor %}"
+)
+
+
+def cards_view(request):
+    return HttpResponse(CARDS.render({"posts": Post.objects.all()}))
+
+
+@override_settings(
+    SQL_INSPECT_SAMPLE_RATE=1,
+    SQL_INSPECT_REPEAT_THRESHOLD=3,
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+)
+class QueryInspectMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for group in mixer.cycle(3).blend(Group):
+            mixer.blend(Post, group=group)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.request = RequestFactory().get("/cards/")
+
+    def test_fingerprint_ignores_literals_and_list_lengths(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) AND x = 5"),
+            fingerprint("SELECT * FROM t WHERE id IN (%s) AND x = 'a'"),
+        )
+
+    def test_repeated_queries_are_logged_with_template_and_view(self):
+        with self.assertLogs("core.middleware", "WARNING") as logs:
+            response = QueryInspectMiddleware(cards_view)(self.request)
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("3 одинаковых запросов", logs.output[0])
+        self.assertIn("posts_group", logs.output[0])
+        self.assertIn("core/tests/test_middleware.py", logs.output[0])
+        self.assertIn("cards_view", logs.output[0])
+        self.assertIn('desc="4 SQL"', response["Server-Timing"])
+
+    def test_select_related_is_not_reported(self):
+        def view(request):
+            return HttpResponse(
+                CARDS.render(
+                    {"posts": Post.objects.select_related("group")}
+                )
+            )
+
+        # Без логов assertLogs падает.
+        with self.assertRaises(AssertionError):
+            with self.assertLogs("core.middleware", "WARNING"):
+                response = QueryInspectMiddleware(view)(self.request)
+        self.assertIn('desc="1 SQL"', response["Server-Timing"])
+
+    @override_settings(SQL_INSPECT_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_instrumented(self):
+        response = QueryInspectMiddleware(cards_view)(self.request)
+        self.assertNotIn("Server-Timing", response)
@@ -0,0 +1,114 @@
+import os
+import shutil
+import tempfile
+from collections import Counter
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from mixer.backend.django import mixer
+
+from posts.models import Post, User
+
+from .. import profiling
+
+TEMP_PROFILE_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(
+    PROFILE_DIR=TEMP_PROFILE_DIR,
+    PROFILE_SAMPLE_RATE=0,
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+)
+class ProfileMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = mixer.blend(User, is_staff=True)
+        cls.user = mixer.blend(User)
+        mixer.cycle(3).blend(Post)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_PROFILE_DIR, ignore_errors=True)
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(TEMP_PROFILE_DIR, ignore_errors=True)
+        self.client.force_login(self.staff)
+
+    def test_staff_query_flag_stores_profile(self):
+        response = self.client.get(reverse("posts:index"), {"profile": 1})
+        detail_url = response["X-Profile"]
+        name = detail_url.rstrip("/").rsplit("/", 1)[1]
+        for suffix in (".json", ".prof", ".collapsed"):
+            with self.subTest(suffix=suffix):
+                self.assertTrue(
+                    os.path.exists(
+                        os.path.join(TEMP_PROFILE_DIR, name + suffix)
+                    )
+                )
+        listing = self.client.get(reverse("core:profiles"))
+        self.assertContains(listing, "posts:index")
+        self.assertContains(listing, detail_url)
+        detail = self.client.get(detail_url)
+        self.assertContains(detail, "cumulative")
+        download = self.client.get(
+            reverse("core:profile_download", args=[name, "prof"])
+        )
+        self.assertEqual(download.status_code, 200)
+
+    def test_header_triggers_profile(self):
+        response = self.client.get(
+            reverse("posts:index"), HTTP_X_PROFILE="1"
+        )
+        self.assertIn("X-Profile", response)
+
+    def test_other_users_cannot_request_or_view_profiles(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("posts:index"), {"profile": 1})
+        self.assertNotIn("X-Profile", response)
+        response = self.client.get(reverse("core:profiles"))
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(PROFILE_SAMPLE_RATE=1)
+    def test_sample_rate_profiles_every_request(self):
+        self.client.logout()
+        response = self.client.get(reverse("posts:index"))
+        self.assertIn("X-Profile", response)
+
+    @override_settings(PROFILE_MAX_FILES=2)
+    def test_ring_keeps_latest_profiles(self):
+        urls = [
+            self.client.get(reverse("posts:index"), {"profile": 1})[
+                "X-Profile"
+            ]
+            for _ in range(3)
+        ]
+        kept = [
+            reverse("core:profile_detail", args=[meta["name"]])
+            for meta in profiling.recent()
+        ]
+        self.assertEqual(kept, urls[:0:-1])
+
+    def test_unknown_profile_is_not_found(self):
+        for name in ("missing", "..", ".hidden"):
+            with self.subTest(name=name):
+                response = self.client.get(
+                    reverse("core:profile_detail", args=[name])
+                )
+                self.assertEqual(response.status_code, 404)
+
+
+class FlameGraphTest(TestCase):
+    def test_rects_nest_under_parents(self):
+        stacks = Counter({"view;render;card": 3, "view;query": 1})
+        rects = profiling.flame_rects(stacks, width=400)
+        by_label = {rect["label"]: rect for rect in rects}
+        self.assertEqual(by_label["view"]["width"], 400)
+        self.assertEqual(by_label["render"]["width"], 300)
+        self.assertEqual(by_label["query"]["width"], 100)
+        self.assertEqual(by_label["card"]["y"], 2 * profiling.ROW_HEIGHT)
+        self.assertEqual(by_label["query"]["x"], 0)
+        self.assertEqual(by_label["render"]["x"], 100)
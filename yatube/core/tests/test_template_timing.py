@@ -0,0 +1,75 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template import engines
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from mixer.backend.django import mixer
+
+from posts.models import Group, Post, User
+
+from .. import template_timing
+
+POSTS = 3
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(
+    TEMPLATE_TIMING_SAMPLE_RATE=1, MEDIA_ROOT=TEMP_MEDIA_ROOT
+)
+class TemplateTimingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = mixer.blend(User, is_staff=True)
+        group = mixer.blend(Group)
+        mixer.cycle(POSTS).blend(Post, group=group)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        template_timing.reset()
+
+    def metrics(self):
+        self.client.force_login(self.staff)
+        return self.client.get(reverse("core:template_metrics")).json()
+
+    def test_includes_tags_and_filters_are_aggregated_per_view(self):
+        response = self.client.get(reverse("posts:index"))
+        self.assertIn("render;dur=", response["Server-Timing"])
+        index = self.metrics()["posts:index"]
+        self.assertEqual(index["requests"], 1)
+        items = index["items"]
+        self.assertEqual(
+            items["template:posts/includes/post_card.html"]["calls"], POSTS
+        )
+        self.assertNotIn("filter:linebreaks", items)
+        self.assertEqual(items["tag:post_cards"]["calls"], 1)
+        self.assertGreaterEqual(
+            items["template:posts/index.html"]["total_ms"],
+            items["template:posts/includes/post_card.html"]["total_ms"],
+        )
+
+    @override_settings(TEMPLATE_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_recorded(self):
+        response = self.client.get(reverse("posts:index"))
+        self.assertNotIn("render;", response.get("Server-Timing", ""))
+        self.assertNotIn("posts:index", self.metrics())
+
+    def test_wrapped_filters_keep_their_behaviour(self):
+        template = engines["django"].from_string(
+            "{% load uglify %}{{ 'abcd'|uglify }} "
+            "{{ text|linebreaks }}"
+        )
+        self.assertEqual(
+            template.render({"text": "<b>"}), "aBcD <p>&lt;b&gt;</p>"
+        )
+
+    def test_metrics_are_staff_only(self):
+        response = self.client.get(reverse("core:template_metrics"))
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,19 @@
+from django.urls import path
+
+from . import views
+
+app_name = "core"
+
+urlpatterns = [
+    path("", views.profiles, name="profiles"),
+    # Раньше профилей: иначе адрес подошёл бы под profile_detail
+    path(
+        "templates/", views.template_metrics, name="template_metrics"
+    ),
+    path("<str:name>/", views.profile_detail, name="profile_detail"),
+    path(
+        "<str:name>/<str:kind>/",
+        views.profile_download,
+        name="profile_download",
+    ),
+]
@@ -1,5 +1,15 @@
+import io
+import pstats
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse, Http404, JsonResponse
 from django.shortcuts import render
 
+from . import profiling, template_timing
+
+# Сколько строк pstats выводить на странице профиля
+PSTATS_LINES = 40
+
 
 def page_not_found(request, exception):
     return render(request, "core/404.html", {"path": request.path}, status=404)
@@ -15,3 +25,62 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, "core/403.html", status=403)
+
+
+@staff_member_required
+def profiles(request):
+    """Последние профили, сгруппированные по представлениям."""
+    by_view = {}
+    for meta in profiling.recent():
+        by_view.setdefault(meta["view"] or meta["path"], []).append(meta)
+    return render(
+        request,
+        "core/profiles.html",
+        {"by_view": sorted(by_view.items())},
+    )
+
+
+@staff_member_required
+def profile_detail(request, name):
+    try:
+        stacks = profiling.load_stacks(name)
+        stats_path = profiling.profile_path(name, ".prof")
+    except FileNotFoundError:
+        raise Http404
+    stream = io.StringIO()
+    stats = pstats.Stats(stats_path, stream=stream)
+    stats.sort_stats("cumulative").print_stats(PSTATS_LINES)
+    rects = profiling.flame_rects(stacks)
+    context = {
+        "name": name,
+        "rects": rects,
+        "height": max((rect["y"] for rect in rects), default=0)
+        + profiling.ROW_HEIGHT,
+        "width": profiling.GRAPH_WIDTH,
+        "row_height": profiling.ROW_HEIGHT,
+        "samples": sum(stacks.values()),
+        "pstats": stream.getvalue(),
+    }
+    return render(request, "core/profile_detail.html", context)
+
+
+@staff_member_required
+def profile_download(request, name, kind):
+    if kind not in ("prof", "collapsed"):
+        raise Http404
+    try:
+        path = profiling.profile_path(name, f".{kind}")
+    except FileNotFoundError:
+        raise Http404
+    return FileResponse(
+        open(path, "rb"), as_attachment=True, filename=f"{name}.{kind}"
+    )
+
+
+@staff_member_required
+def template_metrics(request):
+    """Время отрисовки по представлениям в этом процессе."""
+    return JsonResponse(
+        template_timing.render_metrics(),
+        json_dumps_params={"ensure_ascii": False, "indent": 2},
+    )
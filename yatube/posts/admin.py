@@ -1,9 +1,115 @@
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
 
+from . import search
 from .models import Comment, Follow, Group, Post
+from .paginate_utils import CountingPaginator
 
 
-class PostAdmin(admin.ModelAdmin):
+class IndexedSearchMixin:
+    """Поиск в админке через поисковый индекс вместо LIKE '%...%'."""
+
+    search_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return (
+            search.filter_matching(queryset, search_term, self.search_kind),
+            False,
+        )
+
+
+class PreloadedAutocompleteSelect(AutocompleteSelect):
+    """Автокомплит, подпись выбранного значения которого уже загружена.
+
+    Обычный AutocompleteSelect запрашивает выбранный объект из базы в каждой
+    строке списка; здесь его подставляет форма строки из select_related.
+    """
+
+    selected = None
+
+    def optgroups(self, name, value, attr=None):
+        selected = self.selected
+        if selected is None or [str(v) for v in value] != [str(selected.pk)]:
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, "", "", False, 0))
+        options.append(
+            self.create_option(
+                name,
+                selected.pk,
+                self.choices.field.label_from_instance(selected),
+                True,
+                len(options),
+            )
+        )
+        return [(None, options, 0)]
+
+
+class ScalableAdminMixin:
+    """Список объектов, который не растёт с размером таблиц.
+
+    В режиме ADMIN_PERFORMANCE_MODE внешние ключи выбираются автокомплитом
+    вместо <select> со всеми объектами, а число записей без фильтров
+    берётся из кэша на ADMIN_COUNT_TIMEOUT секунд и не пересчитывается
+    второй раз для «показать все». Связанные объекты строк всегда
+    загружаются одним запросом через list_select_related.
+    """
+
+    def get_autocomplete_fields(self, request):
+        if not settings.ADMIN_PERFORMANCE_MODE:
+            return ()
+        return super().get_autocomplete_fields(request)
+
+    @property
+    def show_full_result_count(self):
+        return not settings.ADMIN_PERFORMANCE_MODE
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.get_autocomplete_fields(request):
+            kwargs.setdefault(
+                "widget",
+                PreloadedAutocompleteSelect(
+                    db_field.remote_field,
+                    self.admin_site,
+                    using=kwargs.get("using"),
+                ),
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist_form(self, request, **kwargs):
+        form = super().get_changelist_form(request, **kwargs)
+
+        class PreloadedForm(form):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                for name, field in self.fields.items():
+                    widget = getattr(field.widget, "widget", field.widget)
+                    if isinstance(widget, PreloadedAutocompleteSelect):
+                        # Ссылки «добавить/изменить/удалить» у каждой
+                        # строки утяжеляют страницу больше самого поля.
+                        field.widget = widget
+                        widget.selected = getattr(self.instance, name)
+
+        return form if not settings.ADMIN_PERFORMANCE_MODE else PreloadedForm
+
+    def get_paginator(self, request, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True):
+        cached = settings.ADMIN_PERFORMANCE_MODE and not queryset.query.where
+        return CountingPaginator(
+            queryset,
+            per_page,
+            count_key=f"admin_count:{self.model._meta.label_lower}",
+            timeout=settings.ADMIN_COUNT_TIMEOUT if cached else 0,
+            orphans=orphans,
+            allow_empty_first_page=allow_empty_first_page,
+        )
+
+
+class PostAdmin(IndexedSearchMixin, ScalableAdminMixin, admin.ModelAdmin):
     list_display = (
         "pk",
         "text",
@@ -12,8 +118,12 @@ class PostAdmin(admin.ModelAdmin):
         "group",
     )
     list_editable = ("group",)
+    list_select_related = ("author", "group")
+    autocomplete_fields = ("author", "group")
     search_fields = ("text",)
+    search_kind = search.POST
     list_filter = ("pub_date",)
+    date_hierarchy = "pub_date"
     empty_value_display = "-пусто-"
 
 
@@ -27,7 +137,7 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = "-пусто-"
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(IndexedSearchMixin, ScalableAdminMixin, admin.ModelAdmin):
     list_display = (
         "pk",
         "post",
@@ -36,19 +146,25 @@ class CommentAdmin(admin.ModelAdmin):
         "author",
     )
     list_editable = ("text", "author")
+    list_select_related = ("author", "post")
+    autocomplete_fields = ("author", "post")
     search_fields = ("text",)
+    search_kind = search.COMMENT
     list_filter = ("pub_date",)
+    date_hierarchy = "pub_date"
     empty_value_display = "-пусто-"
 
 
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = (
         "pk",
         "user",
         "author",
     )
     list_editable = ("author", "user")
-    search_fields = ("user",)
+    list_select_related = ("author", "user")
+    autocomplete_fields = ("author", "user")
+    search_fields = ("user__username", "author__username")
     empty_value_display = "-пусто-"
 
 
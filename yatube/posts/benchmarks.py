@@ -0,0 +1,252 @@
+"""Замеры всех страниц posts, users и about против базовой линии.
+
+Каждая страница открывается тестовым клиентом анонимно и под автором
+самого обсуждаемого поста на детерминированных данных manage.py seed.
+Перед каждым запросом кэш очищается, а сам запрос выполняется в точке
+сохранения, которая откатывается: замеряется холодная отрисовка, и
+страницы с побочными эффектами (подписка, удаление) не меняют данных.
+Миниатюры картинок готовятся при заполнении, как на работающем сайте:
+иначе каждый замер включал бы их генерацию.
+
+Число запросов сравнивается с базовой линией точно: новый N+1 в
+шаблоне сразу заметен. Объём ответа, время SQL и задержки сравниваются
+с допусками, задержки — только по желанию, так как зависят от машины.
+"""
+import json
+import logging
+import math
+import os
+import statistics
+import time
+
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Min
+from django.test import Client
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from .models import Group, Post, User
+from .seeding import SeedPlan, Seeder
+from .thumbnails import generate
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "benchmarks.json")
+NAMESPACES = ("posts", "users", "about")
+ANONYMOUS = "anonymous"
+AUTHOR = "author"
+DATASETS = {
+    "small": {
+        "users": 50, "groups": 10, "posts": 500, "comments": 2000,
+        "follows": 10,
+    },
+    "medium": {
+        "users": 1000, "groups": 100, "posts": 20000, "comments": 60000,
+        "follows": 20,
+    },
+    "large": {
+        "users": 10000, "groups": 1000, "posts": 200000,
+        "comments": 600000, "follows": 20,
+    },
+}
+# Допуски: доля роста объёма, во сколько раз может вырасти время и
+# сколько миллисекунд прощается сверх этого на быстрых страницах
+BYTES_TOLERANCE = 0.1
+TIME_FACTOR = 2.0
+TIME_SLACK_MS = 5
+TIME_METRICS = ("p50_ms", "p95_ms", "sql_ms")
+
+
+def url_names(namespaces=NAMESPACES):
+    """Имена маршрутов приложений и имена их аргументов."""
+    for resolver in get_resolver().url_patterns:
+        if not isinstance(resolver, URLResolver):
+            continue
+        if resolver.namespace not in namespaces:
+            continue
+        for pattern in resolver.url_patterns:
+            if isinstance(pattern, URLPattern) and pattern.name:
+                yield (
+                    f"{resolver.namespace}:{pattern.name}",
+                    list(pattern.pattern.converters),
+                )
+
+
+def seed(dataset):
+    seeder = Seeder(SeedPlan(**DATASETS[dataset]))
+    seeder.run()
+    seeder.finalize()
+    # Миниатюры зависят только от файла: хватает поста на каждую картинку.
+    first_posts = (
+        Post.objects.exclude(image="")
+        .values("image")
+        .annotate(first=Min("pk"))
+        .values("first")
+    )
+    for post in Post.objects.filter(pk__in=first_posts):
+        generate(post)
+
+
+def samples():
+    """Аргументы маршрутов: самый обсуждаемый пост, его автор, группа."""
+    post = Post.objects.select_related("author", "group").order_by(
+        "-comment_count", "pk"
+    ).first()
+    author = post.author
+    group = (
+        Group.objects.annotate(total=Count("posts"))
+        .order_by("-total", "pk")
+        .first()
+    )
+    # Сброс пароля — для того, кто не входит в замерах: вход меняет
+    # last_login, и ссылка сброса становилась бы недействительной.
+    stranger = User.objects.exclude(pk=author.pk).order_by("pk").first()
+    # Поисковый запрос — слово из текста поста: результаты точно есть.
+    word = post.text.split()[0].lower()
+    arguments = {
+        "post_id": post.pk,
+        "slug": group.slug,
+        "username": author.username,
+        "uidb64": urlsafe_base64_encode(force_bytes(stranger.pk)),
+        "token": default_token_generator.make_token(stranger),
+    }
+    queries = {"posts:search": {"q": word}, "posts:search_json": {"q": word}}
+    return author, arguments, queries
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[max(math.ceil(share * len(ordered)) - 1, 0)]
+
+
+class QueryTimer:
+    """Число и время запросов без журнала connection.queries.
+
+    Журнал ограничен 9000 записями и очищается сигналом request_started,
+    поэтому для страниц с тысячами запросов он не годится.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+def measure_url(client, url, params, user, repeat):
+    latencies = []
+    sql_times = []
+    queries = 0
+    for _ in range(repeat):
+        if user is not None:
+            # Выход из профиля на предыдущем повторе завершает сессию.
+            client.force_login(user)
+        cache.clear()
+        timer = QueryTimer()
+        with transaction.atomic():
+            with connection.execute_wrapper(timer):
+                started = time.perf_counter()
+                response = client.get(url, params)
+                content = (
+                    b"".join(response.streaming_content)
+                    if response.streaming
+                    else response.content
+                )
+                latencies.append((time.perf_counter() - started) * 1000)
+            transaction.set_rollback(True)
+        queries = max(queries, timer.count)
+        sql_times.append(timer.seconds * 1000)
+    return {
+        "status": response.status_code,
+        "queries": queries,
+        "sql_ms": round(statistics.median(sql_times), 2),
+        "bytes": len(content),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+    }
+
+
+def cases():
+    """Имя случая, адрес, параметры и пользователь для каждой страницы."""
+    author, arguments, queries = samples()
+    for name, argument_names in url_names():
+        missing = set(argument_names) - set(arguments)
+        if missing:
+            raise LookupError(
+                f"Нет образца аргументов {', '.join(sorted(missing))} "
+                f"для {name}"
+            )
+        url = reverse(
+            name, kwargs={key: arguments[key] for key in argument_names}
+        )
+        for role, user in ((ANONYMOUS, None), (AUTHOR, author)):
+            yield f"{name} [{role}]", url, queries.get(name, {}), user
+
+
+def measure(repeat=20):
+    """Метрики всех страниц на уже заполненной базе."""
+    results = {}
+    # Ожидаемые 404 (отписка без подписки) не должны засорять вывод.
+    logger = logging.getLogger("django.request")
+    level = logger.level
+    logger.setLevel(logging.ERROR)
+    try:
+        for case, url, params, user in cases():
+            results[case] = measure_url(Client(), url, params, user, repeat)
+    finally:
+        logger.setLevel(level)
+    return results
+
+
+def compare(results, baseline, latency=True):
+    """Регрессии относительно базовой линии одного набора данных."""
+    regressions = []
+    for case, metrics in results.items():
+        base = baseline.get(case)
+        if base is None:
+            regressions.append(f"{case}: нет в базовой линии")
+            continue
+        if metrics["status"] != base["status"]:
+            regressions.append(
+                f"{case}: код {metrics['status']} вместо {base['status']}"
+            )
+        if metrics["queries"] > base["queries"]:
+            regressions.append(
+                f"{case}: запросов {metrics['queries']} "
+                f"вместо {base['queries']}"
+            )
+        if metrics["bytes"] > base["bytes"] * (1 + BYTES_TOLERANCE):
+            regressions.append(
+                f"{case}: {metrics['bytes']} байт вместо {base['bytes']}"
+            )
+        if not latency:
+            continue
+        for metric in TIME_METRICS:
+            limit = base[metric] * TIME_FACTOR + TIME_SLACK_MS
+            if metrics[metric] > limit:
+                regressions.append(
+                    f"{case}: {metric} {metrics[metric]} "
+                    f"при допустимых {limit:.2f}"
+                )
+    return regressions
+
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as baseline:
+        return json.load(baseline)
+
+
+def save_baseline(baseline, path=BASELINE_PATH):
+    with open(path, "w", encoding="utf-8") as output:
+        json.dump(baseline, output, ensure_ascii=False, indent=2,
+                  sort_keys=True)
+        output.write("\n")
@@ -0,0 +1,18 @@
+from contextlib import contextmanager
+
+from core.models import keep_pub_date
+
+
+@contextmanager
+def explicit_pub_date():
+    """Позволяет bulk_create сохранить заданную pub_date.
+
+    По умолчанию auto_now_add перезаписывает дату текущим временем.
+    Флаг действует только в текущем потоке: метаданные полей не
+    меняются, и посты параллельных запросов получают свою дату.
+    """
+    token = keep_pub_date.set(True)
+    try:
+        yield
+    finally:
+        keep_pub_date.reset(token)
@@ -0,0 +1,246 @@
+"""Кэш страниц для анонимных посетителей с точной инвалидацией.
+
+Каждая страница зависит от нескольких «штампов версий»: общей ленты,
+группы, автора, поста. Штамп — время последнего изменения объекта, его
+обновляют сигналы posts.signals. Ключ кэша страницы строится из адреса и
+текущих штампов, поэтому после изменения объекта старая копия страницы
+просто перестаёт находиться, а штампы дают ETag и Last-Modified.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .models import Group, Post, User
+
+FEED = "feed"
+GROUP = "group"
+AUTHOR = "author"
+POST = "post"
+
+
+def stamp_key(scope, obj_id=""):
+    return f"stamp:{scope}:{obj_id}"
+
+
+def get_stamps(keys):
+    """Текущие штампы; отсутствующие заводит текущим временем."""
+    stamps = cache.get_many(keys)
+    missing = {key: time.time() for key in keys if key not in stamps}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        stamps.update(missing)
+    return stamps
+
+
+def bump(*keys):
+    """Отмечает объекты изменёнными: их страницы перестают совпадать."""
+    now = time.time()
+    cache.set_many({key: now for key in keys}, timeout=None)
+
+
+def bump_post_pages(post, *group_ids):
+    """Сбрасывает закэшированные страницы, на которых виден пост."""
+    slugs = Group.objects.filter(
+        pk__in=[pk for pk in group_ids if pk is not None]
+    ).values_list("slug", flat=True)
+    bump(
+        stamp_key(FEED),
+        stamp_key(POST, post.pk),
+        stamp_key(AUTHOR, post.author.username),
+        *(stamp_key(GROUP, slug) for slug in slugs),
+    )
+
+
+def bump_author_pages(author_id, *usernames):
+    """Сбрасывает страницы со всеми постами автора, как bump_post_pages.
+
+    Нужно, когда меняется то, что карточки выводят об авторе: его имя.
+    """
+    slugs = (
+        Group.objects.filter(posts__author_id=author_id)
+        .distinct()
+        .values_list("slug", flat=True)
+    )
+    post_ids = Post.objects.filter(author_id=author_id).values_list(
+        "pk", flat=True
+    )
+    bump(
+        stamp_key(FEED),
+        *(stamp_key(AUTHOR, username) for username in usernames),
+        *(stamp_key(GROUP, slug) for slug in slugs),
+        *(stamp_key(POST, pk) for pk in post_ids.iterator()),
+    )
+
+
+def bump_posts_pages(post_ids):
+    """Сбрасывает страницы, на которых видны посты post_ids.
+
+    Как bump_post_pages, но для пачки постов одним запросом к каждой
+    таблице.
+    """
+    posts = Post.objects.filter(pk__in=post_ids)
+    usernames = (
+        User.objects.filter(posts__in=posts)
+        .distinct()
+        .values_list("username", flat=True)
+    )
+    slugs = (
+        Group.objects.filter(posts__in=posts)
+        .distinct()
+        .values_list("slug", flat=True)
+    )
+    bump(
+        stamp_key(FEED),
+        *(stamp_key(AUTHOR, username) for username in usernames),
+        *(stamp_key(GROUP, slug) for slug in slugs),
+        *(stamp_key(POST, pk) for pk in post_ids),
+    )
+
+
+def post_author_key(post_id):
+    return f"post_author:{post_id}"
+
+
+def username_key(user_id):
+    return f"username:{user_id}"
+
+
+def forget_post_author(post_id):
+    """Автор поста мог смениться, например в админке."""
+    cache.delete(post_author_key(post_id))
+
+
+def forget_username(user_id):
+    """Пользователь сменил имя: штампы его постов ищутся по новому."""
+    cache.delete(username_key(user_id))
+
+
+def feed_stamps():
+    return [stamp_key(FEED)]
+
+
+def group_stamps(slug):
+    return [stamp_key(GROUP, slug)]
+
+
+def author_stamps(username):
+    return [stamp_key(AUTHOR, username)]
+
+
+def post_stamps(post_id):
+    """Пост зависит и от автора: на странице выводится число его постов.
+
+    Автор поста и имя автора кэшируются отдельно: при смене имени
+    сбрасывается один ключ пользователя, а не ключи всех его постов.
+    """
+    author_id = cache.get(post_author_key(post_id))
+    if author_id is None:
+        author_id, username = (
+            Post.objects.filter(pk=post_id)
+            .values_list("author_id", "author__username")
+            .first()
+        ) or (None, None)
+        if author_id is not None:
+            cache.set_many(
+                {
+                    post_author_key(post_id): author_id,
+                    username_key(author_id): username,
+                },
+                timeout=None,
+            )
+    else:
+        username = cache.get(username_key(author_id))
+        if username is None:
+            username = (
+                User.objects.filter(pk=author_id)
+                .values_list("username", flat=True)
+                .first()
+            )
+            cache.set(username_key(author_id), username, timeout=None)
+    return [stamp_key(POST, post_id), stamp_key(AUTHOR, username)]
+
+
+def stamped_response(request, view, args, kwargs, keys):
+    """Ответ из кэша по штампам keys или 304 по ETag и Last-Modified."""
+    stamps = get_stamps(keys)
+    version = hashlib.md5(
+        repr((request.get_full_path(), sorted(stamps.items()))).encode()
+    ).hexdigest()
+    etag = quote_etag(version)
+    last_modified = int(max(stamps.values()))
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is not None:
+        return response
+    page_key = f"page:{version}"
+    cached = cache.get(page_key)
+    if cached is None:
+        response = view(request, *args, **kwargs)
+        if response.status_code != 200 or response.streaming:
+            return response
+        cache.set(
+            page_key,
+            (response.content, response["Content-Type"]),
+            settings.PAGE_CACHE_TIMEOUT,
+        )
+    else:
+        content, content_type = cached
+        response = HttpResponse(content, content_type=content_type)
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+def cache_page_for_anonymous(stamp_keys):
+    """Кэширует ответ представления для анонимных GET-запросов.
+
+    stamp_keys(**kwargs) возвращает ключи штампов, от которых зависит
+    страница. Поддерживает условные запросы: при совпадении ETag или
+    Last-Modified отдаёт 304 без обращения к представлению.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (
+                request.method not in ("GET", "HEAD")
+                or request.user.is_authenticated
+            ):
+                return view(request, *args, **kwargs)
+            response = stamped_response(
+                request, view, args, kwargs, stamp_keys(**kwargs)
+            )
+            patch_vary_headers(response, ("Cookie",))
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def cache_public_page(stamp_keys):
+    """Как cache_page_for_anonymous, но для ответов, одинаковых для всех.
+
+    Такие ответы (например, JSON API) кэшируются и для вошедших
+    пользователей и не зависят от cookie.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+            return stamped_response(
+                request, view, args, kwargs, stamp_keys(**kwargs)
+            )
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,70 @@
+"""Кэш отрисованных карточек постов.
+
+Карточка зависит от поста, названия и адреса его группы, имени автора
+и готовности миниатюр. Всё это меняет Post.updated_at: сохранение поста
+обновляет поле само, а изменения группы, автора и миниатюр — через
+touch(). Поэтому ключ (пост, updated_at, вариант) никогда не указывает
+на устаревшую карточку, и одну карточку используют все ленты.
+
+Страница берёт карточки одним get_many и дорисовывает только
+недостающие. POST_CARD_CACHE_VERSION нужно увеличить при изменении
+шаблона карточки.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils import timezone
+
+from . import thumbnails
+
+TEMPLATE = "posts/includes/post_card.html"
+# Варианты карточки: в ленте группы не нужна ссылка на группу, в профиле —
+# на профиль автора
+VARIANTS = {
+    "feed": {},
+    "group": {"group_link_flag": True},
+    "profile": {"profile_link_flag": True},
+}
+
+
+def card_key(post, variant):
+    return (
+        f"post_card:{post.pk}:{post.updated_at:%Y%m%d%H%M%S%f}:{variant}"
+    )
+
+
+def render_cards(posts, variant="feed"):
+    """HTML карточек постов по порядку; отсутствующие в кэше рисуются."""
+    flags = VARIANTS[variant]
+    posts = list(posts)
+    keys = [card_key(post, variant) for post in posts]
+    version = settings.POST_CARD_CACHE_VERSION
+    cards = cache.get_many(keys, version=version)
+    to_render = [
+        (post, key) for post, key in zip(posts, keys) if key not in cards
+    ]
+    # Варианты картинок всех недостающих карточек — одним чтением.
+    pictures = {
+        (pk, "card"): picture
+        for pk, picture in thumbnails.ready_pictures(
+            [post for post, _ in to_render], "card"
+        ).items()
+    }
+    missing = {}
+    template = None
+    for post, key in to_render:
+        template = template or get_template(TEMPLATE)
+        missing[key] = template.render(
+            {"post": post, "pictures": pictures, **flags}
+        )
+    if missing:
+        cache.set_many(
+            missing, settings.POST_CARD_CACHE_TIMEOUT, version=version
+        )
+        cards.update(missing)
+    return [cards[key] for key in keys]
+
+
+def touch(posts):
+    """Отмечает карточки постов queryset posts устаревшими."""
+    return posts.update(updated_at=timezone.now())
@@ -0,0 +1,126 @@
+from django.db import transaction
+from django.db.models import (Case, Count, F, IntegerField, OuterRef,
+                              Subquery, When)
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, User, UserCounters
+
+# Сколько пользователей сдвигать одним UPDATE в bump_users.
+BUMP_BATCH_SIZE = 500
+
+
+def count_subquery(queryset, field):
+    """Подзапрос «сколько строк queryset ссылаются на OuterRef('pk')»."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("pk"))
+            .values("total"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def bump(queryset, **deltas):
+    """Атомарно сдвигает счётчики через UPDATE ... SET x = x + delta.
+
+    Счётчик не опускается ниже нуля: расхождение чинит manage.py recount.
+    """
+    floors = {
+        f"{field}__gte": -delta for field, delta in deltas.items() if delta < 0
+    }
+    return queryset.filter(**floors).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+
+
+def bump_user(user_id, **deltas):
+    """Сдвигает счётчики пользователя.
+
+    Если строки ещё нет, при росте счётчика она создаётся пересчётом.
+    """
+    with transaction.atomic():
+        if bump(UserCounters.objects.filter(user_id=user_id), **deltas):
+            return
+        if all(delta > 0 for delta in deltas.values()):
+            UserCounters.objects.get_or_create(
+                user_id=user_id, defaults=UserCounters.count_for(user_id)
+            )
+
+
+def bump_users(field, deltas):
+    """Сдвигает счётчик field многих пользователей: {user_id: delta}.
+
+    Один UPDATE ... CASE на пачку пользователей вместо запроса на
+    каждого. Как и bump(), не опускает счётчик ниже нуля.
+    """
+    user_ids = list(deltas)
+    for start in range(0, len(user_ids), BUMP_BATCH_SIZE):
+        batch = user_ids[start:start + BUMP_BATCH_SIZE]
+        UserCounters.objects.filter(user_id__in=batch).update(
+            **{
+                field: Case(
+                    *(
+                        When(
+                            user_id=user_id,
+                            **(
+                                {f"{field}__gte": -deltas[user_id]}
+                                if deltas[user_id] < 0
+                                else {}
+                            ),
+                            then=F(field) + deltas[user_id],
+                        )
+                        for user_id in batch
+                    ),
+                    default=F(field),
+                )
+            }
+        )
+
+
+def recount_groups(groups=None):
+    """Пересчитывает post_count групп queryset groups (по умолчанию всех)."""
+    if groups is None:
+        groups = Group.objects.all()
+    return groups.update(
+        post_count=count_subquery(Post.objects.all(), "group")
+    )
+
+
+def recount_posts(posts=None):
+    """Пересчитывает comment_count постов queryset posts."""
+    if posts is None:
+        posts = Post.objects.all()
+    return posts.update(
+        comment_count=count_subquery(Comment.objects.all(), "post")
+    )
+
+
+def recount_users(users=None):
+    """Пересчитывает счётчики пользователей queryset users.
+
+    Недостающие строки UserCounters создаются.
+    """
+    counters = UserCounters.objects.all()
+    if users is None:
+        users = User.objects.all()
+    else:
+        counters = counters.filter(user__in=users)
+    existing = UserCounters.objects.values("user_id")
+    UserCounters.objects.bulk_create(
+        (
+            UserCounters(user_id=user_id)
+            for user_id in users.exclude(pk__in=existing)
+            .values_list("pk", flat=True)
+            .iterator()
+        ),
+    )
+    return counters.update(
+        post_count=count_subquery(Post.objects.all(), "author"),
+        comment_count=count_subquery(Comment.objects.all(), "author"),
+        follower_count=count_subquery(Follow.objects.all(), "author"),
+        following_count=count_subquery(Follow.objects.all(), "user"),
+    )
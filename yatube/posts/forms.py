@@ -1,5 +1,8 @@
 from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
 
+from . import uploads
 from .models import Comment, Post
 
 
@@ -22,6 +25,39 @@ class PostForm(forms.ModelForm):
             "image": "Выберите изображение",
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Обрезанный обработчиком загрузки файл не отдаём полю картинки:
+        # оно попыталось бы его открыть.
+        self.image_oversized = getattr(
+            self.files.get("image"), "oversized", False
+        )
+        if self.image_oversized:
+            self.files = self.files.copy()
+            del self.files["image"]
+
+    def clean_image(self):
+        image = self.cleaned_data.get("image")
+        if not isinstance(image, UploadedFile):
+            return image
+        return uploads.reencode(image, uploads.check_image(image))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.image_oversized:
+            megabytes = settings.POST_IMAGE_MAX_BYTES / 1024 / 1024
+            self.add_error("image", f"Файл больше {megabytes:g} МБ.")
+        return cleaned_data
+
+    def save(self, commit=True):
+        """Запоминает размеры картинки: поле уже прочитало её при проверке."""
+        if "image" in self.changed_data:
+            image = getattr(self.cleaned_data["image"], "image", None)
+            self.instance.image_width, self.instance.image_height = (
+                image.size if image is not None else (None, None)
+            )
+        return super().save(commit)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,425 @@
+"""Массовый импорт постов и комментариев со старой платформы.
+
+Вход — поток записей NDJSON или CSV с полями type (post или comment),
+id, text, author, group, pub_date, image и post (id поста комментария).
+Авторы и группы ищутся по словарям в памяти, недостающие создаются
+пачкой. Строки пишутся bulk_create пачками по batch_size, а каждые
+chunk_size записей фиксируются отдельной транзакцией, после которой
+сохраняется контрольная точка: прерванный импорт продолжается с неё.
+Картинки копируются в хранилище пулом потоков, пока собирается пачка.
+
+HTML текста (posts.markup) готовится при сборке строк. bulk_create не
+вызывает сигналы, поэтому счётчики, поисковый индекс, ленты подписок и
+кэш страниц обновляются один раз в конце (finalize) — только для
+затронутых импортом строк. Что затронуто, хранит state(): его пишут в
+контрольную точку, чтобы продолженный импорт пересчитал и то, что
+загрузили до прерывания.
+"""
+import csv
+import json
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image
+
+from . import cache as page_cache
+from . import markup, search, timeline
+from .bulk import explicit_pub_date
+from .counters import recount_groups, recount_posts, recount_users
+from .models import Comment, Follow, Group, Post, User
+from .paginate_utils import feed_count_key
+
+POST = "post"
+COMMENT = "comment"
+# Не больше стольких параметров в одном IN (...): лимит SQLite — 999.
+LOOKUP_CHUNK = 500
+
+
+# Строки модели, которые затронул импорт: pk больше floor (новые) или
+# из extra (явные id ниже floor и старые посты с новыми комментариями).
+Touched = namedtuple("Touched", "floor extra")
+
+
+class RecordError(ValueError):
+    """Запись, которую нельзя импортировать."""
+
+
+def read_records(stream, data_format):
+    """Записи входного потока как словари."""
+    if data_format == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as error:
+            # Битая строка — ошибка записи, а не всего импорта.
+            yield RecordError(f"неверный JSON: {error}")
+
+
+def parse_date(value):
+    """Дата записи; дата с поясом переводится в местное время без пояса.
+
+    С USE_TZ = False bulk_create не примет дату с поясом и сорвал бы всю
+    пачку.
+    """
+    pub_date = datetime.fromisoformat(value)
+    if timezone.is_aware(pub_date):
+        pub_date = timezone.make_naive(pub_date)
+    return pub_date
+
+
+def chunked(values, size=LOOKUP_CHUNK):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def copy_image(source_root, path):
+    """Копирует картинку в хранилище; возвращает имя и размеры."""
+    with open(os.path.join(source_root, path), "rb") as source:
+        with Image.open(source) as image:
+            width, height = image.size
+        source.seek(0)
+        name = default_storage.save(
+            "posts/" + os.path.basename(path), File(source)
+        )
+    return name, width, height
+
+
+def max_pk(model):
+    return model.objects.aggregate(top=Max("pk"))["top"] or 0
+
+
+def touched_rows(model, touched):
+    """Querysets затронутых строк: новые и пачки явных id."""
+    return [
+        model.objects.filter(pk__gt=touched.floor),
+        *(
+            model.objects.filter(pk__in=pks)
+            for pks in chunked(sorted(touched.extra))
+        ),
+    ]
+
+
+class Stats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.records = 0
+        self.posts = 0
+        self.comments = 0
+        self.images = 0
+        self.errors = 0
+
+    @property
+    def rate(self):
+        return self.records / max(time.perf_counter() - self.started, 1e-9)
+
+    def __str__(self):
+        return (
+            f"записей {self.records}, постов {self.posts}, комментариев "
+            f"{self.comments}, картинок {self.images}, ошибок "
+            f"{self.errors}; {self.rate:.0f} записей/с"
+        )
+
+
+class PostImporter:
+    def __init__(self, batch_size=1000, chunk_size=10000, images_root=None,
+                 workers=4, create_missing=True, log=None, state=None):
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.images_root = images_root
+        self.create_missing = create_missing
+        self.log = log or (lambda message: None)
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.password = make_password(None)
+        self.authors = dict(User.objects.values_list("username", "pk"))
+        self.groups = dict(Group.objects.values_list("slug", "pk"))
+        # Авторы и группы импортированных строк: имя -> id.
+        self.touched_authors = {}
+        self.touched_groups = {}
+        self.touched_posts = Touched(max_pk(Post), set())
+        self.touched_comments = Touched(max_pk(Comment), set())
+        if state is not None:
+            self.restore(state)
+        self.stats = Stats()
+        self.posts = []
+        self.comments = []
+        self.existing_posts = set()
+
+    def state(self):
+        """Затронутые строки для контрольной точки (JSON)."""
+        return {
+            "authors": self.touched_authors,
+            "groups": self.touched_groups,
+            "posts": [
+                self.touched_posts.floor, sorted(self.touched_posts.extra)
+            ],
+            "comments": [
+                self.touched_comments.floor,
+                sorted(self.touched_comments.extra),
+            ],
+        }
+
+    def restore(self, state):
+        """Продолжает учёт затронутых строк из state() прерванного импорта."""
+        self.touched_authors.update(state["authors"])
+        self.touched_groups.update(state["groups"])
+        self.touched_posts = Touched(
+            state["posts"][0], set(state["posts"][1])
+        )
+        self.touched_comments = Touched(
+            state["comments"][0], set(state["comments"][1])
+        )
+
+    def run(self, records, offset=0, checkpoint=None):
+        """Импортирует записи, пропустив первые offset.
+
+        checkpoint(offset, state) вызывается после каждой зафиксированной
+        транзакции с числом обработанных записей и state().
+        """
+        records = islice(records, offset, None)
+        position = offset
+        try:
+            with explicit_pub_date():
+                while True:
+                    chunk = list(islice(records, self.chunk_size))
+                    if not chunk:
+                        break
+                    with transaction.atomic():
+                        self.import_chunk(chunk, position)
+                    position += len(chunk)
+                    if checkpoint is not None:
+                        checkpoint(position, self.state())
+                    self.log(f"{position}: {self.stats}")
+        finally:
+            self.pool.shutdown()
+        return position
+
+    def import_chunk(self, records, offset):
+        for number, record in enumerate(records, start=offset + 1):
+            self.stats.records += 1
+            try:
+                self.add(record)
+            except (RecordError, KeyError, ValueError) as error:
+                self.stats.errors += 1
+                self.log(f"Запись {number} пропущена: {error!r}")
+            if len(self.posts) + len(self.comments) >= self.batch_size:
+                self.flush()
+        self.flush()
+
+    def add(self, record):
+        if isinstance(record, RecordError):
+            raise record
+        kind = record.get("type") or POST
+        if kind not in (POST, COMMENT):
+            raise RecordError(f"неизвестный тип {kind}")
+        if not record.get("text"):
+            raise RecordError("пустой текст")
+        row = {
+            "id": int(record["id"]) if record.get("id") else None,
+            "text": record["text"],
+            "author": record["author"],
+            "pub_date": (
+                parse_date(record["pub_date"])
+                if record.get("pub_date")
+                else datetime.now()
+            ),
+        }
+        if kind == COMMENT:
+            row["post"] = int(record["post"])
+            self.comments.append(row)
+            return
+        row["group"] = record.get("group") or None
+        row["image"] = None
+        if record.get("image") and self.images_root:
+            row["image"] = self.pool.submit(
+                copy_image, self.images_root, record["image"]
+            )
+        self.posts.append(row)
+
+    def resolve(self, lookup, keys, model, field, make):
+        """Дополняет словарь lookup недостающими объектами."""
+        missing = {key for key in keys if key not in lookup}
+        if not missing:
+            return
+        if self.create_missing:
+            model.objects.bulk_create(
+                (make(key) for key in sorted(missing)), ignore_conflicts=True
+            )
+        for keys_chunk in chunked(missing):
+            lookup.update(
+                model.objects.filter(**{f"{field}__in": keys_chunk})
+                .values_list(field, "pk")
+            )
+
+    def flush(self):
+        rows = self.posts + self.comments
+        if not rows:
+            return
+        self.resolve(
+            self.authors,
+            (row["author"] for row in rows),
+            User,
+            "username",
+            lambda username: User(
+                username=username, password=self.password
+            ),
+        )
+        self.resolve(
+            self.groups,
+            (row["group"] for row in self.posts if row["group"]),
+            Group,
+            "slug",
+            lambda slug: Group(title=slug, slug=slug, description=""),
+        )
+        Post.objects.bulk_create(
+            filter(None, map(self.build_post, self.posts)),
+            ignore_conflicts=True,
+        )
+        # Комментарий к посту, которого нет, сорвал бы всю транзакцию на
+        # проверке внешних ключей, поэтому посты проверяются заранее.
+        self.existing_posts = set()
+        for post_ids in chunked({row["post"] for row in self.comments}):
+            self.existing_posts.update(
+                Post.objects.filter(pk__in=post_ids).values_list(
+                    "pk", flat=True
+                )
+            )
+        Comment.objects.bulk_create(
+            filter(None, map(self.build_comment, self.comments)),
+            ignore_conflicts=True,
+        )
+        self.posts = []
+        self.comments = []
+
+    def author_id(self, row):
+        author_id = self.authors.get(row["author"])
+        if author_id is None:
+            self.stats.errors += 1
+            self.log(f"Нет автора {row['author']}")
+            return None
+        self.touched_authors[row["author"]] = author_id
+        return author_id
+
+    def touch(self, touched, pk):
+        # Строки выше floor finalize найдёт по диапазону pk.
+        if pk is not None and pk <= touched.floor:
+            touched.extra.add(pk)
+
+    def build_post(self, row):
+        author_id = self.author_id(row)
+        if author_id is None:
+            return None
+        group_id = self.groups.get(row["group"]) if row["group"] else None
+        if group_id is not None:
+            self.touched_groups[row["group"]] = group_id
+        image, width, height = "", None, None
+        if row["image"] is not None:
+            try:
+                image, width, height = row["image"].result()
+                self.stats.images += 1
+            except (OSError, ValueError) as error:
+                self.stats.errors += 1
+                self.log(f"Картинка поста {row['id']} не скопирована: {error}")
+        self.stats.posts += 1
+        self.touch(self.touched_posts, row["id"])
+        post = Post(
+            pk=row["id"],
+            text=row["text"],
+            author_id=author_id,
+            group_id=group_id,
+            pub_date=row["pub_date"],
+            image=image,
+            image_width=width,
+            image_height=height,
+        )
+        markup.render_fields(post)
+        return post
+
+    def build_comment(self, row):
+        if row["post"] not in self.existing_posts:
+            self.stats.errors += 1
+            self.log(f"Нет поста {row['post']} для комментария {row['id']}")
+            return None
+        author_id = self.author_id(row)
+        if author_id is None:
+            return None
+        self.stats.comments += 1
+        self.touch(self.touched_comments, row["id"])
+        # У поста изменилось число комментариев.
+        self.touch(self.touched_posts, row["post"])
+        comment = Comment(
+            pk=row["id"],
+            text=row["text"],
+            author_id=author_id,
+            post_id=row["post"],
+            pub_date=row["pub_date"],
+        )
+        markup.render_fields(comment)
+        return comment
+
+    def finalize(self):
+        """Обновляет всё, что обычно поддерживают сигналы."""
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                no_style(), [Post, Comment, User, Group]
+            ):
+                cursor.execute(sql)
+        posts = touched_rows(Post, self.touched_posts)
+        comments = touched_rows(Comment, self.touched_comments)
+        with transaction.atomic():
+            for group_ids in chunked(self.touched_groups.values()):
+                recount_groups(Group.objects.filter(pk__in=group_ids))
+            for author_ids in chunked(self.touched_authors.values()):
+                recount_users(User.objects.filter(pk__in=author_ids))
+            for touched_posts in posts:
+                recount_posts(touched_posts)
+            for touched_posts in posts:
+                search.reindex(touched_posts, Comment.objects.none())
+            for touched_comments in comments:
+                search.reindex(Post.objects.none(), touched_comments)
+            for author_ids in chunked(self.touched_authors.values()):
+                follows = Follow.objects.filter(
+                    author_id__in=author_ids
+                ).values_list("user_id", "author_id")
+                for user_id, author_id in follows.iterator():
+                    timeline.backfill(user_id, author_id)
+        cache.delete_many(
+            [
+                feed_count_key("index"),
+                *(
+                    feed_count_key("profile", pk)
+                    for pk in self.touched_authors.values()
+                ),
+                *(
+                    feed_count_key("group", pk)
+                    for pk in self.touched_groups.values()
+                ),
+            ]
+        )
+        page_cache.bump(
+            page_cache.stamp_key(page_cache.FEED),
+            *(
+                page_cache.stamp_key(page_cache.AUTHOR, username)
+                for username in self.touched_authors
+            ),
+            *(
+                page_cache.stamp_key(page_cache.GROUP, slug)
+                for slug in self.touched_groups
+            ),
+        )
@@ -0,0 +1,305 @@
+"""Нагрузочный прогон: параллельные чтения, ленты подписок и записи.
+
+Потоки-клиенты ходят по HTTP к запущенному серверу и выбирают сценарий
+по весам смеси. У каждой точки входа своя гистограмма задержек с
+логарифмическими корзинами, как в HdrHistogram: относительная ошибка
+процентилей не больше одной корзины при любом разбросе значений.
+
+Блокировки SQLite сервер считает сам: исключение «database is locked»
+приходит в сигнал got_request_exception, а заголовок запроса говорит,
+к какой точке входа он относится.
+"""
+import http.client
+import math
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlencode, urlsplit
+
+from django.core.signals import got_request_exception
+from django.db import OperationalError
+from django.test import Client
+from django.urls import reverse
+
+from .models import Group, Post, User
+
+ENDPOINT_HEADER = "X-Load-Endpoint"
+DEFAULT_MIX = "read=70,follow=20,write=10"
+# Сценарии смеси и точки входа, которые они вызывают
+SCENARIOS = {
+    "read": ("index", "group_list", "profile", "post_detail"),
+    "follow": ("follow_index",),
+    "write": ("add_comment", "post_create"),
+}
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class Histogram:
+    """Гистограмма задержек в микросекундах с заданной точностью.
+
+    Значение округляется вниз до digits значащих цифр: корзина 1234 мкс
+    при двух цифрах — 1200 мкс, поэтому память растёт с числом
+    порядков, а не с числом замеров.
+    """
+
+    def __init__(self, digits=2):
+        self.digits = digits
+        self.counts = Counter()
+        self.total = 0
+        self.max = 0
+
+    def bucket(self, value):
+        if value < 10 ** self.digits:
+            return value
+        step = 10 ** (int(math.log10(value)) - self.digits + 1)
+        return value // step * step
+
+    def record(self, seconds):
+        value = max(int(seconds * 1_000_000), 0)
+        self.counts[self.bucket(value)] += 1
+        self.total += 1
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        self.counts.update(other.counts)
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, share):
+        """Нижняя граница корзины, в которую попадает процентиль."""
+        if not self.total:
+            return 0
+        rank = max(math.ceil(share / 100 * self.total), 1)
+        seen = 0
+        for value in sorted(self.counts):
+            seen += self.counts[value]
+            if seen >= rank:
+                return value
+        return self.max
+
+    def lines(self, width=40):
+        """Текстовый вид: корзины по степеням двойки со столбиками."""
+        if not self.total:
+            return []
+        grouped = Counter()
+        for value, count in self.counts.items():
+            grouped[1 << max(value, 1).bit_length() - 1] += count
+        peak = max(grouped.values())
+        return [
+            f"{low / 1000:>9.3f} мс {count:>7} "
+            f"{'#' * max(round(count / peak * width), 1)}"
+            for low, count in sorted(grouped.items())
+        ]
+
+
+class EndpointStats:
+    def __init__(self):
+        self.histogram = Histogram()
+        self.errors = 0
+        self.locks = 0
+
+    def merge(self, other):
+        self.histogram.merge(other.histogram)
+        self.errors += other.errors
+        self.locks += other.locks
+
+
+def parse_mix(mix):
+    """«read=70,follow=20,write=10» → словарь весов сценариев."""
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(
+                f"Неизвестный сценарий {name!r}: "
+                f"доступны {', '.join(SCENARIOS)}"
+            )
+        weights[name] = float(weight or 1)
+    if not any(weights.values()):
+        raise ValueError("Все веса смеси нулевые")
+    return weights
+
+
+class LockCounter:
+    """Считает блокировки SQLite по точкам входа на стороне сервера."""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    def __call__(self, sender, request=None, **kwargs):
+        # Сигнал отправляется из блока except, исключение ещё доступно.
+        exception = sys.exc_info()[1]
+        if request is None or not isinstance(exception, OperationalError):
+            return
+        if "locked" not in str(exception):
+            return
+        endpoint = request.META.get(
+            "HTTP_" + ENDPOINT_HEADER.upper().replace("-", "_")
+        )
+        with self.lock:
+            self.counts[endpoint] += 1
+
+    def __enter__(self):
+        got_request_exception.connect(self, dispatch_uid="loadtest_locks")
+        return self
+
+    def __exit__(self, *exc_info):
+        got_request_exception.disconnect(dispatch_uid="loadtest_locks")
+
+
+class Targets:
+    """Адреса и учётные записи, из которых клиенты выбирают случайно."""
+
+    def __init__(self, sample=200, users=50):
+        self.post_ids = list(
+            Post.objects.order_by("?").values_list("pk", flat=True)[:sample]
+        )
+        self.slugs = list(
+            Group.objects.order_by("?").values_list("slug", flat=True)[
+                :sample
+            ]
+        )
+        self.usernames = list(
+            User.objects.order_by("?").values_list("username", flat=True)[
+                :sample
+            ]
+        )
+        self.group_ids = list(
+            Group.objects.order_by("?").values_list("pk", flat=True)[:sample]
+        )
+        # Для лент и записей — те, у кого есть подписки.
+        readers = User.objects.filter(follower__isnull=False).distinct()
+        self.sessions = [
+            self.session(user) for user in readers.order_by("?")[:users]
+        ]
+        if not self.post_ids or not self.sessions:
+            raise LookupError(
+                "Нужны посты и пользователи с подписками: "
+                "заполните базу командой seed"
+            )
+
+    @staticmethod
+    def session(user):
+        """Cookie сессии и CSRF без ввода пароля."""
+        client = Client()
+        client.force_login(user)
+        client.get(reverse("posts:post_create"))
+        return {
+            name: morsel.value for name, morsel in client.cookies.items()
+        }
+
+
+class LoadDriver:
+    """Потоки-клиенты, которые заданное время шлют запросы смеси."""
+
+    def __init__(self, base_url, targets, weights, concurrency=8,
+                 duration=10.0, seed=0, timeout=30.0):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port
+        self.prefix = parts.path.rstrip("/")
+        self.targets = targets
+        self.scenarios = list(weights)
+        self.weights = list(weights.values())
+        self.concurrency = concurrency
+        self.duration = duration
+        self.seed = seed
+        self.timeout = timeout
+        self.stats = {}
+        self.elapsed = 0.0
+
+    def request(self, rng, endpoint, session):
+        """Метод, путь, тело и cookie одного запроса к точке входа."""
+        targets = self.targets
+        if endpoint in SCENARIOS["read"]:
+            choices = {
+                "group_list": targets.slugs,
+                "profile": targets.usernames,
+                "post_detail": targets.post_ids,
+            }.get(endpoint)
+            args = [rng.choice(choices)] if choices else []
+            return "GET", reverse(f"posts:{endpoint}", args=args), None, None
+        if endpoint == "follow_index":
+            return "GET", reverse("posts:follow_index"), None, session
+        form = {"csrfmiddlewaretoken": session.get("csrftoken", "")}
+        if endpoint == "add_comment":
+            form["text"] = f"Нагрузочный комментарий {rng.random()}"
+            url = reverse(
+                "posts:add_comment", args=[rng.choice(targets.post_ids)]
+            )
+        else:
+            form["text"] = f"Нагрузочный пост {rng.random()}"
+            if targets.group_ids:
+                form["group"] = rng.choice(targets.group_ids)
+            url = reverse("posts:post_create")
+        return "POST", url, urlencode(form), session
+
+    def send(self, method, url, body, session, endpoint):
+        headers = {ENDPOINT_HEADER: endpoint}
+        if session:
+            headers["Cookie"] = "; ".join(
+                f"{name}={value}" for name, value in session.items()
+            )
+        if body is not None:
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        connection = http.client.HTTPConnection(
+            self.host, self.port, timeout=self.timeout
+        )
+        try:
+            connection.request(method, self.prefix + url, body, headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        finally:
+            connection.close()
+
+    def worker(self, number, deadline):
+        rng = random.Random(self.seed * 1000 + number)
+        session = self.targets.sessions[
+            number % len(self.targets.sessions)
+        ]
+        stats = {}
+        while time.perf_counter() < deadline:
+            scenario = rng.choices(self.scenarios, self.weights)[0]
+            endpoint = rng.choice(SCENARIOS[scenario])
+            method, url, body, cookies = self.request(rng, endpoint, session)
+            endpoint_stats = stats.setdefault(endpoint, EndpointStats())
+            started = time.perf_counter()
+            try:
+                status = self.send(method, url, body, cookies, endpoint)
+            except (OSError, http.client.HTTPException):
+                status = None
+            endpoint_stats.histogram.record(time.perf_counter() - started)
+            # Записи и закрытые страницы отвечают перенаправлением.
+            if status is None or status >= 400:
+                endpoint_stats.errors += 1
+        self.stats[number] = stats
+
+    def run(self):
+        """Прогон; возвращает статистику по точкам входа."""
+        with LockCounter() as locks:
+            started = time.perf_counter()
+            deadline = started + self.duration
+            threads = [
+                threading.Thread(target=self.worker, args=(number, deadline))
+                for number in range(self.concurrency)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.elapsed = time.perf_counter() - started
+        merged = {}
+        for stats in self.stats.values():
+            for endpoint, endpoint_stats in stats.items():
+                merged.setdefault(endpoint, EndpointStats()).merge(
+                    endpoint_stats
+                )
+        for endpoint, count in locks.counts.items():
+            if endpoint in merged:
+                merged[endpoint].locks += count
+        return merged
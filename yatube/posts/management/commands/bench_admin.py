@@ -0,0 +1,138 @@
+import time
+from datetime import datetime, timedelta
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from posts.bulk import explicit_pub_date
+from posts.models import Comment, Follow, Group, Post, User
+
+BENCH_PREFIX = "bench_admin_"
+# Бюджет одной страницы списка: он не зависит от числа строк в таблицах;
+# запросов больше всего у месяца — по одному на каждый день с записями
+MAX_QUERIES = 40
+MAX_BYTES = 150 * 1024
+
+
+class Rollback(Exception):
+    """Откатывает транзакцию с тестовыми данными."""
+
+
+def changelist_urls(post):
+    """Страницы админки, которые проверяет замер."""
+    year = post.pub_date.year
+    month = post.pub_date.month
+    return (
+        ("посты", "/admin/posts/post/"),
+        ("посты за год", f"/admin/posts/post/?pub_date__year={year}"),
+        (
+            "посты за месяц",
+            f"/admin/posts/post/?pub_date__year={year}"
+            f"&pub_date__month={month}",
+        ),
+        ("комментарии", "/admin/posts/comment/"),
+        ("подписки", "/admin/posts/follow/"),
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Замерить запросы, объём и время страниц списков админки на "
+        "большой базе. Данные создаются в транзакции и откатываются."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=1_000_000)
+        parser.add_argument("--users", type=int, default=10_000)
+        parser.add_argument(
+            "--compare",
+            action="store_true",
+            help="Замерить и без ADMIN_PERFORMANCE_MODE",
+        )
+
+    def handle(self, *args, **options):
+        over_budget = []
+        try:
+            with transaction.atomic():
+                post = self.seed(options["posts"], options["users"])
+                admin = User.objects.create_superuser(
+                    f"{BENCH_PREFIX}admin", "admin@example.com", "password"
+                )
+                client = Client()
+                client.force_login(admin)
+                modes = (True, False) if options["compare"] else (True,)
+                for mode in modes:
+                    with override_settings(ADMIN_PERFORMANCE_MODE=mode):
+                        over_budget += self.report(client, post, mode)
+                raise Rollback
+        except Rollback:
+            pass
+        if over_budget:
+            raise CommandError(
+                "Превышен бюджет: " + ", ".join(over_budget)
+            )
+
+    def seed(self, posts, users):
+        User.objects.bulk_create(
+            User(username=f"{BENCH_PREFIX}{index}") for index in range(users)
+        )
+        authors = list(
+            User.objects.filter(username__startswith=BENCH_PREFIX)
+        )
+        Group.objects.bulk_create(
+            Group(
+                title=f"{BENCH_PREFIX}{index}",
+                slug=f"{BENCH_PREFIX}{index}",
+                description="",
+            )
+            for index in range(100)
+        )
+        groups = list(Group.objects.filter(slug__startswith=BENCH_PREFIX))
+        start = datetime(2015, 1, 1)
+        with explicit_pub_date():
+            Post.objects.bulk_create(
+                Post(
+                    text=f"{BENCH_PREFIX}{index}",
+                    author=authors[index % len(authors)],
+                    group=groups[index % len(groups)],
+                    pub_date=start + timedelta(minutes=5 * index),
+                )
+                for index in range(posts)
+            )
+            post = Post.objects.order_by("-pub_date").first()
+            Comment.objects.bulk_create(
+                Comment(
+                    text=f"{BENCH_PREFIX}{index}",
+                    author=authors[index % len(authors)],
+                    post=post,
+                    pub_date=start + timedelta(minutes=5 * index),
+                )
+                for index in range(posts // 10)
+            )
+        Follow.objects.bulk_create(
+            Follow(user=authors[index], author=authors[index + 1])
+            for index in range(len(authors) - 1)
+        )
+        return post
+
+    def report(self, client, post, mode):
+        title = "Режим производительности" if mode else "Обычный режим"
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        over_budget = []
+        for name, url in changelist_urls(post):
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = client.get(url)
+                elapsed = (time.perf_counter() - started) * 1000
+            size = len(response.content)
+            self.stdout.write(
+                f"{name}: {response.status_code}, запросов "
+                f"{len(queries)}, {size / 1024:.0f} КБ, {elapsed:.0f} мс"
+            )
+            if mode and (len(queries) > MAX_QUERIES or size > MAX_BYTES):
+                over_budget.append(name)
+        return over_budget
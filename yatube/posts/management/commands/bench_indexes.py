@@ -0,0 +1,190 @@
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import IntegerField, Value
+
+from posts import timeline
+from posts.bulk import explicit_pub_date
+from posts.models import Comment, Follow, Group, Post, TimelineEntry, User
+
+BENCH_PREFIX = "bench_indexes_"
+
+
+class Rollback(Exception):
+    """Откатывает транзакцию с тестовыми данными и удалёнными индексами."""
+
+
+def feed_queries(context):
+    """Запросы всех лент в том виде, в каком их строят представления.
+
+    Лента подписок — два запроса ключей, которые сливает
+    posts.timeline.Timeline: её собственные строки и посты знаменитости.
+    """
+    return (
+        ("index", Post.objects.order_by("-pub_date", "-id")[:10]),
+        (
+            "group",
+            Post.objects.filter(group_id=context["group_id"]).order_by(
+                "-pub_date", "-id"
+            )[:10],
+        ),
+        (
+            "profile",
+            Post.objects.filter(author_id=context["author_id"]).order_by(
+                "-pub_date", "-id"
+            )[:10],
+        ),
+        (
+            "follow (join)",
+            Post.objects.filter(
+                author__following__user_id=context["user_id"]
+            ).order_by("-pub_date", "-id")[:10],
+        ),
+        (
+            "follow (timeline)",
+            timeline.Timeline(context["user_id"]).entry_keys()[:11],
+        ),
+        (
+            "follow (celebrity)",
+            timeline.Timeline(context["user_id"]).author_keys(
+                context["author_id"]
+            )[:11],
+        ),
+        (
+            "followers",
+            Follow.objects.filter(author_id=context["author_id"]).values(
+                "user_id"
+            ),
+        ),
+        (
+            "comments",
+            Comment.objects.filter(post_id=context["post_id"]).order_by(
+                "-pub_date", "-id"
+            )[:20],
+        ),
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнить планы и время запросов лент с индексами и без них. "
+        "Все изменения выполняются в транзакции и откатываются."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--posts",
+            type=int,
+            default=50000,
+            help="Сколько постов досоздать перед замером (0 — не создавать)",
+        )
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                context = self.seed(options["posts"])
+                self.report("С индексами", context, options["repeat"])
+                self.drop_indexes()
+                self.report("Без индексов", context, options["repeat"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, number):
+        users = [
+            User(username=f"{BENCH_PREFIX}{index}") for index in range(100)
+        ]
+        User.objects.bulk_create(users)
+        users = list(
+            User.objects.filter(username__startswith=BENCH_PREFIX)
+        )
+        Group.objects.bulk_create(
+            Group(
+                title=f"{BENCH_PREFIX}{index}",
+                slug=f"{BENCH_PREFIX}{index}",
+                description="",
+            )
+            for index in range(20)
+        )
+        groups = list(Group.objects.filter(slug__startswith=BENCH_PREFIX))
+        start = datetime(2020, 1, 1)
+        with explicit_pub_date():
+            self.seed_posts(users, groups, start, number)
+        reader = users[0]
+        Follow.objects.bulk_create(
+            Follow(user=reader, author=author) for author in users[1:20]
+        )
+        for author in users[1:20]:
+            timeline.backfill(reader.pk, author.pk)
+        post = Post.objects.filter(author=users[1]).first()
+        return {
+            "group_id": groups[0].pk,
+            "author_id": users[1].pk,
+            "user_id": reader.pk,
+            "post_id": post.pk if post else 0,
+        }
+
+    def seed_posts(self, users, groups, start, number):
+        Post.objects.bulk_create(
+            (
+                Post(
+                    text="bench",
+                    author=users[index % len(users)],
+                    group=groups[index % len(groups)],
+                    pub_date=start + timedelta(minutes=index),
+                )
+                for index in range(number)
+            ),
+        )
+        post = Post.objects.filter(author=users[1]).first()
+        if post is None:
+            return
+        Comment.objects.bulk_create(
+            (
+                Comment(
+                    text="bench",
+                    author=users[index % len(users)],
+                    post=post,
+                    pub_date=start + timedelta(minutes=index),
+                )
+                for index in range(min(number, 1000))
+            ),
+        )
+
+    def drop_indexes(self):
+        schema_editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for model in (Post, Comment, Follow, TimelineEntry):
+                for index in model._meta.indexes:
+                    cursor.execute(
+                        schema_editor.sql_delete_index
+                        % {
+                            "table": schema_editor.quote_name(
+                                model._meta.db_table
+                            ),
+                            "name": schema_editor.quote_name(index.name),
+                        }
+                    )
+
+    def report(self, title, context, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        # sqlite3 кэширует подготовленные запросы вместе с планом:
+        # уникальный псевдоним делает текст запроса новым для каждого замера.
+        phase = {f"phase_{abs(hash(title))}": Value(1, IntegerField())}
+        for name, queryset in feed_queries(context):
+            queryset = queryset.annotate(**phase)
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(
+                f"{name}: медиана {statistics.median(timings):.2f} мс, "
+                f"максимум {max(timings):.2f} мс"
+            )
+            for line in queryset.explain().splitlines():
+                self.stdout.write(f"    {line}")
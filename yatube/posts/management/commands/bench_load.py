@@ -0,0 +1,160 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import (ThreadedWSGIServer,
+                                          WSGIRequestHandler,
+                                          get_internal_wsgi_application)
+from django.db import connection
+from django.test.utils import override_settings
+
+from posts import benchmarks, loadtest
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class LoadServer(ThreadedWSGIServer):
+    # Очередь по умолчанию короче числа клиентов: отброшенные соединения
+    # повторяются через секунду и портят хвост гистограммы.
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузить локально запущенный сервер смесью чтений, лент подписок "
+        "и записей и показать пропускную способность, гистограммы задержек "
+        "и долю ошибок и блокировок SQLite. База — отдельный файл с "
+        "данными seed"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dataset",
+            choices=list(benchmarks.DATASETS),
+            default="small",
+        )
+        parser.add_argument(
+            "--mix",
+            default=loadtest.DEFAULT_MIX,
+            help="Веса сценариев: "
+            + ", ".join(
+                f"{name} ({', '.join(endpoints)})"
+                for name, endpoints in loadtest.SCENARIOS.items()
+            ),
+        )
+        parser.add_argument(
+            "--concurrency",
+            default="1,4,16",
+            help="Число потоков-клиентов через запятую",
+        )
+        parser.add_argument(
+            "--duration",
+            type=float,
+            default=10.0,
+            help="Секунд на каждый уровень параллельности",
+        )
+        parser.add_argument(
+            "--lock-timeout",
+            type=float,
+            default=5.0,
+            help="Сколько секунд SQLite ждёт снятия блокировки",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--histograms",
+            action="store_true",
+            help="Печатать гистограммы задержек точек входа",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            weights = loadtest.parse_mix(options["mix"])
+            levels = [
+                int(level) for level in options["concurrency"].split(",")
+            ]
+        except ValueError as error:
+            raise CommandError(error)
+        directory = tempfile.mkdtemp()
+        settings_dict = connection.settings_dict
+        settings_dict.setdefault("TEST", {})["NAME"] = os.path.join(
+            directory, "load.sqlite3"
+        )
+        settings_dict.setdefault("OPTIONS", {})["timeout"] = options[
+            "lock_timeout"
+        ]
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True
+        )
+        # Ожидаемые 500 при блокировках считаются отдельно, а не в логе.
+        logger = logging.getLogger("django.request")
+        level = logger.level
+        logger.setLevel(logging.CRITICAL)
+        try:
+            with override_settings(
+                MEDIA_ROOT=os.path.join(directory, "media"),
+                DEBUG=False,
+                ALLOWED_HOSTS=["127.0.0.1"],
+            ):
+                self.stdout.write(f"Заполнение данных: {options['dataset']}")
+                benchmarks.seed(options["dataset"])
+                targets = loadtest.Targets()
+                connection.close()
+                self.serve_and_load(targets, weights, levels, options)
+        finally:
+            logger.setLevel(level)
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def serve_and_load(self, targets, weights, levels, options):
+        server = LoadServer(("127.0.0.1", 0), QuietHandler)
+        server.set_app(get_internal_wsgi_application())
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        try:
+            for concurrency in levels:
+                driver = loadtest.LoadDriver(
+                    base_url,
+                    targets,
+                    weights,
+                    concurrency=concurrency,
+                    duration=options["duration"],
+                    seed=options["seed"],
+                )
+                stats = driver.run()
+                self.report(concurrency, driver.elapsed, stats, options)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def report(self, concurrency, elapsed, stats, options):
+        total = sum(item.histogram.total for item in stats.values())
+        self.stdout.write(
+            self.style.MIGRATE_HEADING(
+                f"Потоков: {concurrency}, запросов: {total}, "
+                f"{total / elapsed:.1f} в секунду"
+            )
+        )
+        for endpoint, item in sorted(stats.items()):
+            histogram = item.histogram
+            percentiles = ", ".join(
+                f"p{share:g} {histogram.percentile(share) / 1000:.1f}"
+                for share in loadtest.PERCENTILES
+            )
+            self.stdout.write(
+                f"{endpoint}: {histogram.total} "
+                f"({histogram.total / elapsed:.1f}/с), {percentiles}, "
+                f"max {histogram.max / 1000:.1f} мс, "
+                f"ошибок {item.errors / histogram.total:.1%}, "
+                f"блокировок {item.locks / histogram.total:.1%}"
+            )
+            if options["histograms"]:
+                for line in histogram.lines():
+                    self.stdout.write(f"    {line}")
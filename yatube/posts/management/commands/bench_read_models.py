@@ -0,0 +1,127 @@
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from posts.models import Group, Post, User
+from posts.read_models import feed_values, post_rows
+from posts.seeding import SeedPlan, Seeder
+
+SIZES = (10, 100, 1000)
+
+
+class Rollback(Exception):
+    """Откатывает транзакцию с тестовыми постами."""
+
+
+def feed_builders(author, group):
+    """Страница каждой ленты: моделями, как раньше, и строками."""
+    posts = Post.objects.order_by("-pub_date", "-id")
+    return (
+        (
+            "index",
+            lambda size: list(posts.select_related("author", "group")[:size]),
+            lambda size: post_rows(feed_values(posts)[:size]),
+        ),
+        (
+            "group",
+            lambda size: list(
+                posts.filter(group=group).select_related("author")[:size]
+            ),
+            lambda size: post_rows(
+                feed_values(posts.filter(group=group), group=group)[:size],
+                group=group,
+            ),
+        ),
+        (
+            "profile",
+            lambda size: list(
+                posts.filter(author=author).select_related("group")[:size]
+            ),
+            lambda size: post_rows(
+                feed_values(posts.filter(author=author), author=author)[
+                    :size
+                ],
+                author=author,
+            ),
+        ),
+    )
+
+
+def measure(build, size, repeat):
+    """Число строк, медиана процессорного времени (мс) и память (байт).
+
+    Память — сколько занимает готовая страница и пик при её сборке.
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.process_time()
+        build(size)
+        timings.append((time.process_time() - started) * 1000)
+    tracemalloc.start()
+    try:
+        page = build(size)
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return len(page), statistics.median(timings), retained, peak
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнить память и процессорное время страницы ленты из моделей и "
+        "из строк posts.read_models. Посты создаются в транзакции, которая "
+        "откатывается."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--posts",
+            type=int,
+            default=5000,
+            help="Сколько постов создать перед замером (0 — не создавать)",
+        )
+        parser.add_argument(
+            "--sizes", type=int, nargs="+", default=list(SIZES),
+            help="Размеры страницы",
+        )
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options["posts"]:
+                    Seeder(
+                        SeedPlan(
+                            users=50, groups=10, posts=options["posts"],
+                            comments=0, follows=0, image_share=0,
+                        )
+                    ).run()
+                self.report(options["sizes"], options["repeat"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def report(self, sizes, repeat):
+        # Самые большие автор и группа: их ленты заполняют страницы.
+        author = User.objects.annotate(total=Count("posts")).latest("total")
+        group = Group.objects.annotate(total=Count("posts")).latest("total")
+        for name, models, rows in feed_builders(author, group):
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for size in sizes:
+                number, models_ms, models_kb, models_peak = measure(
+                    models, size, repeat
+                )
+                _, rows_ms, rows_kb, rows_peak = measure(rows, size, repeat)
+                self.stdout.write(
+                    f"{size} на странице ({number} постов): "
+                    f"модели {models_ms:.2f} мс, {models_kb / 1024:.1f} КБ "
+                    f"(пик {models_peak / 1024:.1f} КБ); "
+                    f"строки {rows_ms:.2f} мс, {rows_kb / 1024:.1f} КБ "
+                    f"(пик {rows_peak / 1024:.1f} КБ); "
+                    f"память x{models_kb / max(rows_kb, 1):.1f}, "
+                    f"время x{models_ms / max(rows_ms, 0.001):.1f}"
+                )
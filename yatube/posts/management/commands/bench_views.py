@@ -0,0 +1,102 @@
+import shutil
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+
+from posts import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Замерить задержку, запросы и объём всех страниц на данных разного "
+        "размера и сравнить с базовой линией. Замер идёт в отдельной "
+        "тестовой базе"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--datasets",
+            nargs="+",
+            choices=list(benchmarks.DATASETS),
+            default=["small", "medium"],
+        )
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument(
+            "--baseline",
+            default=benchmarks.BASELINE_PATH,
+            help="Файл базовой линии",
+        )
+        parser.add_argument(
+            "--update-baseline",
+            action="store_true",
+            help="Записать замеры в базовую линию вместо сравнения",
+        )
+        parser.add_argument(
+            "--no-latency",
+            action="store_true",
+            help="Не сравнивать время: оно зависит от машины",
+        )
+
+    def handle(self, *args, **options):
+        baseline = benchmarks.load_baseline(options["baseline"])
+        regressions = []
+        for dataset in options["datasets"]:
+            results = self.run_dataset(dataset, options["repeat"])
+            self.report(dataset, results)
+            if options["update_baseline"]:
+                baseline[dataset] = results
+                continue
+            if dataset not in baseline:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"Нет базовой линии для {dataset}: "
+                        "запустите с --update-baseline"
+                    )
+                )
+                continue
+            found = benchmarks.compare(
+                results, baseline[dataset], not options["no_latency"]
+            )
+            regressions += [f"{dataset}: {line}" for line in found]
+        if options["update_baseline"]:
+            benchmarks.save_baseline(baseline, options["baseline"])
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Базовая линия записана в {options['baseline']}"
+                )
+            )
+        if regressions:
+            raise CommandError(
+                "Регрессии производительности:\n" + "\n".join(regressions)
+            )
+
+    def run_dataset(self, dataset, repeat):
+        """Замер на свежей тестовой базе с данными одного размера."""
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Данные: {dataset}"))
+        media_root = tempfile.mkdtemp()
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True
+        )
+        try:
+            with override_settings(MEDIA_ROOT=media_root, DEBUG=False):
+                benchmarks.seed(dataset)
+                return benchmarks.measure(repeat)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(media_root, ignore_errors=True)
+
+    def report(self, dataset, results):
+        for case, metrics in results.items():
+            self.stdout.write(
+                f"{case}: {metrics['status']}, "
+                f"p50 {metrics['p50_ms']:.1f} мс, "
+                f"p95 {metrics['p95_ms']:.1f} мс, "
+                f"запросов {metrics['queries']} "
+                f"({metrics['sql_ms']:.1f} мс), "
+                f"{metrics['bytes'] / 1024:.1f} КБ"
+            )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate
+
+
+class Command(BaseCommand):
+    help = (
+        "Подготовить миниатюры картинок всех постов, например для постов, "
+        "загруженных до появления фоновой обработки"
+    )
+
+    def handle(self, *args, **options):
+        posts = (
+            Post.objects.exclude(image="")
+            .select_related("author")
+            .order_by("pk")
+        )
+        number = 0
+        for post in posts.iterator():
+            generate(post)
+            number += 1
+        self.stdout.write(
+            self.style.SUCCESS(f"Обработано постов с картинками: {number}")
+        )
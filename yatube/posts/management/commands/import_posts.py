@@ -0,0 +1,121 @@
+import json
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from posts.importer import PostImporter, read_records
+
+
+class Command(BaseCommand):
+    help = (
+        "Импортировать посты и комментарии из NDJSON или CSV пачками "
+        "bulk_create с контрольными точками"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Файл с записями или - для stdin")
+        parser.add_argument(
+            "--format",
+            choices=("ndjson", "csv"),
+            help="Формат входа; по умолчанию по расширению файла",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=10000,
+            help="Сколько записей фиксировать одной транзакцией",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="Файл контрольной точки; по умолчанию <path>.checkpoint",
+        )
+        parser.add_argument(
+            "--offset",
+            type=int,
+            help="Начать с этой записи вместо контрольной точки",
+        )
+        parser.add_argument(
+            "--images-root",
+            help="Каталог, относительно которого заданы пути картинок",
+        )
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument(
+            "--no-create",
+            action="store_true",
+            help="Не создавать недостающих авторов и группы",
+        )
+        parser.add_argument(
+            "--no-finalize",
+            action="store_true",
+            help="Не пересчитывать счётчики, индекс и ленты после импорта",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        data_format = options["format"] or (
+            "csv" if path.endswith(".csv") else "ndjson"
+        )
+        checkpoint_path = options["checkpoint"]
+        if checkpoint_path is None and path != "-":
+            checkpoint_path = path + ".checkpoint"
+        position, state = self.read_checkpoint(checkpoint_path)
+        offset = options["offset"]
+        if offset is None:
+            offset = position
+        if offset:
+            self.stdout.write(f"Продолжение с записи {offset}")
+        importer = PostImporter(
+            batch_size=options["batch_size"],
+            chunk_size=options["chunk_size"],
+            images_root=options["images_root"],
+            workers=options["workers"],
+            create_missing=not options["no_create"],
+            log=self.stdout.write,
+            state=state,
+        )
+        stream = (
+            sys.stdin
+            if path == "-"
+            else open(path, encoding="utf-8", newline="")
+        )
+        try:
+            position = importer.run(
+                read_records(stream, data_format),
+                offset=offset,
+                checkpoint=lambda position, state: self.write_checkpoint(
+                    checkpoint_path, position, state
+                ),
+            )
+        except DatabaseError as error:
+            raise CommandError(
+                f"Импорт остановлен, контрольная точка в {checkpoint_path}: "
+                f"{error}"
+            )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        if not options["no_finalize"]:
+            self.stdout.write("Пересчёт счётчиков, индекса и лент...")
+            importer.finalize()
+        self.stdout.write(
+            self.style.SUCCESS(f"Готово, записей {position}: {importer.stats}")
+        )
+
+    def read_checkpoint(self, path):
+        """Позиция и затронутые строки прерванного импорта."""
+        if path is None or not os.path.exists(path):
+            return 0, None
+        with open(path) as checkpoint:
+            data = json.load(checkpoint)
+        return data["position"], data["state"]
+
+    def write_checkpoint(self, path, position, state):
+        if path is None:
+            return
+        # Запись через временный файл: прерывание не оставит его пустым.
+        with open(path + ".tmp", "w") as checkpoint:
+            json.dump({"position": position, "state": state}, checkpoint)
+        os.replace(path + ".tmp", path)
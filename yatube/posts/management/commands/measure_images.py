@@ -0,0 +1,80 @@
+import re
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate, ready_variants
+
+VIEWPORTS = (
+    ("телефон", 360, 1),
+    ("телефон", 360, 2),
+    ("планшет", 768, 2),
+    ("ноутбук", 1366, 1),
+)
+
+
+def slot_width(sizes, viewport):
+    """Ширина слота по атрибуту sizes (поддерживаются min-width и vw)."""
+    for entry in sizes.split(","):
+        condition, _, length = entry.strip().rpartition(" ")
+        match = re.match(r"\(min-width: (\d+)px\)", condition)
+        if not condition or (match and viewport >= int(match[1])):
+            return viewport * float(length.rstrip("vw")) / 100
+    return viewport
+
+
+def file_bytes(thumbnail):
+    return thumbnail.storage.size(thumbnail.name)
+
+
+def chosen(thumbnails, width):
+    """Вариант, который выберет браузер: самый узкий не уже слота."""
+    for thumbnail in thumbnails:
+        if thumbnail.width >= width:
+            return thumbnail
+    return thumbnails[-1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнить объём картинок первой страницы ленты: одна JPEG-миниатюра "
+        "против вариантов из srcset для разных экранов"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", default="card")
+
+    def handle(self, *args, **options):
+        size = options["size"]
+        sizes = settings.POST_THUMBNAILS[size]["sizes"]
+        posts = (
+            Post.objects.exclude(image="")
+            .select_related("author")
+            .order_by("-pub_date", "-id")[:settings.PAGINATION_ITEMS_PER_PAGE]
+        )
+        pages = []
+        for post in posts:
+            generate(post)
+            found = ready_variants(post, size)
+            if found is not None:
+                pages.append(found)
+        if not pages:
+            self.stdout.write("В ленте нет постов с картинками")
+            return
+        before = sum(file_bytes(found["JPEG"][-1]) for found in pages)
+        self.stdout.write(
+            f"Картинок: {len(pages)}, одна JPEG-миниатюра: {before} байт"
+        )
+        for name, viewport, ratio in VIEWPORTS:
+            slot = slot_width(sizes, viewport) * ratio
+            for image_format in pages[0]:
+                after = sum(
+                    file_bytes(chosen(found[image_format], slot))
+                    for found in pages
+                )
+                self.stdout.write(
+                    f"{name} {viewport}px ×{ratio}, {image_format}: "
+                    f"{after} байт, экономия {before - after} байт "
+                    f"({(before - after) / before:.0%})"
+                )
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.thumbnails import process_jobs
+
+
+class Command(BaseCommand):
+    help = "Готовить варианты картинок постов из очереди задач"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Разобрать очередь один раз и выйти",
+        )
+        parser.add_argument("--batch", type=int, default=20)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=1.0,
+            help="Пауза в секундах, когда очередь пуста",
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            done = process_jobs(options["batch"])
+            total += done
+            if options["once"] and not done:
+                break
+            if not done:
+                time.sleep(options["sleep"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Обработано постов с картинками: {total}")
+        )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.search import rebuild, use_fts
+
+
+class Command(BaseCommand):
+    help = "Заново построить поисковый индекс постов и комментариев"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            documents = rebuild()
+        backend = "FTS5" if use_fts() else "встроенный индекс"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Проиндексировано документов: {documents} ({backend})"
+            )
+        )
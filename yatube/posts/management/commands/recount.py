@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import recount_groups, recount_posts, recount_users
+
+
+class Command(BaseCommand):
+    help = "Пересчитать счётчики постов, комментариев и подписок"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            groups = recount_groups()
+            posts = recount_posts()
+            users = recount_users()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Пересчитаны счётчики: групп — {groups}, "
+                f"постов — {posts}, пользователей — {users}"
+            )
+        )
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+
+from posts import cache as page_cache
+from posts.markup import BATCH_SIZE, backfill
+from posts.models import Comment, Post
+
+
+def bump_comment_pages(comment_ids):
+    """Комментарии видны только на страницах своих постов."""
+    post_ids = set(
+        Comment.objects.filter(pk__in=comment_ids).values_list(
+            "post_id", flat=True
+        )
+    )
+    page_cache.bump(
+        *(page_cache.stamp_key(page_cache.POST, pk) for pk in post_ids)
+    )
+
+
+# Какие страницы в кэше сбросить после пачки: карточки постов уже
+# сменили ключ вместе с updated_at.
+BUMP_PAGES = {
+    Post: page_cache.bump_posts_pages,
+    Comment: bump_comment_pages,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Подготовить HTML текста постов и комментариев, у которых его нет, "
+        "или с --all — всех, например после смены POST_MARKUP"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Заново подготовить HTML всех постов и комментариев",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="Сколько строк обновлять за один запрос",
+        )
+
+    def handle(self, *args, **options):
+        counts = []
+        for model in (Post, Comment):
+            rows = model.objects.all()
+            if not options["all"]:
+                rows = rows.filter(text_html="")
+            counts.append(
+                backfill(rows, options["batch_size"], BUMP_PAGES[model])
+            )
+        posts, comments = counts
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Подготовлен HTML: постов — {posts}, "
+                f"комментариев — {comments}"
+            )
+        )
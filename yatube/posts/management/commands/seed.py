@@ -0,0 +1,114 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from posts.seeding import SeedPlan, Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполнить базу большим объёмом правдоподобных данных для замеров. "
+        "Одно и то же зерно даёт одни и те же данные на пустой базе"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--users", type=int, default=100_000)
+        parser.add_argument("--groups", type=int, default=1000)
+        parser.add_argument("--posts", type=int, default=1_000_000)
+        parser.add_argument("--comments", type=int, default=5_000_000)
+        parser.add_argument(
+            "--follows",
+            type=int,
+            default=20,
+            help="Среднее число подписок пользователя",
+        )
+        parser.add_argument(
+            "--skew",
+            type=float,
+            default=1.1,
+            help="Показатель закона Ципфа для авторов, групп и постов",
+        )
+        parser.add_argument(
+            "--image-share",
+            type=float,
+            default=0.05,
+            help="Доля постов с картинкой",
+        )
+        parser.add_argument(
+            "--no-group-share",
+            type=float,
+            default=0.3,
+            help="Доля постов без группы",
+        )
+        parser.add_argument(
+            "--start",
+            default="2019-01-01",
+            help="Дата первого поста",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=3 * 365,
+            help="За сколько дней распределены посты",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Процессов, генерирующих строки",
+        )
+        parser.add_argument(
+            "--no-timelines",
+            action="store_true",
+            help="Не собирать ленты подписок",
+        )
+        parser.add_argument(
+            "--no-search",
+            action="store_true",
+            help="Не собирать поисковый индекс",
+        )
+
+    def handle(self, *args, **options):
+        start = parse_date(options["start"])
+        if start is None:
+            raise CommandError(f"Неверная дата: {options['start']}")
+        if options["users"] < 1 and options["posts"] + options["comments"]:
+            raise CommandError("Посты и комментарии требуют пользователей")
+        if options["posts"] < 1 and options["comments"]:
+            raise CommandError("Комментарии требуют постов")
+        plan = SeedPlan(
+            seed=options["seed"],
+            users=options["users"],
+            groups=options["groups"],
+            posts=options["posts"],
+            comments=options["comments"],
+            follows=options["follows"],
+            skew=options["skew"],
+            image_share=options["image_share"],
+            no_group_share=options["no_group_share"],
+            start=start,
+            days=options["days"],
+        )
+        seeder = Seeder(
+            plan, workers=options["workers"], log=self.stdout.write
+        )
+        started = time.perf_counter()
+        seeder.run()
+        seeder.finalize(
+            timelines=not options["no_timelines"],
+            search_index=not options["no_search"],
+        )
+        elapsed = time.perf_counter() - started
+        total = sum(seeder.rows.values())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Создано строк: {total} за {elapsed:.0f} с "
+                f"({total / max(elapsed, 1e-9):.0f} строк/с): "
+                + ", ".join(
+                    f"{table} — {rows}" for table, rows in seeder.rows.items()
+                )
+            )
+        )
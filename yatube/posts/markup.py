@@ -0,0 +1,191 @@
+"""Готовый HTML текста постов и комментариев.
+
+Текст превращается в HTML один раз при сохранении (posts.signals), а
+шаблоны выводят готовые text_html и preview_html, не прогоняя фильтр
+linebreaks на каждом показе. POST_MARKUP выбирает разметку: plain —
+абзацы и переносы строк, как у linebreaks; markdown — Markdown через
+пакет Markdown. В режиме plain текст экранируется. Markdown получает
+исходный текст, чтобы работали цитаты «>», код и заголовки ссылок, а его
+HTML проходит через Sanitizer: остаются только теги и атрибуты из
+ALLOWED_TAGS и безопасные схемы адресов ссылок и картинок, а прочий
+HTML автора выводится как текст.
+
+Строки, сохранённые в обход save() (bulk_create импорта и генерации), и
+весь текст после смены POST_MARKUP дорисовывает команда render_texts.
+"""
+import re
+from html.parser import HTMLParser
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from django.utils.html import escape, linebreaks
+from django.utils.text import Truncator
+
+try:
+    import markdown
+except ImportError:
+    markdown = None
+
+PLAIN = "plain"
+MARKDOWN = "markdown"
+# Теги, которые выдаёт Markdown, и их разрешённые атрибуты.
+ALLOWED_TAGS = {
+    "a": {"href", "title"},
+    "img": {"src", "alt", "title"},
+    "p": set(),
+    "br": set(),
+    "hr": set(),
+    "em": set(),
+    "strong": set(),
+    "code": set(),
+    "pre": set(),
+    "blockquote": set(),
+    "ul": set(),
+    "ol": {"start"},
+    "li": set(),
+    "h1": set(),
+    "h2": set(),
+    "h3": set(),
+    "h4": set(),
+    "h5": set(),
+    "h6": set(),
+}
+VOID_TAGS = {"br", "hr", "img"}
+URL_ATTRIBUTES = {"href", "src"}
+SAFE_URL = re.compile(r"^(https?:|mailto:|[^:/?#]*(?:[/?#]|$))", re.I)
+BATCH_SIZE = 500
+
+
+def safe_url(url):
+    """Адрес со схемой вроде javascript: или data: заменяется на «#»."""
+    if SAFE_URL.match(url.strip()):
+        return url
+    return "#"
+
+
+class Sanitizer(HTMLParser):
+    """Оставляет в HTML теги ALLOWED_TAGS, прочую разметку экранирует.
+
+    Незакрытые разрешённые теги закрываются в конце, а лишние закрывающие
+    выводятся текстом: HTML автора не ломает разметку страницы.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.open_tags = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in ALLOWED_TAGS:
+            self.parts.append(escape(self.get_starttag_text()))
+            return
+        allowed = ALLOWED_TAGS[tag]
+        attributes = "".join(
+            f' {name}="'
+            f'{escape(safe_url(value) if name in URL_ATTRIBUTES else value)}"'
+            for name, value in attrs
+            if name in allowed and value is not None
+        )
+        self.parts.append(f"<{tag}{attributes}>")
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag in ALLOWED_TAGS and tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag not in self.open_tags:
+            if tag not in VOID_TAGS or tag not in ALLOWED_TAGS:
+                self.parts.append(escape(f"</{tag}>"))
+            return
+        while self.open_tags:
+            closed = self.open_tags.pop()
+            self.parts.append(f"</{closed}>")
+            if closed == tag:
+                return
+
+    def handle_data(self, data):
+        self.parts.append(escape(data))
+
+    def handle_comment(self, data):
+        self.parts.append(escape(f"<!--{data}-->"))
+
+    def handle_decl(self, decl):
+        self.parts.append(escape(f"<!{decl}>"))
+
+    def handle_pi(self, data):
+        self.parts.append(escape(f"<?{data}>"))
+
+    def unknown_decl(self, data):
+        self.parts.append(escape(f"<![{data}]>"))
+
+    def sanitize(self, html):
+        self.feed(html)
+        self.close()
+        self.parts.extend(f"</{tag}>" for tag in reversed(self.open_tags))
+        self.open_tags = []
+        return "".join(self.parts)
+
+
+def render(text):
+    """HTML текста в разметке POST_MARKUP."""
+    if settings.POST_MARKUP == PLAIN:
+        return linebreaks(text, autoescape=True)
+    if settings.POST_MARKUP != MARKDOWN:
+        raise ImproperlyConfigured(
+            f"Неизвестная разметка POST_MARKUP: {settings.POST_MARKUP}"
+        )
+    if markdown is None:
+        raise ImproperlyConfigured(
+            "Для POST_MARKUP = 'markdown' нужен пакет Markdown"
+        )
+    return Sanitizer().sanitize(markdown.markdown(text))
+
+
+def preview(html):
+    """Начало готового HTML для карточки; теги остаются закрытыми."""
+    return Truncator(html).chars(settings.POST_PREVIEW_CHARS, html=True)
+
+
+def render_fields(instance):
+    """Заполняет text_html (и preview_html, если оно есть) по text."""
+    instance.text_html = render(instance.text)
+    # Проверка по классу: у строки из only() поле вызвало бы запрос.
+    if hasattr(type(instance), "preview_html"):
+        instance.preview_html = preview(instance.text_html)
+
+
+def backfill(queryset, batch_size=BATCH_SIZE, on_batch=None):
+    """Дорисовывает HTML строк queryset пачками; возвращает их число.
+
+    bulk_update не меняет updated_at сам, поэтому у постов оно
+    обновляется явно: иначе кэш карточек отдавал бы старый текст.
+    on_batch(pks) вызывается после каждой пачки с её pk.
+    """
+    model = queryset.model
+    fields = ["text_html"]
+    if hasattr(model, "preview_html"):
+        fields += ["preview_html", "updated_at"]
+    queryset = queryset.order_by("pk").only("pk", "text")
+    number = 0
+    last_pk = None
+    while True:
+        batch = queryset
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        rows = list(batch[:batch_size])
+        if not rows:
+            return number
+        now = timezone.now()
+        for row in rows:
+            render_fields(row)
+            if "updated_at" in fields:
+                row.updated_at = now
+        model.objects.bulk_update(rows, fields)
+        if on_batch is not None:
+            on_batch([row.pk for row in rows])
+        number += len(rows)
+        last_pk = rows[-1].pk
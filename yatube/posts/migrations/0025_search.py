@@ -0,0 +1,132 @@
+# Generated by Django 2.2.16 on 2026-10-18 22:12
+
+import re
+import unicodedata
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Копии из posts.search на момент миграции: код приложения может
+# измениться, а миграция должна заполнять индекс как тогда.
+FTS_TABLE = "posts_search"
+KIND_BITS = {"post": 0, "comment": 1}
+MAX_TERM_LENGTH = 100
+
+
+def tokenize(text):
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return [
+        token[:MAX_TERM_LENGTH] for token in re.findall(r"\w+", text)
+    ]
+
+
+def fts5_supported(connection):
+    if connection.vendor != "sqlite":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return ("ENABLE_FTS5",) in cursor.fetchall()
+
+
+def create_index(apps, schema_editor):
+    """Таблица FTS5 и заполнение индекса, с которым будет работать поиск.
+
+    Если FTS5 есть, заполняется он (SEARCH_BACKEND = "auto"), иначе —
+    встроенный индекс. Для другого бэкенда — rebuild_search_index.
+    """
+    connection = schema_editor.connection
+    Post = apps.get_model("posts", "Post")
+    Comment = apps.get_model("posts", "Comment")
+    documents = (
+        ("post", Post.objects.values_list("pk", "pk", "text")),
+        ("comment", Comment.objects.values_list("pk", "post_id", "text")),
+    )
+    if fts5_supported(connection):
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} "
+            "USING fts5(text, post_id UNINDEXED)"
+        )
+        with connection.cursor() as cursor:
+            for kind, rows in documents:
+                cursor.executemany(
+                    f"INSERT INTO {FTS_TABLE} (rowid, text, post_id) "
+                    "VALUES (%s, %s, %s)",
+                    (
+                        (
+                            obj_id * 2 + KIND_BITS[kind],
+                            " ".join(tokenize(text)),
+                            post_id,
+                        )
+                        for obj_id, post_id, text in rows.iterator()
+                    ),
+                )
+        return
+    SearchDocument = apps.get_model("posts", "SearchDocument")
+    SearchPosting = apps.get_model("posts", "SearchPosting")
+    for kind, rows in documents:
+        for obj_id, post_id, text in rows.iterator():
+            terms = Counter(tokenize(text))
+            document = SearchDocument.objects.create(
+                kind=kind,
+                obj_id=obj_id,
+                post_id=post_id,
+                length=sum(terms.values()),
+            )
+            SearchPosting.objects.bulk_create(
+                SearchPosting(
+                    document=document, term=term, frequency=frequency
+                )
+                for term, frequency in terms.items()
+            )
+
+
+def drop_index(apps, schema_editor):
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0024_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Пост'), ('comment', 'Комментарий')], max_length=7, verbose_name='Тип')),
+                ('obj_id', models.PositiveIntegerField(verbose_name='Id объекта')),
+                ('length', models.PositiveIntegerField(verbose_name='Число слов')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_documents', to='posts.Post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Документ поиска',
+                'verbose_name_plural': 'Документы поиска',
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100, verbose_name='Слово')),
+                ('frequency', models.PositiveIntegerField(verbose_name='Число вхождений')),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='posts.SearchDocument', verbose_name='Документ')),
+            ],
+            options={
+                'verbose_name': 'Вхождение слова',
+                'verbose_name_plural': 'Вхождения слов',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='searchposting',
+            index=models.Index(fields=['term', 'document'], name='search_term_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='searchdocument',
+            constraint=models.UniqueConstraint(fields=('kind', 'obj_id'), name='unique_search_document'),
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -10,6 +10,9 @@ class Group(models.Model):
     title = models.CharField("Имя группы", max_length=200)
     slug = models.SlugField("Slug группы", unique=True)
     description = models.TextField("Описание группы")
+    post_count = models.PositiveIntegerField(
+        "Число постов", default=0, editable=False
+    )
 
     class Meta:
         verbose_name = "Группа"
@@ -31,11 +34,39 @@ class Post(CreatedModel):
         help_text="Группа, к которой будет относиться пост",
     )
     image = models.ImageField("Картинка", upload_to="posts/", blank=True)
+    image_width = models.PositiveIntegerField(
+        "Ширина картинки", blank=True, null=True, editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        "Высота картинки", blank=True, null=True, editable=False
+    )
+    comment_count = models.PositiveIntegerField(
+        "Число комментариев", default=0, editable=False
+    )
+    # Готовый HTML текста и его начала для карточки (posts.markup)
+    text_html = models.TextField("HTML текста", blank=True, editable=False)
+    preview_html = models.TextField(
+        "HTML начала текста", blank=True, editable=False
+    )
+    # Версия карточки поста (posts.cards): меняется при сохранении поста,
+    # а также при изменении его группы, автора и миниатюр
+    updated_at = models.DateTimeField("Дата изменения", auto_now=True)
 
     class Meta(CreatedModel.Meta):
         verbose_name = ("Пост",)
         verbose_name_plural = "Посты"
         default_related_name = "posts"
+        indexes = [
+            models.Index(fields=["-pub_date", "-id"], name="post_date_idx"),
+            models.Index(
+                fields=["group", "-pub_date", "-id"],
+                name="post_group_date_idx",
+            ),
+            models.Index(
+                fields=["author", "-pub_date", "-id"],
+                name="post_author_date_idx",
+            ),
+        ]
 
 
 class Comment(CreatedModel):
@@ -44,11 +75,20 @@ class Comment(CreatedModel):
         on_delete=models.CASCADE,
         verbose_name="Пост",
     )
+    text_html = models.TextField("HTML текста", blank=True, editable=False)
 
     class Meta(CreatedModel.Meta):
         verbose_name = "Комментарий"
         verbose_name_plural = "Комментарии"
         default_related_name = "comments"
+        indexes = [
+            models.Index(
+                fields=["post", "pub_date"], name="comment_post_date_idx"
+            ),
+            models.Index(
+                fields=["-pub_date", "-id"], name="comment_date_idx"
+            ),
+        ]
 
 
 class Follow(models.Model):
@@ -77,6 +117,179 @@ class Follow(models.Model):
                 fields=["user", "author"], name="unique_follow"
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=["author", "user"], name="follow_author_user_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user} подписался на {self.author}"
+
+
+class UserCounters(models.Model):
+    """Счётчики пользователя, которые поддерживают сигналы posts.signals."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="counters",
+        verbose_name="Пользователь",
+    )
+    post_count = models.PositiveIntegerField("Число постов", default=0)
+    comment_count = models.PositiveIntegerField(
+        "Число комментариев", default=0
+    )
+    follower_count = models.PositiveIntegerField(
+        "Число подписчиков", default=0
+    )
+    following_count = models.PositiveIntegerField(
+        "Число подписок", default=0
+    )
+
+    class Meta:
+        verbose_name = "Счётчики пользователя"
+        verbose_name_plural = "Счётчики пользователей"
+
+    def __str__(self):
+        return f"Счётчики {self.user}"
+
+    @classmethod
+    def count_for(cls, user_id):
+        """Честно пересчитывает счётчики пользователя по таблицам."""
+        return {
+            "post_count": Post.objects.filter(author_id=user_id).count(),
+            "comment_count": Comment.objects.filter(
+                author_id=user_id
+            ).count(),
+            "follower_count": Follow.objects.filter(
+                author_id=user_id
+            ).count(),
+            "following_count": Follow.objects.filter(
+                user_id=user_id
+            ).count(),
+        }
+
+    @classmethod
+    def for_user(cls, user):
+        """Счётчики пользователя; отсутствующую строку создаёт пересчётом."""
+        try:
+            return user.counters
+        except cls.DoesNotExist:
+            counters, _ = cls.objects.get_or_create(
+                user=user, defaults=cls.count_for(user.pk)
+            )
+            return counters
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписок пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="timeline",
+        verbose_name="Читатель",
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="timeline_entries",
+        verbose_name="Пост",
+    )
+    pub_date = models.DateTimeField("Дата публикации")
+
+    class Meta:
+        verbose_name = "Запись ленты подписок"
+        verbose_name_plural = "Записи лент подписок"
+        ordering = ("-pub_date",)
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "post"], name="unique_timeline_entry"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-pub_date", "-post"],
+                name="timeline_user_date_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.post} в ленте {self.user}"
+
+
+class ThumbnailJob(models.Model):
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="thumbnail_job",
+        verbose_name="Пост",
+    )
+    created = models.DateTimeField("Поставлена", auto_now_add=True)
+    claimed = models.DateTimeField("Взята в работу", blank=True, null=True)
+    attempts = models.PositiveIntegerField("Попыток", default=0)
+
+    class Meta:
+        verbose_name = "Задача подготовки картинок"
+        verbose_name_plural = "Задачи подготовки картинок"
+        ordering = ("created",)
+
+    def __str__(self):
+        return f"Картинки поста {self.post_id}"
+
+
+class SearchDocument(models.Model):
+    """Документ встроенного поискового индекса: пост или комментарий."""
+
+    POST = "post"
+    COMMENT = "comment"
+    KINDS = ((POST, "Пост"), (COMMENT, "Комментарий"))
+
+    kind = models.CharField("Тип", max_length=7, choices=KINDS)
+    obj_id = models.PositiveIntegerField("Id объекта")
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="search_documents",
+        verbose_name="Пост",
+    )
+    length = models.PositiveIntegerField("Число слов")
+
+    class Meta:
+        verbose_name = "Документ поиска"
+        verbose_name_plural = "Документы поиска"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kind", "obj_id"], name="unique_search_document"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.obj_id}"
+
+
+class SearchPosting(models.Model):
+    """Вхождение слова в документ встроенного поискового индекса."""
+
+    document = models.ForeignKey(
+        SearchDocument,
+        on_delete=models.CASCADE,
+        related_name="postings",
+        verbose_name="Документ",
+    )
+    term = models.CharField("Слово", max_length=100)
+    frequency = models.PositiveIntegerField("Число вхождений")
+
+    class Meta:
+        verbose_name = "Вхождение слова"
+        verbose_name_plural = "Вхождения слов"
+        indexes = [
+            models.Index(
+                fields=["term", "document"], name="search_term_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.term} в {self.document}"
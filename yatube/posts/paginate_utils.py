@@ -1,8 +1,243 @@
+import base64
+import binascii
+from collections.abc import Sequence
+from datetime import datetime
+
 from django.conf import settings
+from django.core.cache import cache
 from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+NUMBERED = "numbered"
+CURSOR = "cursor"
+
+FORWARD = "n"
+BACKWARD = "p"
+
+
+def cursor_key(row):
+    """(pub_date, id) объекта или строки .values()."""
+    if isinstance(row, dict):
+        return row["pub_date"], row["id"]
+    return row.pub_date, row.pk
+
+
+def encode_cursor(post, direction=FORWARD):
+    """Упаковывает (pub_date, id) поста в непрозрачную строку."""
+    pub_date, pk = cursor_key(post)
+    raw = f"{direction}|{pub_date.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Разбирает курсор. Для битого курсора возвращает None."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        direction, pub_date, pk = raw.split("|")
+        if direction not in (FORWARD, BACKWARD):
+            return None
+        pub_date = datetime.fromisoformat(pub_date)
+        # С USE_TZ = False дату с поясом нельзя сравнить с колонкой.
+        if pub_date.tzinfo is not None:
+            return None
+        return direction, pub_date, int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def seek(queryset, fields, operator, values):
+    """Фильтр (f1, f2, ...) < (v1, v2, ...) сравнением кортежей SQL.
+
+    Условие «f1 < v1 OR (f1 = v1 AND f2 < v2)» SQLite выполняет
+    просмотром индекса с начала, и страница тем дороже, чем она дальше.
+    Сравнение кортежей он выполняет поиском диапазона по составному
+    индексу: каждая страница стоит одинаково. Django 2.2 не умеет
+    записывать такое сравнение, поэтому оно добавляется через extra().
+    Сборные ленты (posts.timeline.Timeline) ищут по ключу сами.
+    """
+    if not hasattr(queryset, "extra"):
+        return queryset.seek(fields, operator, values)
+    opts = queryset.model._meta
+    connection = connections[queryset.db]
+    quote = connection.ops.quote_name
+    columns = []
+    params = []
+    for name, value in zip(fields, values):
+        field = opts.pk if name == "pk" else opts.get_field(name)
+        columns.append(f"{quote(opts.db_table)}.{quote(field.column)}")
+        params.append(field.get_db_prep_value(value, connection))
+    placeholders = ", ".join(["%s"] * len(params))
+    return queryset.extra(
+        where=[f"({', '.join(columns)}) {operator} ({placeholders})"],
+        params=params,
+    )
+
+
+class CursorPage(Sequence):
+    """Страница ленты без номера: знает только соседние курсоры."""
+
+    is_cursor = True
+
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f"<CursorPage: {len(self.object_list)} objects>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return encode_cursor(self.object_list[-1], FORWARD)
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return encode_cursor(self.object_list[0], BACKWARD)
+
+
+class CursorPaginator:
+    """Пагинация по ключу (pub_date, id) без COUNT(*) и OFFSET."""
+
+    def __init__(self, object_list, per_page):
+        self.object_list = object_list.order_by("-pub_date", "-pk")
+        self.per_page = int(per_page)
+
+    def page_queryset(self, decoded):
+        """Запрос строк страницы (с одной лишней) по разобранному курсору."""
+        if decoded is None:
+            return self.object_list[:self.per_page + 1]
+        direction, pub_date, pk = decoded
+        if direction == FORWARD:
+            return seek(
+                self.object_list, ("pub_date", "pk"), "<", (pub_date, pk)
+            )[:self.per_page + 1]
+        return seek(
+            self.object_list, ("pub_date", "pk"), ">", (pub_date, pk)
+        ).reverse()[:self.per_page + 1]
+
+    def get_page(self, cursor):
+        decoded = decode_cursor(cursor)
+        rows = list(self.page_queryset(decoded))
+        if decoded is None:
+            return CursorPage(
+                rows[:self.per_page], len(rows) > self.per_page, False
+            )
+        if decoded[0] == FORWARD:
+            return CursorPage(
+                rows[:self.per_page], len(rows) > self.per_page, True
+            )
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return CursorPage(rows, True, has_previous)
+
+
+def feed_count_key(feed, obj_id=None):
+    """Ключ кэша, под которым хранится число постов ленты."""
+    if obj_id is None:
+        return f"feed_count:{feed}"
+    return f"feed_count:{feed}:{obj_id}"
+
+
+def adjust_feed_count(key, delta):
+    """Сдвигает закэшированное число постов, если оно уже посчитано."""
+    try:
+        if delta > 0:
+            cache.incr(key, delta)
+        else:
+            cache.decr(key, -delta)
+    except ValueError:
+        pass
+
+
+class CountingPaginator(Paginator):
+    """Пагинатор, который берёт число постов ленты из кэша.
+
+    Число пересчитывается через COUNT(*) не чаще, чем раз в timeout
+    секунд; в промежутке его поддерживают сигналы сохранения и удаления
+    постов. Вместо полного page_range страница получает page_window.
+    """
+
+    def __init__(self, object_list, per_page, count_key, timeout, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_key = count_key
+        self.timeout = timeout
+
+    @cached_property
+    def count(self):
+        if not self.timeout:
+            return Paginator.count.func(self)
+        count = cache.get(self.count_key)
+        if count is None:
+            count = Paginator.count.func(self)
+            cache.set(self.count_key, count, self.timeout)
+        return count
+
+    def page_window(self, number, on_each_side):
+        """Номера страниц вокруг текущей; None обозначает пропуск."""
+        first = max(number - on_each_side, 1)
+        last = min(number + on_each_side, self.num_pages)
+        window = list(range(first, last + 1))
+        if first > 2:
+            window.insert(0, None)
+        if first > 1:
+            window.insert(0, 1)
+        if last < self.num_pages - 1:
+            window.append(None)
+        if last < self.num_pages:
+            window.append(self.num_pages)
+        return window
+
+    def get_page(self, number):
+        page = super().get_page(number)
+        page.page_window = self.page_window(
+            page.number, settings.PAGINATION_PAGE_WINDOW
+        )
+        return page
+
+
+def pagination_mode(feed):
+    return settings.PAGINATION_MODES.get(feed, NUMBERED)
+
 
+def paginate_posts(post_list, request, feed="index", obj_id=None):
+    """Разбивает ленту на страницы в режиме, заданном для неё в настройках.
 
-def paginate_posts(post_list, request):
-    paginator = Paginator(post_list, settings.PAGINATION_ITEMS_PER_PAGE)
+    obj_id — группа, автор или подписчик, по которому отфильтрована лента.
+    """
+    if pagination_mode(feed) == CURSOR:
+        paginator = CursorPaginator(
+            post_list, settings.PAGINATION_ITEMS_PER_PAGE
+        )
+        return paginator.get_page(request.GET.get("cursor"))
+    paginator = CountingPaginator(
+        post_list,
+        settings.PAGINATION_ITEMS_PER_PAGE,
+        count_key=feed_count_key(feed, obj_id),
+        timeout=settings.PAGINATION_COUNT_TIMEOUTS.get(feed, 0),
+    )
     page_number = request.GET.get("page")
     return paginator.get_page(page_number)
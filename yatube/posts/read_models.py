@@ -0,0 +1,168 @@
+"""Лёгкие строки постов для лент.
+
+Ленты показывают только карточки (posts/includes/post_card.html), а
+карточке нужны текст, дата, картинка, имя автора и название группы.
+Полные экземпляры Post с присоединёнными User и Group тянут из базы
+все их колонки, включая хэш пароля и last_login, и стоят заметно
+дороже в памяти и на создании. Поэтому ленты выбирают .values() только
+с колонками карточки и собирают из них строки со __slots__: PostRow,
+AuthorRow и GroupRow. Замеры против моделей — команда bench_read_models.
+
+Строки ведут себя в шаблонах как модели: у них те же имена полей,
+get_full_name() и str() автора, а картинка — FieldFile, так что с ней
+работают posts.thumbnails и sorl-thumbnail. Строку можно сравнить с
+экземпляром её модели: они равны, если совпадает pk.
+
+Если автор или группа ленты уже загружены (профиль, страница группы),
+их колонки не выбираются, а строки ссылаются на готовый объект.
+"""
+from django.db.models.fields.files import FieldFile
+
+from .models import Group, Post, User
+from .paginate_utils import paginate_posts
+
+POST_COLUMNS = (
+    "id", "text", "preview_html", "pub_date", "updated_at", "image",
+    "image_width", "image_height", "author_id", "group_id",
+)
+AUTHOR_COLUMNS = (
+    "author__username", "author__first_name", "author__last_name",
+)
+GROUP_COLUMNS = ("group__slug", "group__title")
+IMAGE_FIELD = Post._meta.get_field("image")
+# Общая пустая картинка: у большинства постов её нет, а FieldFile не мал.
+NO_IMAGE = FieldFile(None, IMAGE_FIELD, "")
+
+
+class Row:
+    """Основа строк: pk и равенство с экземплярами модели по pk."""
+
+    __slots__ = ("id",)
+    model = None
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __eq__(self, other):
+        if isinstance(other, (type(self), self.model)):
+            return self.pk == other.pk
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    def __repr__(self):
+        return f"<{type(self).__name__}: {self.pk}>"
+
+
+class AuthorRow(Row):
+    __slots__ = ("username", "first_name", "last_name")
+    model = User
+
+    def __init__(self, id, username, first_name, last_name):
+        self.id = id
+        self.username = username
+        self.first_name = first_name
+        self.last_name = last_name
+
+    def __str__(self):
+        return self.username
+
+    def get_full_name(self):
+        return f"{self.first_name} {self.last_name}".strip()
+
+
+class GroupRow(Row):
+    __slots__ = ("slug", "title")
+    model = Group
+
+    def __init__(self, id, slug, title):
+        self.id = id
+        self.slug = slug
+        self.title = title
+
+    def __str__(self):
+        return self.title
+
+
+class PostRow(Row):
+    __slots__ = (
+        "text", "preview_html", "pub_date", "updated_at", "image",
+        "image_width", "image_height", "author_id", "group_id", "author",
+        "group",
+    )
+    model = Post
+
+    def __init__(self, values, author, group):
+        self.id = values["id"]
+        self.text = values["text"]
+        self.preview_html = values["preview_html"]
+        self.pub_date = values["pub_date"]
+        self.updated_at = values["updated_at"]
+        self.image = (
+            FieldFile(None, IMAGE_FIELD, values["image"])
+            if values["image"]
+            else NO_IMAGE
+        )
+        self.image_width = values["image_width"]
+        self.image_height = values["image_height"]
+        self.author_id = values["author_id"]
+        self.group_id = values["group_id"]
+        self.author = author
+        self.group = group
+
+    def __str__(self):
+        return f"{self.text[:15]}... "
+
+
+def feed_values(posts, author=None, group=None):
+    """.values() ленты: только колонки карточки, без известных связей."""
+    columns = POST_COLUMNS
+    if author is None:
+        columns += AUTHOR_COLUMNS
+    if group is None:
+        columns += GROUP_COLUMNS
+    return posts.values(*columns)
+
+
+def post_rows(values, author=None, group=None):
+    """Строки постов из словарей feed_values.
+
+    Один автор или одна группа на странице — один общий объект.
+    """
+    authors = {}
+    groups = {}
+    rows = []
+    for row in values:
+        post_author = author
+        if post_author is None:
+            post_author = authors.get(row["author_id"])
+            if post_author is None:
+                post_author = authors[row["author_id"]] = AuthorRow(
+                    row["author_id"],
+                    row["author__username"],
+                    row["author__first_name"],
+                    row["author__last_name"],
+                )
+        post_group = group
+        if row["group_id"] is None:
+            post_group = None
+        elif post_group is None:
+            post_group = groups.get(row["group_id"])
+            if post_group is None:
+                post_group = groups[row["group_id"]] = GroupRow(
+                    row["group_id"], row["group__slug"], row["group__title"]
+                )
+        rows.append(PostRow(row, post_author, post_group))
+    return rows
+
+
+def paginate_feed(posts, request, feed, obj_id=None, author=None,
+                  group=None):
+    """Страница ленты (paginate_posts) со строками вместо моделей."""
+    page = paginate_posts(
+        feed_values(posts, author, group), request, feed, obj_id
+    )
+    page.object_list = post_rows(page.object_list, author, group)
+    return page
@@ -0,0 +1,393 @@
+"""Полнотекстовый поиск по постам и комментариям.
+
+Основной бэкенд — виртуальная таблица SQLite FTS5 posts_search (её
+создаёт миграция, если FTS5 доступен). Иначе работает встроенный
+обратный индекс: SearchDocument и SearchPosting. Оба обновляются
+сигналами при сохранении и удалении постов и комментариев, ранжируют по
+BM25 и ищут слова как префиксы: «пост» находит «постов».
+
+Результат поиска — посты: совпадение в комментарии находит его пост, ранг
+поста — лучший из рангов его документов. Порядок (ранг, id) стабилен,
+поэтому страницы листаются курсором.
+"""
+import base64
+import binascii
+import math
+import re
+import unicodedata
+from collections import Counter
+from collections.abc import Sequence
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Sum
+
+from .models import Comment, Post, SearchDocument, SearchPosting
+
+FTS_TABLE = "posts_search"
+POST = SearchDocument.POST
+COMMENT = SearchDocument.COMMENT
+# Документ поста и документ комментария различаются младшим битом rowid.
+KIND_BITS = {POST: 0, COMMENT: 1}
+# Верхняя граница для поиска слов по префиксу через индекс.
+MAX_CHAR = "\U0010ffff"
+MAX_TERM_LENGTH = 100
+# Сколько rowid удалять из FTS5 одним запросом.
+REMOVE_BATCH_SIZE = 500
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_fts_tables = {}
+
+
+def tokenize(text):
+    """Слова в нижнем регистре без диакритики, как у токенизатора FTS5."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return [
+        token[:MAX_TERM_LENGTH] for token in re.findall(r"\w+", text)
+    ]
+
+
+def fts_insert(cursor, rows):
+    """Пишет в FTS5 строки (rowid, текст, id поста).
+
+    Таблица хранит уже нормализованные слова: unicode61 снимает диакритику
+    только с латиницы, а «ёжик» должен находиться по «ежик».
+    """
+    cursor.executemany(
+        f"INSERT INTO {FTS_TABLE} (rowid, text, post_id) VALUES (%s, %s, %s)",
+        (
+            (rowid, " ".join(tokenize(text)), post_id)
+            for rowid, text, post_id in rows
+        ),
+    )
+
+
+def document_rows(posts, comments):
+    """Строки (rowid, текст, id поста) постов и комментариев querysets."""
+    for pk, text, post_id in posts.values_list("pk", "text", "pk").iterator():
+        yield pk * 2 + KIND_BITS[POST], text, post_id
+    comments = comments.values_list("pk", "text", "post_id")
+    for pk, text, post_id in comments.iterator():
+        yield pk * 2 + KIND_BITS[COMMENT], text, post_id
+
+
+def fts_delete(cursor, rowids):
+    """Стирает строки FTS5 пачками по REMOVE_BATCH_SIZE rowid."""
+    for start in range(0, len(rowids), REMOVE_BATCH_SIZE):
+        batch = rowids[start:start + REMOVE_BATCH_SIZE]
+        placeholders = ", ".join(["%s"] * len(batch))
+        cursor.execute(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", batch
+        )
+
+
+def fts_query(tokens):
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def fts_available():
+    """Создана ли таблица FTS5 в текущей базе."""
+    name = connection.settings_dict["NAME"]
+    if name not in _fts_tables:
+        _fts_tables[name] = (
+            connection.vendor == "sqlite"
+            and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_tables[name]
+
+
+def use_fts():
+    backend = settings.SEARCH_BACKEND
+    if backend == "auto":
+        return fts_available()
+    return backend == "fts5"
+
+
+# Обновление индекса
+
+
+def index(kind, obj_id, post_id, text):
+    if use_fts():
+        rowid = obj_id * 2 + KIND_BITS[kind]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [rowid]
+            )
+            fts_insert(cursor, [(rowid, text, post_id)])
+        return
+    terms = Counter(tokenize(text))
+    document, created = SearchDocument.objects.update_or_create(
+        kind=kind,
+        obj_id=obj_id,
+        defaults={"post_id": post_id, "length": sum(terms.values())},
+    )
+    if not created:
+        document.postings.all().delete()
+    SearchPosting.objects.bulk_create(
+        SearchPosting(document=document, term=term, frequency=frequency)
+        for term, frequency in terms.items()
+    )
+
+
+def remove(kind, obj_id):
+    if use_fts():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid = %s",
+                [obj_id * 2 + KIND_BITS[kind]],
+            )
+        return
+    SearchDocument.objects.filter(kind=kind, obj_id=obj_id).delete()
+
+
+def remove_post(post_id, comment_ids):
+    """Убирает из индекса удаляемый пост вместе с его комментариями.
+
+    Документы встроенного индекса удалит каскад от поста, а строки FTS5
+    стираются пачками по rowid, а не запросом на каждый комментарий.
+    """
+    if not use_fts():
+        return
+    rowids = [post_id * 2 + KIND_BITS[POST]] + [
+        pk * 2 + KIND_BITS[COMMENT] for pk in comment_ids
+    ]
+    with connection.cursor() as cursor:
+        fts_delete(cursor, rowids)
+
+
+def reindex(posts, comments):
+    """Переиндексирует посты и комментарии querysets posts и comments.
+
+    Так массовый импорт обновляет индекс только для своих строк.
+    """
+    rows = document_rows(posts, comments)
+    if not use_fts():
+        for rowid, text, post_id in rows:
+            kind = COMMENT if rowid & 1 else POST
+            index(kind, rowid >> 1, post_id, text)
+        return
+    with connection.cursor() as cursor:
+        while True:
+            batch = list(islice(rows, REMOVE_BATCH_SIZE))
+            if not batch:
+                break
+            fts_delete(cursor, [rowid for rowid, _, _ in batch])
+            fts_insert(cursor, batch)
+
+
+def rebuild():
+    """Переиндексирует все посты и комментарии; возвращает их число."""
+    if use_fts():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            rows = document_rows(Post.objects.all(), Comment.objects.all())
+            fts_insert(cursor, rows)
+    else:
+        SearchDocument.objects.all().delete()
+        reindex(Post.objects.all(), Comment.objects.all())
+    return Post.objects.count() + Comment.objects.count()
+
+
+# Поиск
+
+
+def encode_cursor(rank, post_id):
+    raw = f"{rank!r}|{post_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    """Ранг и id последнего поста страницы или None для битого курсора."""
+    try:
+        rank, post_id = base64.urlsafe_b64decode(cursor).decode().split("|")
+        return float(rank), int(post_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+class SearchPage(Sequence):
+    """Страница результатов: посты с рангом search_rank."""
+
+    def __init__(self, posts, next_cursor):
+        self.object_list = posts
+        self.next_cursor = next_cursor
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def fts_ranked(tokens, group_id, author_id, after, limit):
+    where = []
+    params = [fts_query(tokens)]
+    if group_id is not None:
+        where.append("post.group_id = %s")
+        params.append(group_id)
+    if author_id is not None:
+        where.append("post.author_id = %s")
+        params.append(author_id)
+    having = ""
+    if after is not None:
+        having = "HAVING best > %s OR (best = %s AND hit.post_id > %s)"
+        params.extend((after[0], after[0], after[1]))
+    params.append(limit)
+    # bm25() нельзя вызывать внутри агрегата: LIMIT -1 не даёт SQLite
+    # развернуть подзапрос во внешний.
+    sql = f"""
+        SELECT hit.post_id, MIN(hit.score) AS best
+        FROM (
+            SELECT post_id, bm25({FTS_TABLE}) AS score
+            FROM {FTS_TABLE}
+            WHERE {FTS_TABLE} MATCH %s
+            ORDER BY score
+            LIMIT -1
+        ) AS hit
+        JOIN posts_post AS post ON post.id = hit.post_id
+        {"WHERE " + " AND ".join(where) if where else ""}
+        GROUP BY hit.post_id
+        {having}
+        ORDER BY best, hit.post_id
+        LIMIT %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def index_ranked(tokens, group_id, author_id, after, limit):
+    """BM25 по встроенному индексу с той же формулой, что у FTS5.
+
+    Python считает только веса слов; оценка документов, лучший ранг
+    поста, курсор и LIMIT — в одном запросе SQL, так что в память
+    попадает одна страница, а не все вхождения слов запроса.
+    """
+    total = SearchDocument.objects.count()
+    average_length = (
+        SearchDocument.objects.aggregate(total=Sum("length"))["total"]
+        or 0
+    ) / max(total, 1) or 1
+    postings = SearchPosting._meta.db_table
+    scores = []
+    score_params = []
+    joins = []
+    join_params = []
+    for number, token in enumerate(tokens):
+        # Число документов со словом считается по всему индексу, как в FTS5.
+        frequency = (
+            SearchPosting.objects.filter(
+                term__gte=token, term__lt=token + MAX_CHAR
+            )
+            .values("document_id")
+            .distinct()
+            .count()
+        )
+        idf = max(
+            math.log((total - frequency + 0.5) / (frequency + 0.5)), 1e-6
+        )
+        term = f"term{number}"
+        scores.append(
+            f"%s * {term}.frequency / ({term}.frequency"
+            f" + %s * (%s + %s * document.length))"
+        )
+        score_params.extend(
+            (
+                idf * (BM25_K1 + 1),
+                BM25_K1,
+                1 - BM25_B,
+                BM25_B / average_length,
+            )
+        )
+        joins.append(
+            f"""JOIN (
+                SELECT document_id, SUM(frequency) AS frequency
+                FROM {postings}
+                WHERE term >= %s AND term < %s
+                GROUP BY document_id
+            ) AS {term} ON {term}.document_id = document.id"""
+        )
+        join_params.extend((token, token + MAX_CHAR))
+    params = score_params + join_params
+    where = []
+    if group_id is not None:
+        where.append("post.group_id = %s")
+        params.append(group_id)
+    if author_id is not None:
+        where.append("post.author_id = %s")
+        params.append(author_id)
+    having = ""
+    if after is not None:
+        having = "HAVING best > %s OR (best = %s AND document.post_id > %s)"
+        params.extend((after[0], after[0], after[1]))
+    params.append(limit)
+    sql = f"""
+        SELECT document.post_id, MIN(-({" + ".join(scores)})) AS best
+        FROM {SearchDocument._meta.db_table} AS document
+        {" ".join(joins)}
+        JOIN {Post._meta.db_table} AS post ON post.id = document.post_id
+        {"WHERE " + " AND ".join(where) if where else ""}
+        GROUP BY document.post_id
+        {having}
+        ORDER BY best, document.post_id
+        LIMIT %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def search_posts(query, group_id=None, author_id=None, cursor=None,
+                 per_page=None):
+    """Страница постов по запросу, отсортированная по рангу BM25."""
+    per_page = per_page or settings.PAGINATION_ITEMS_PER_PAGE
+    tokens = tokenize(query)
+    if not tokens:
+        return SearchPage([], None)
+    after = decode_cursor(cursor) if cursor else None
+    ranked_posts = fts_ranked if use_fts() else index_ranked
+    ranked = ranked_posts(tokens, group_id, author_id, after, per_page + 1)
+    next_cursor = None
+    if len(ranked) > per_page:
+        ranked = ranked[:per_page]
+        next_cursor = encode_cursor(ranked[-1][1], ranked[-1][0])
+    posts = Post.objects.select_related("author", "group").in_bulk(
+        [post_id for post_id, _ in ranked]
+    )
+    page = []
+    for post_id, rank in ranked:
+        post = posts[post_id]
+        post.search_rank = rank
+        page.append(post)
+    return SearchPage(page, next_cursor)
+
+
+def filter_matching(queryset, query, kind):
+    """Оставляет в queryset постов или комментариев совпавшие с запросом."""
+    tokens = tokenize(query)
+    if not tokens:
+        return queryset.none()
+    if use_fts():
+        table = queryset.model._meta.db_table
+        return queryset.extra(
+            where=[
+                f"{table}.id IN (SELECT rowid >> 1 FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s "
+                f"AND (rowid & 1) = {KIND_BITS[kind]})"
+            ],
+            params=[fts_query(tokens)],
+        )
+    documents = SearchDocument.objects.filter(kind=kind)
+    for token in tokens:
+        documents = documents.filter(
+            pk__in=SearchPosting.objects.filter(
+                term__gte=token, term__lt=token + MAX_CHAR
+            ).values("document_id")
+        )
+    return queryset.filter(pk__in=documents.values("obj_id"))
@@ -0,0 +1,322 @@
+"""Генерация большой реалистичной базы для замеров производительности.
+
+Строки генерируют процессы пула, а пишет их bulk_create основной
+процесс: так генерация параллелится и на SQLite, где писатель один.
+Каждая пачка строк зависит только от зерна, имени таблицы и номера
+пачки, поэтому при том же зерне и тех же версиях Faker и Python на
+пустой базе получаются одни и те же данные при любом числе процессов.
+
+Распределения близки к настоящим: у постов и подписчиков авторов,
+размеров групп и комментариев к постам степенной закон (Ципф), а число
+подписок пользователя распределено по Парето.
+"""
+import multiprocessing
+import random
+from datetime import datetime, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from faker import Faker
+from PIL import Image
+
+from . import markup, search, timeline
+from .bulk import explicit_pub_date
+from .counters import recount_groups, recount_posts, recount_users
+from .models import Comment, Follow, Group, Post, User
+
+USERS = "users"
+GROUPS = "groups"
+POSTS = "posts"
+COMMENTS = "comments"
+FOLLOWS = "follows"
+SHARD_ROWS = 10000
+# Подписки генерируются пачками по столько пользователей.
+SHARD_USERS = 1000
+IMAGE_VARIANTS = 20
+# Множители для перемешивания рангов: простые, не делят число строк.
+SCATTER_PRIMES = (2654435761, 2246822519, 3266489917)
+
+TABLES = {
+    USERS: (
+        User,
+        ("id", "username", "first_name", "last_name", "date_joined"),
+    ),
+    GROUPS: (Group, ("id", "title", "slug", "description")),
+    POSTS: (
+        Post,
+        (
+            "id", "text", "author_id", "group_id", "pub_date", "image",
+            "image_width", "image_height",
+        ),
+    ),
+    COMMENTS: (
+        Comment, ("id", "text", "author_id", "post_id", "pub_date")
+    ),
+    FOLLOWS: (Follow, ("user_id", "author_id")),
+}
+
+# Настройки генерации в процессе пула.
+plan = None
+
+
+def zipf_rank(rng, number, skew):
+    """Ранг от 0 до number - 1 с вероятностью ~ 1 / (ранг + 1) ** skew.
+
+    Обратная функция непрерывного распределения: память O(1) при любом
+    number, в отличие от таблицы весов.
+    """
+    uniform = rng.random()
+    if skew == 1:
+        rank = number ** uniform
+    else:
+        power = 1 - skew
+        rank = (uniform * (number ** power - 1) + 1) ** (1 / power)
+    return min(int(rank), number) - 1
+
+
+def scatter(rank, number):
+    """Перемешивает ранги, чтобы популярные строки не шли подряд."""
+    prime = next(p for p in SCATTER_PRIMES if number % p)
+    return rank * prime % number
+
+
+class SeedPlan:
+    """Объёмы, распределения и словари, общие для всех процессов."""
+
+    def __init__(self, seed=0, users=100_000, groups=1000, posts=1_000_000,
+                 comments=5_000_000, follows=20, skew=1.1, image_share=0.05,
+                 no_group_share=0.3, start=None, days=3 * 365):
+        self.seed = seed
+        self.users = users
+        self.groups = groups
+        self.posts = posts
+        self.comments = comments
+        self.follows = follows
+        self.skew = skew
+        self.image_share = image_share
+        self.no_group_share = no_group_share
+        self.start = start or datetime(2019, 1, 1)
+        self.span = timedelta(days=days)
+        faker = Faker("ru_RU")
+        faker.seed_instance(seed)
+        self.words = sorted({faker.word() for _ in range(20000)})
+        self.first_names = [faker.first_name() for _ in range(1000)]
+        self.last_names = [faker.last_name() for _ in range(1000)]
+        self.logins = [faker.user_name() for _ in range(1000)]
+        self.images = []
+        self.bases = {}
+
+    def rng(self, table, shard):
+        return random.Random(f"{self.seed}:{table}:{shard}")
+
+    def text(self, rng, low, high):
+        words = rng.choices(self.words, k=rng.randint(low, high))
+        return " ".join(words).capitalize() + "."
+
+    def post_date(self, index):
+        return self.start + self.span * (index / max(self.posts, 1))
+
+    def user_id(self, rng):
+        rank = zipf_rank(rng, self.users, self.skew)
+        return self.bases[USERS] + scatter(rank, self.users) + 1
+
+    def shards(self):
+        """Задания пула по порядку вставки: таблица, пачка, строки."""
+        for table, total, size in (
+            (USERS, self.users, SHARD_ROWS),
+            (GROUPS, self.groups, SHARD_ROWS),
+            (POSTS, self.posts, SHARD_ROWS),
+            (COMMENTS, self.comments, SHARD_ROWS),
+            (FOLLOWS, self.users, SHARD_USERS),
+        ):
+            for shard, first in enumerate(range(0, total, size)):
+                yield table, shard, first, min(first + size, total)
+
+
+def generate_users(rng, first, last):
+    for index in range(first, last):
+        pk = plan.bases[USERS] + index + 1
+        yield (
+            pk,
+            f"{rng.choice(plan.logins)}{pk}",
+            rng.choice(plan.first_names),
+            rng.choice(plan.last_names),
+            plan.start + plan.span * (index / plan.users),
+        )
+
+
+def generate_groups(rng, first, last):
+    for index in range(first, last):
+        pk = plan.bases[GROUPS] + index + 1
+        title = plan.text(rng, 1, 3)[:-1]
+        yield pk, title, f"group-{pk}", plan.text(rng, 5, 30)
+
+
+def generate_posts(rng, first, last):
+    for index in range(first, last):
+        group_id = None
+        if plan.groups and rng.random() >= plan.no_group_share:
+            # Первые группы самые большие.
+            rank = zipf_rank(rng, plan.groups, plan.skew)
+            group_id = plan.bases[GROUPS] + rank + 1
+        image, width, height = "", None, None
+        if plan.images and rng.random() < plan.image_share:
+            image, width, height = rng.choice(plan.images)
+        yield (
+            plan.bases[POSTS] + index + 1,
+            plan.text(rng, 5, 60),
+            plan.user_id(rng),
+            group_id,
+            plan.post_date(index),
+            image,
+            width,
+            height,
+        )
+
+
+def generate_comments(rng, first, last):
+    for index in range(first, last):
+        post = scatter(zipf_rank(rng, plan.posts, plan.skew), plan.posts)
+        delay = timedelta(seconds=rng.expovariate(1 / 86400))
+        yield (
+            plan.bases[COMMENTS] + index + 1,
+            plan.text(rng, 3, 25),
+            plan.user_id(rng),
+            plan.bases[POSTS] + post + 1,
+            plan.post_date(post) + delay,
+        )
+
+
+def generate_follows(rng, first, last):
+    if plan.users < 2:
+        return
+    for index in range(first, last):
+        user_id = plan.bases[USERS] + index + 1
+        # У Парето с показателем 1.5 среднее 3: масштаб даёт среднее follows.
+        wanted = min(
+            int(rng.paretovariate(1.5) * plan.follows / 3), plan.users - 1
+        )
+        authors = set()
+        for _ in range(wanted * 3):
+            if len(authors) == wanted:
+                break
+            author_id = plan.user_id(rng)
+            if author_id != user_id:
+                authors.add(author_id)
+        for author_id in sorted(authors):
+            yield user_id, author_id
+
+
+GENERATORS = {
+    USERS: generate_users,
+    GROUPS: generate_groups,
+    POSTS: generate_posts,
+    COMMENTS: generate_comments,
+    FOLLOWS: generate_follows,
+}
+
+
+def init_worker(seed_plan):
+    global plan
+    plan = seed_plan
+
+
+def generate(task):
+    table, shard, first, last = task
+    rng = plan.rng(table, shard)
+    return table, list(GENERATORS[table](rng, first, last))
+
+
+class Seeder:
+    def __init__(self, seed_plan, workers=1, log=None):
+        self.plan = seed_plan
+        self.workers = workers
+        self.log = log or (lambda message: None)
+        self.password = make_password(None)
+        self.rows = dict.fromkeys(TABLES, 0)
+
+    def run(self):
+        plan = self.plan
+        for table, model in (
+            (USERS, User), (GROUPS, Group), (POSTS, Post),
+            (COMMENTS, Comment),
+        ):
+            plan.bases[table] = (
+                model.objects.aggregate(last=Max("pk"))["last"] or 0
+            )
+        if plan.image_share:
+            plan.images = self.make_images()
+        tasks = plan.shards()
+        with explicit_pub_date():
+            if self.workers > 1:
+                context = multiprocessing.get_context("fork")
+                with context.Pool(
+                    self.workers, initializer=init_worker, initargs=(plan,)
+                ) as pool:
+                    self.write(pool.imap(generate, tasks))
+            else:
+                init_worker(plan)
+                self.write(map(generate, tasks))
+
+    def make_images(self):
+        """Несколько картинок в хранилище, общих для всех постов."""
+        rng = self.plan.rng("images", 0)
+        images = []
+        for variant in range(IMAGE_VARIANTS):
+            size = (rng.randint(300, 1600), rng.randint(200, 1200))
+            name = f"posts/seed/{self.plan.seed}_{variant}.jpg"
+            if not default_storage.exists(name):
+                content = ContentFile(b"")
+                color = tuple(rng.randrange(256) for _ in range(3))
+                Image.new("RGB", size, color).save(content, "JPEG")
+                name = default_storage.save(name, content)
+            images.append((name, *size))
+        return images
+
+    def write(self, shards):
+        defaults = {USERS: {"password": self.password}}
+        for table, rows in shards:
+            model, fields = TABLES[table]
+            extra = defaults.get(table, {})
+            objects = [
+                model(**dict(zip(fields, row)), **extra) for row in rows
+            ]
+            if table in (POSTS, COMMENTS):
+                for instance in objects:
+                    markup.render_fields(instance)
+            with transaction.atomic():
+                model.objects.bulk_create(objects)
+            self.rows[table] += len(rows)
+            self.log(f"{table}: {self.rows[table]}")
+
+    def finalize(self, timelines=True, search_index=True):
+        """Счётчики, ленты и индекс: bulk_create не вызывает сигналы."""
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                no_style(), [User, Group, Post, Comment, Follow]
+            ):
+                cursor.execute(sql)
+        self.log("Пересчёт счётчиков")
+        with transaction.atomic():
+            recount_groups()
+            recount_posts()
+            recount_users()
+        if timelines:
+            self.log("Сборка лент подписок")
+            users = Follow.objects.order_by().values_list(
+                "user_id", flat=True
+            ).distinct()
+            with transaction.atomic():
+                for user_id in list(users):
+                    timeline.rebuild(user_id)
+        if search_index:
+            self.log("Сборка поискового индекса")
+            with transaction.atomic():
+                search.rebuild()
+        # Изменилась вся база: старые страницы и счётчики в кэше неверны.
+        cache.clear()
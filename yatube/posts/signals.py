@@ -0,0 +1,287 @@
+import threading
+from collections import Counter
+
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import cache as page_cache
+from . import cards, markup, search, thumbnails, timeline
+from .counters import bump, bump_user, bump_users
+from .models import Comment, Follow, Group, Post, User
+from .paginate_utils import adjust_feed_count, feed_count_key
+
+
+# id постов, которые удаляются в текущем потоке: от pre_delete поста
+# до его post_delete. Каскад удаляет комментарии раньше самого поста.
+_deleting = threading.local()
+
+
+def deleting_posts():
+    if not hasattr(_deleting, "post_ids"):
+        _deleting.post_ids = set()
+    return _deleting.post_ids
+
+
+def post_feed_keys(author_id, group_id):
+    keys = [feed_count_key("index"), feed_count_key("profile", author_id)]
+    if group_id is not None:
+        keys.append(feed_count_key("group", group_id))
+    return keys
+
+
+def bump_group(group_id, delta):
+    if group_id is not None:
+        bump(Group.objects.filter(pk=group_id), post_count=delta)
+        adjust_feed_count(feed_count_key("group", group_id), delta)
+
+
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=Comment)
+def render_text(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Готовит HTML текста один раз при сохранении (posts.markup)."""
+    if raw or (update_fields is not None and "text" not in update_fields):
+        return
+    markup.render_fields(instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_group(sender, instance, **kwargs):
+    """Запоминает группу и картинку поста до редактирования."""
+    instance._previous_group_id = None
+    instance._previous_image = None
+    if instance.pk is not None:
+        instance._previous_group_id, instance._previous_image = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list("group_id", "image")
+            .first()
+        ) or (None, None)
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    page_cache.forget_post_author(instance.pk)
+    page_cache.bump_post_pages(
+        instance,
+        instance.group_id,
+        getattr(instance, "_previous_group_id", None),
+    )
+    search.index(search.POST, instance.pk, instance.pk, instance.text)
+    if instance.image.name != getattr(instance, "_previous_image", None):
+        thumbnails.schedule(instance)
+    with transaction.atomic():
+        if created:
+            bump_user(instance.author_id, post_count=1)
+            bump_group(instance.group_id, 1)
+            adjust_feed_count(feed_count_key("index"), 1)
+            adjust_feed_count(
+                feed_count_key("profile", instance.author_id), 1
+            )
+            timeline.fan_out(instance)
+            return
+        previous_group_id = getattr(instance, "_previous_group_id", None)
+        if previous_group_id != instance.group_id:
+            bump_group(previous_group_id, -1)
+            bump_group(instance.group_id, 1)
+
+
+@receiver(pre_delete, sender=Post)
+def forget_post_comments(sender, instance, **kwargs):
+    """Снимает комментарии удаляемого поста с поиска и счётчиков разом.
+
+    Иначе каскад вызвал бы count_deleted_comment для каждого комментария
+    с тремя-четырьмя запросами. Здесь строки поиска удаляются пачкой,
+    счётчики комментариев всех авторов уменьшаются одним UPDATE, а
+    count_deleted_comment для комментариев этого поста ничего не делает.
+    Счётчик самого поста не трогаем: строка удаляется. Если удаление
+    откатится, расхождение счётчиков чинит manage.py recount.
+    """
+    comments = list(
+        Comment.objects.filter(post_id=instance.pk).values_list(
+            "pk", "author_id", "author__username"
+        )
+    )
+    search.remove_post(instance.pk, [pk for pk, _, _ in comments])
+    totals = Counter(author_id for _, author_id, _ in comments)
+    bump_users(
+        "comment_count",
+        {author_id: -total for author_id, total in totals.items()},
+    )
+    page_cache.bump(
+        *{
+            page_cache.stamp_key(page_cache.AUTHOR, username)
+            for _, _, username in comments
+        }
+    )
+    deleting_posts().add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    deleting_posts().discard(instance.pk)
+    page_cache.forget_post_author(instance.pk)
+    page_cache.bump_post_pages(instance, instance.group_id)
+    with transaction.atomic():
+        bump_user(instance.author_id, post_count=-1)
+        bump_group(instance.group_id, -1)
+    adjust_feed_count(feed_count_key("index"), -1)
+    adjust_feed_count(feed_count_key("profile", instance.author_id), -1)
+
+
+def commenter_stamp(comment):
+    """Профиль в API показывает число комментариев пользователя."""
+    return page_cache.stamp_key(page_cache.AUTHOR, comment.author.username)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    stamps = [page_cache.stamp_key(page_cache.POST, instance.post_id)]
+    if created:
+        stamps.append(commenter_stamp(instance))
+    page_cache.bump(*stamps)
+    search.index(
+        search.COMMENT, instance.pk, instance.post_id, instance.text
+    )
+    if not created:
+        return
+    with transaction.atomic():
+        bump(Post.objects.filter(pk=instance.post_id), comment_count=1)
+        bump_user(instance.author_id, comment_count=1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    if instance.post_id in deleting_posts():
+        # Пост удаляется целиком: всё сделал forget_post_comments.
+        return
+    search.remove(search.COMMENT, instance.pk)
+    page_cache.bump(
+        page_cache.stamp_key(page_cache.POST, instance.post_id),
+        commenter_stamp(instance),
+    )
+    with transaction.atomic():
+        bump(Post.objects.filter(pk=instance.post_id), comment_count=-1)
+        bump_user(instance.author_id, comment_count=-1)
+
+
+def bump_follow_pages(follow):
+    """Профили обоих пользователей показывают число подписок."""
+    page_cache.bump(
+        *(
+            page_cache.stamp_key(page_cache.AUTHOR, username)
+            for username in User.objects.filter(
+                pk__in=(follow.user_id, follow.author_id)
+            ).values_list("username", flat=True)
+        )
+    )
+
+
+@receiver(pre_save, sender=Group)
+def remember_previous_slug(sender, instance, **kwargs):
+    instance._previous_slug = (
+        Group.objects.filter(pk=instance.pk)
+        .values_list("slug", flat=True)
+        .first()
+        if instance.pk is not None
+        else None
+    )
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def bump_group_pages(sender, instance, raw=False, **kwargs):
+    """Название группы выводится в карточках всех лент."""
+    if raw:
+        return
+    slugs = {instance.slug, getattr(instance, "_previous_slug", None)}
+    page_cache.bump(
+        page_cache.stamp_key(page_cache.FEED),
+        *(
+            page_cache.stamp_key(page_cache.GROUP, slug)
+            for slug in slugs
+            if slug
+        ),
+    )
+
+
+@receiver(post_save, sender=Group)
+def touch_group_cards(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        cards.touch(instance.posts.all())
+
+
+@receiver(pre_delete, sender=Group)
+def touch_deleted_group_cards(sender, instance, **kwargs):
+    """Посты удаляемой группы останутся без неё: их карточки устарели.
+
+    Сигнал приходит в той же транзакции, что и SET_NULL.
+    """
+    cards.touch(instance.posts.all())
+
+
+# Поля пользователя, которые выводятся в карточках его постов
+CARD_USER_FIELDS = ("username", "first_name", "last_name")
+
+
+@receiver(pre_save, sender=User)
+def remember_previous_names(sender, instance, update_fields=None, **kwargs):
+    instance._previous_names = None
+    if instance.pk is None or (
+        update_fields is not None
+        and not set(update_fields) & set(CARD_USER_FIELDS)
+    ):
+        # Например, вход обновляет только last_login.
+        return
+    instance._previous_names = (
+        User.objects.filter(pk=instance.pk)
+        .values_list(*CARD_USER_FIELDS)
+        .first()
+    )
+
+
+@receiver(post_save, sender=User)
+def forget_renamed_author(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, "_previous_names", None)
+    if raw or previous is None:
+        return
+    if dict(zip(CARD_USER_FIELDS, previous))["username"] != instance.username:
+        page_cache.forget_username(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def touch_author_cards(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, "_previous_names", None)
+    if raw or created or previous is None:
+        return
+    names = tuple(getattr(instance, field) for field in CARD_USER_FIELDS)
+    if names != previous:
+        cards.touch(Post.objects.filter(author_id=instance.pk))
+        previous_username = dict(zip(CARD_USER_FIELDS, previous))["username"]
+        page_cache.bump_author_pages(
+            instance.pk, instance.username, previous_username
+        )
+
+
+@receiver(post_save, sender=Follow)
+def count_saved_follow(sender, instance, created, raw=False, **kwargs):
+    if raw or not created:
+        return
+    bump_follow_pages(instance)
+    with transaction.atomic():
+        bump_user(instance.author_id, follower_count=1)
+        bump_user(instance.user_id, following_count=1)
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    bump_follow_pages(instance)
+    with transaction.atomic():
+        bump_user(instance.author_id, follower_count=-1)
+        bump_user(instance.user_id, following_count=-1)
+        timeline.prune(instance.user_id, instance.author_id)
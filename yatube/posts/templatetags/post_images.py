@@ -0,0 +1,25 @@
+from django import template
+from django.conf import settings
+
+from ..thumbnails import ready_picture
+
+register = template.Library()
+
+
+@register.inclusion_tag("posts/includes/picture.html", takes_context=True)
+def post_picture(context, post, size):
+    """<picture> с вариантами картинки поста или заглушка, пока их нет.
+
+    Данные берутся из pictures контекста, если страница нашла варианты
+    всех постов заранее (posts.cards), иначе ищутся для одного поста.
+    """
+    pictures = context.get("pictures") or {}
+    width, height = settings.POST_THUMBNAILS[size]["geometry"].split("x")
+    return {
+        "picture": (
+            pictures[post.pk, size]
+            if (post.pk, size) in pictures
+            else ready_picture(post, size)
+        ),
+        "aspect_ratio": f"{width} / {height}",
+    }
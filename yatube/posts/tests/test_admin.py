@@ -0,0 +1,105 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+from .const import AUTHOR, GROUP_SLUG, GROUP_TITLE
+
+POST_CHANGELIST = reverse("admin:posts_post_changelist")
+COMMENT_CHANGELIST = reverse("admin:posts_comment_changelist")
+FOLLOW_CHANGELIST = reverse("admin:posts_follow_changelist")
+
+
+class AdminChangelistTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            "admin", "admin@example.com", "password"
+        )
+        cls.user = User.objects.create_user(username=AUTHOR)
+        cls.group = Group.objects.create(
+            title=GROUP_TITLE, slug=GROUP_SLUG, description=""
+        )
+        cls.post = Post.objects.create(
+            text="Первый пост", author=cls.user, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def add_rows(self, number):
+        User.objects.bulk_create(
+            User(username=f"reader{index}") for index in range(number)
+        )
+        users = list(User.objects.filter(username__startswith="reader"))
+        Post.objects.bulk_create(
+            Post(text="пост", author=user, group=self.group)
+            for user in users
+        )
+        Comment.objects.bulk_create(
+            Comment(text="комментарий", author=user, post=self.post)
+            for user in users
+        )
+        Follow.objects.bulk_create(
+            Follow(user=user, author=self.user) for user in users
+        )
+
+    def measure(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.content.decode()
+
+    def test_queries_do_not_grow_with_rows_and_users(self):
+        for url in (POST_CHANGELIST, COMMENT_CHANGELIST, FOLLOW_CHANGELIST):
+            with self.subTest(url=url):
+                self.add_rows(2)
+                small, _ = self.measure(url)
+                User.objects.filter(username__startswith="reader").delete()
+                self.add_rows(40)
+                large, content = self.measure(url)
+                User.objects.filter(username__startswith="reader").delete()
+                self.assertEqual(small, large)
+                # В строке только выбранное значение, а не все пользователи.
+                self.assertLess(content.count("<option"), 40 * 3 + 10)
+
+    def test_unfiltered_count_is_cached(self):
+        self.client.get(POST_CHANGELIST)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(POST_CHANGELIST)
+        self.assertFalse(
+            any("COUNT(" in query["sql"] for query in queries)
+        )
+
+    def test_date_hierarchy_does_not_scan_table(self):
+        year = self.post.pub_date.year
+        for params in ({}, {"pub_date__year": year}):
+            with self.subTest(params=params):
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(POST_CHANGELIST, params)
+                self.assertContains(response, str(year))
+                for query in queries:
+                    self.assertNotIn("django_datetime", query["sql"])
+
+    @override_settings(ADMIN_PERFORMANCE_MODE=False)
+    def test_performance_mode_can_be_disabled(self):
+        self.add_rows(3)
+        _, content = self.measure(POST_CHANGELIST)
+        self.assertNotIn("admin-autocomplete", content)
+        self.assertIn(f">{GROUP_TITLE}</option>", content)
+
+    def test_bench_command_stays_within_budget(self):
+        out = StringIO()
+        call_command("bench_admin", posts=300, users=50, stdout=out)
+        self.assertIn("подписки: 200", out.getvalue())
+        self.assertFalse(
+            User.objects.filter(username__startswith="bench_admin_").exists()
+        )
@@ -0,0 +1,41 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from .. import benchmarks
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ViewBenchmarksTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        benchmarks.seed("small")
+        cls.results = benchmarks.measure(repeat=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_every_url_is_measured(self):
+        names = {name for name, _ in benchmarks.url_names()}
+        measured = {case.split(" ")[0] for case in self.results}
+        self.assertEqual(names, measured)
+
+    def test_small_dataset_matches_committed_baseline(self):
+        baseline = benchmarks.load_baseline()["small"]
+        self.assertEqual(
+            benchmarks.compare(self.results, baseline, latency=False), []
+        )
+
+    def test_extra_query_is_a_regression(self):
+        case, metrics = next(iter(self.results.items()))
+        baseline = {case: dict(metrics, queries=metrics["queries"] - 1)}
+        regressions = benchmarks.compare({case: metrics}, baseline)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn("запросов", regressions[0])
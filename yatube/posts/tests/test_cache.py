@@ -0,0 +1,95 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Group, Post, User
+from .const import (AUTHOR, COMMENT_TEXT, GROUP_DESCRIPTION, GROUP_SLUG,
+                    GROUP_TITLE, POST_TEXT)
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username=AUTHOR)
+        cls.group = Group.objects.create(
+            title=GROUP_TITLE, slug=GROUP_SLUG, description=GROUP_DESCRIPTION
+        )
+        cls.post = Post.objects.create(
+            text=POST_TEXT, author=cls.user, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.urls = (
+            reverse("posts:index"),
+            reverse("posts:group_list", args=(self.group.slug,)),
+            reverse("posts:profile", args=(self.user.username,)),
+            reverse("posts:post_detail", args=(self.post.pk,)),
+        )
+
+    def test_repeated_request_runs_no_queries(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.guest_client.get(url)
+                self.assertEqual(first.content, second.content)
+                self.assertEqual(first["ETag"], second["ETag"])
+
+    def test_post_change_invalidates_every_page(self):
+        responses = {url: self.guest_client.get(url) for url in self.urls}
+        self.post.text = "Новый текст поста"
+        self.post.save()
+        for url, response in responses.items():
+            with self.subTest(url=url):
+                fresh = self.guest_client.get(url)
+                self.assertNotEqual(fresh["ETag"], response["ETag"])
+                self.assertContains(fresh, "Новый текст поста")
+
+    def test_comment_invalidates_only_its_post(self):
+        index_url, _, _, detail_url = self.urls
+        index = self.guest_client.get(index_url)
+        detail = self.guest_client.get(detail_url)
+        Comment.objects.create(
+            post=self.post, author=self.user, text=COMMENT_TEXT
+        )
+        self.assertEqual(self.guest_client.get(index_url)["ETag"],
+                         index["ETag"])
+        fresh = self.guest_client.get(detail_url)
+        self.assertNotEqual(fresh["ETag"], detail["ETag"])
+        self.assertContains(fresh, COMMENT_TEXT)
+
+    def test_conditional_get_returns_not_modified(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                not_modified = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=response["ETag"]
+                )
+                self.assertEqual(not_modified.status_code, 304)
+                not_modified = self.guest_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+                )
+                self.assertEqual(not_modified.status_code, 304)
+
+    def test_authorized_pages_are_not_cached(self):
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(self.urls[0])
+        self.assertNotIn("ETag", response)
+
+    def test_renamed_author_gets_fresh_post_page(self):
+        detail_url = self.urls[-1]
+        self.assertContains(self.guest_client.get(detail_url), AUTHOR)
+        author = User.objects.get(pk=self.user.pk)
+        author.username = "renamed_author"
+        author.save()
+        self.assertContains(
+            self.guest_client.get(detail_url), "renamed_author"
+        )
+        Post.objects.create(text=POST_TEXT, author=author)
+        self.assertContains(
+            self.guest_client.get(detail_url),
+            "<strong>Всего постов автора:</strong> 2",
+        )
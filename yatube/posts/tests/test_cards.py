@@ -0,0 +1,138 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.test.signals import template_rendered
+from django.urls import reverse
+from mixer.backend.django import mixer
+
+from .. import cards
+from ..models import Group, Post, User
+
+POSTS = 3
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = mixer.blend(
+            User, first_name="Лев", last_name="Толстой"
+        )
+        cls.group = mixer.blend(Group, title="Классика")
+        mixer.cycle(POSTS).blend(Post, author=cls.author, group=cls.group)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.rendered = []
+        template_rendered.connect(self.on_render)
+        self.addCleanup(template_rendered.disconnect, self.on_render)
+
+    def on_render(self, sender, template, context, **kwargs):
+        if template.name == cards.TEMPLATE:
+            self.rendered.append(context["post"].pk)
+
+    def posts(self):
+        return Post.objects.select_related("author", "group")
+
+    def test_cards_are_rendered_once_and_shared_by_feeds(self):
+        index = self.client.get(reverse("posts:index"))
+        self.assertEqual(len(self.rendered), POSTS)
+        follow_author = mixer.blend(User)
+        self.client.force_login(follow_author)
+        self.client.get(
+            reverse("posts:profile_follow", args=(self.author.username,))
+        )
+        self.rendered.clear()
+        follow = self.client.get(reverse("posts:follow_index"))
+        self.assertEqual(self.rendered, [])
+        for post in self.posts():
+            with self.subTest(post=post.pk):
+                url = reverse("posts:post_detail", args=(post.pk,))
+                self.assertContains(index, url)
+                self.assertContains(follow, url)
+
+    def test_page_reads_cards_with_one_request(self):
+        with mock.patch.object(
+            cards.cache, "get_many", wraps=cards.cache.get_many
+        ) as get_many:
+            cards.render_cards(self.posts())
+        # Второй get_many — варианты картинок (posts.thumbnails).
+        card_reads = [
+            keys for (keys,), _ in get_many.call_args_list
+            if keys[0].startswith("post_card:")
+        ]
+        self.assertEqual(len(card_reads), 1)
+
+    def test_edit_rerenders_only_its_card(self):
+        cards.render_cards(self.posts())
+        post = Post.objects.first()
+        post.text = "Новый текст"
+        post.save()
+        self.rendered.clear()
+        html = cards.render_cards(self.posts())
+        self.assertEqual(self.rendered, [post.pk])
+        self.assertIn("Новый текст", "".join(html))
+
+    def test_group_and_author_changes_rerender_cards(self):
+        changes = (
+            (self.group, "title", "Новая классика", None),
+            (self.author, "first_name", "Алексей", None),
+            (self.author, "last_login", None, ["last_login"]),
+        )
+        for instance, field, value, update_fields in changes:
+            with self.subTest(field=field):
+                cards.render_cards(self.posts())
+                self.rendered.clear()
+                setattr(instance, field, value)
+                instance.save(update_fields=update_fields)
+                html = "".join(cards.render_cards(self.posts()))
+                if update_fields:
+                    self.assertEqual(self.rendered, [])
+                    continue
+                self.assertEqual(len(self.rendered), POSTS)
+                self.assertIn(value, html)
+
+    def test_author_rename_invalidates_cached_pages(self):
+        urls = (
+            reverse("posts:index"),
+            reverse("posts:group_list", args=(self.group.slug,)),
+            reverse("posts:post_detail", args=(Post.objects.first().pk,)),
+        )
+        for url in urls:
+            self.assertContains(self.client.get(url), "Лев Толстой")
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = "Алексей"
+        author.save()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), "Алексей Толстой")
+
+    def test_group_delete_rerenders_cards(self):
+        cards.render_cards(self.posts())
+        self.group.delete()
+        self.rendered.clear()
+        html = "".join(cards.render_cards(self.posts()))
+        self.assertEqual(len(self.rendered), POSTS)
+        self.assertNotIn("Классика", html)
+
+    def test_variants_are_cached_separately(self):
+        feed = "".join(cards.render_cards(self.posts()))
+        group = "".join(cards.render_cards(self.posts(), "group"))
+        profile = "".join(cards.render_cards(self.posts(), "profile"))
+        group_url = reverse("posts:group_list", args=(self.group.slug,))
+        profile_url = reverse("posts:profile", args=(self.author.username,))
+        self.assertIn(group_url, feed)
+        self.assertNotIn(group_url, group)
+        self.assertIn(profile_url, feed)
+        self.assertNotIn(profile_url, profile)
+        self.assertEqual(len(self.rendered), 3 * POSTS)
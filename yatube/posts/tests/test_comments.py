@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..bulk import explicit_pub_date
+from ..models import Comment, Post, User
+from .const import AUTHOR, POST_TEXT
+
+
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username=AUTHOR)
+        cls.post = Post.objects.create(text=POST_TEXT, author=cls.user)
+        cls.quiet_post = Post.objects.create(text=POST_TEXT, author=cls.user)
+        start = datetime(2020, 1, 1)
+        with explicit_pub_date():
+            Comment.objects.bulk_create(
+                Comment(
+                    post=cls.post,
+                    author=cls.user,
+                    text=f"Комментарий {index}",
+                    pub_date=start + timedelta(minutes=index),
+                )
+                for index in range(50)
+            )
+            Comment.objects.bulk_create(
+                Comment(
+                    post=cls.quiet_post,
+                    author=cls.user,
+                    text=f"Комментарий {index}",
+                    pub_date=start + timedelta(minutes=index),
+                )
+                for index in range(5)
+            )
+        cls.detail_url = reverse("posts:post_detail", args=(cls.post.pk,))
+        cls.comments_url = reverse("posts:post_comments", args=(cls.post.pk,))
+        cls.json_url = reverse("posts:post_comments_json", args=(cls.post.pk,))
+
+    def setUp(self):
+        cache.clear()
+
+    def texts(self, comments):
+        return [comment.text for comment in comments]
+
+    def test_detail_shows_newest_comments_first(self):
+        response = self.client.get(self.detail_url)
+        comments = response.context["comments"]
+        self.assertEqual(len(comments), settings.COMMENTS_PER_PAGE)
+        self.assertEqual(comments[0].text, "Комментарий 49")
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, "Показать ещё")
+
+    def test_load_more_fragment_continues_from_cursor(self):
+        first = self.client.get(self.detail_url).context["comments"]
+        response = self.client.get(
+            self.comments_url, {"cursor": first.next_cursor}
+        )
+        self.assertTemplateUsed(response, "posts/includes/comment_list.html")
+        self.assertNotContains(response, "<html")
+        second = response.context["comments"]
+        self.assertEqual(
+            second[0].text, f"Комментарий {49 - settings.COMMENTS_PER_PAGE}"
+        )
+        self.assertFalse(
+            set(self.texts(first)) & set(self.texts(second))
+        )
+
+    def test_json_walks_all_comments(self):
+        seen = []
+        cursor = None
+        while True:
+            params = {"cursor": cursor} if cursor else {}
+            data = self.client.get(self.json_url, params).json()
+            seen.extend(item["id"] for item in data["results"])
+            cursor = data["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(len(seen), 50)
+        self.assertEqual(
+            seen,
+            list(
+                self.post.comments.order_by("-pub_date", "-pk")
+                .values_list("pk", flat=True)
+            ),
+        )
+
+    def test_detail_queries_do_not_depend_on_comment_count(self):
+        counts = []
+        for post in (self.quiet_post, self.post):
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse("posts:post_detail", args=(post.pk,)))
+            counts.append(len(queries))
+            self.assertEqual(
+                sum("posts_comment" in query["sql"] for query in queries), 1
+            )
+        self.assertEqual(counts[0], counts[1])
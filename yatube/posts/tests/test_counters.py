@@ -0,0 +1,152 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..counters import bump_users
+from ..models import Comment, Follow, Group, Post, User, UserCounters
+from .const import (ANOTHERUSER, AUTHOR, COMMENT_TEXT, GROUP_DESCRIPTION,
+                    GROUP_DESCRIPTION_2, GROUP_SLUG, GROUP_SLUG_2, GROUP_TITLE,
+                    GROUP_TITLE_2, POST_TEXT)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username=AUTHOR)
+        cls.another_user = User.objects.create_user(username=ANOTHERUSER)
+        cls.group = Group.objects.create(
+            title=GROUP_TITLE, slug=GROUP_SLUG, description=GROUP_DESCRIPTION
+        )
+        cls.group_2 = Group.objects.create(
+            title=GROUP_TITLE_2,
+            slug=GROUP_SLUG_2,
+            description=GROUP_DESCRIPTION_2,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_post_and_comment_counters_follow_saves_and_deletes(self):
+        post = Post.objects.create(
+            text=POST_TEXT, author=self.user, group=self.group
+        )
+        Post.objects.create(text=POST_TEXT, author=self.user)
+        comment = Comment.objects.create(
+            post=post, author=self.another_user, text=COMMENT_TEXT
+        )
+        self.assertEqual(self.counters(self.user).post_count, 2)
+        self.assertEqual(self.counters(self.another_user).comment_count, 1)
+        self.group.refresh_from_db()
+        post.refresh_from_db()
+        self.assertEqual(self.group.post_count, 1)
+        self.assertEqual(post.comment_count, 1)
+
+        post.group = self.group_2
+        post.save()
+        self.group.refresh_from_db()
+        self.group_2.refresh_from_db()
+        self.assertEqual(self.group.post_count, 0)
+        self.assertEqual(self.group_2.post_count, 1)
+
+        comment.delete()
+        post.delete()
+        self.group_2.refresh_from_db()
+        self.assertEqual(self.counters(self.user).post_count, 1)
+        self.assertEqual(self.counters(self.another_user).comment_count, 0)
+        self.assertEqual(self.group_2.post_count, 0)
+
+    def test_deleting_post_with_comments_costs_no_query_per_comment(self):
+        def delete_commented_post(comments):
+            post = Post.objects.create(text=POST_TEXT, author=self.user)
+            Comment.objects.bulk_create(
+                Comment(
+                    post=post,
+                    author=self.user if number % 3 else self.another_user,
+                    text=COMMENT_TEXT,
+                )
+                for number in range(comments)
+            )
+            call_command("recount", stdout=StringIO())
+            with CaptureQueriesContext(connection) as queries:
+                post.delete()
+            return len(queries)
+
+        self.assertEqual(delete_commented_post(6), delete_commented_post(30))
+        self.assertEqual(self.counters(self.user).comment_count, 0)
+        self.assertEqual(self.counters(self.another_user).comment_count, 0)
+        Comment.objects.create(
+            post=Post.objects.create(text=POST_TEXT, author=self.user),
+            author=self.another_user,
+            text=COMMENT_TEXT,
+        ).delete()
+        self.assertEqual(self.counters(self.another_user).comment_count, 0)
+
+    def test_bump_users_keeps_counters_non_negative(self):
+        for user in (self.user, self.another_user):
+            Comment.objects.create(
+                post=Post.objects.create(text=POST_TEXT, author=user),
+                author=user,
+                text=COMMENT_TEXT,
+            )
+        with self.assertNumQueries(1):
+            bump_users(
+                "comment_count", {self.user.pk: -1, self.another_user.pk: -2}
+            )
+        self.assertEqual(self.counters(self.user).comment_count, 0)
+        self.assertEqual(self.counters(self.another_user).comment_count, 1)
+
+    def test_follow_counters(self):
+        follow = Follow.objects.create(
+            user=self.another_user, author=self.user
+        )
+        self.assertEqual(self.counters(self.user).follower_count, 1)
+        self.assertEqual(self.counters(self.another_user).following_count, 1)
+        follow.delete()
+        self.assertEqual(self.counters(self.user).follower_count, 0)
+        self.assertEqual(self.counters(self.another_user).following_count, 0)
+
+    def test_recount_repairs_drift(self):
+        Post.objects.bulk_create(
+            Post(text=POST_TEXT, author=self.user, group=self.group)
+            for _ in range(3)
+        )
+        Follow.objects.bulk_create(
+            [Follow(user=self.another_user, author=self.user)]
+        )
+        call_command("recount", stdout=StringIO())
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.post_count, 3)
+        self.assertEqual(self.counters(self.user).post_count, 3)
+        self.assertEqual(self.counters(self.user).follower_count, 1)
+        self.assertEqual(self.counters(self.another_user).following_count, 1)
+
+    def test_detail_and_profile_run_no_aggregates(self):
+        post = Post.objects.create(
+            text=POST_TEXT, author=self.user, group=self.group
+        )
+        client = Client()
+        client.force_login(self.another_user)
+        urls = (
+            reverse("posts:post_detail", args=(post.pk,)),
+            reverse("posts:profile", args=(self.user.username,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                client.get(url)
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(url)
+                counts = [
+                    query["sql"]
+                    for query in queries.captured_queries
+                    if "COUNT(" in query["sql"]
+                ]
+                self.assertEqual(counts, [])
+                self.assertContains(response, "Всего постов")
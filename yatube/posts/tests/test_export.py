@@ -0,0 +1,166 @@
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..bulk import explicit_pub_date
+from ..exporter import SPECS, keyset_page
+from ..models import Comment, Follow, Group, Post, User
+from .const import ANOTHERUSER, AUTHOR, GROUP_SLUG, GROUP_TITLE
+
+EXPORT_URL = reverse("posts:export")
+
+
+class ExportPostsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username=AUTHOR)
+        cls.reader = User.objects.create_user(username=ANOTHERUSER)
+        cls.staff = User.objects.create_user(username="staff", is_staff=True)
+        cls.group = Group.objects.create(
+            title=GROUP_TITLE, slug=GROUP_SLUG, description=""
+        )
+        # Несколько постов с одной датой проверяют ключ (pub_date, id).
+        with explicit_pub_date():
+            Post.objects.bulk_create(
+                Post(
+                    text=f"Пост {index}",
+                    author=cls.author,
+                    group=cls.group if index % 2 else None,
+                    pub_date=datetime(2020, 1, 1 + index // 3),
+                )
+                for index in range(7)
+            )
+            cls.last = Post.objects.order_by("pub_date", "id").last()
+            Comment.objects.create(
+                text="Комментарий",
+                author=cls.reader,
+                post=cls.last,
+                pub_date=datetime(2020, 2, 1),
+            )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir)
+
+    def export(self, *args, **options):
+        out = StringIO()
+        err = StringIO()
+        call_command(
+            "export_posts",
+            *args,
+            chunk_size=2,
+            stdout=out,
+            stderr=err,
+            **options,
+        )
+        return err.getvalue()
+
+    def read_ndjson(self, path):
+        with open(path, encoding="utf-8") as file:
+            return [json.loads(line) for line in file]
+
+    def test_exports_every_row_once_across_pages(self):
+        path = os.path.join(self.workdir, "all.ndjson")
+        output = self.export(path)
+        records = self.read_ndjson(path)
+        posts = [record for record in records if record["type"] == "post"]
+        self.assertEqual(
+            [record["id"] for record in posts],
+            list(
+                Post.objects.order_by("pub_date", "id").values_list(
+                    "id", flat=True
+                )
+            ),
+        )
+        self.assertEqual(posts[1]["author"], AUTHOR)
+        self.assertEqual(posts[1]["group"], GROUP_SLUG)
+        comment, follow = records[-2:]
+        self.assertEqual(comment["post"], self.last.pk)
+        self.assertEqual(comment["pub_date"], "2020-02-01T00:00:00")
+        self.assertEqual(
+            (follow["user"], follow["author"]), (ANOTHERUSER, AUTHOR)
+        )
+        self.assertIn("Выгружено строк: 9", output)
+        self.assertIn("2020-02-01T00:00:00", output)
+
+    def test_next_pages_seek_index_range(self):
+        expected = {
+            "posts": "post_date_idx",
+            "comments": "comment_date_idx",
+            "follows": "PRIMARY KEY",
+        }
+        for kind, index_name in expected.items():
+            with self.subTest(kind=kind):
+                spec = SPECS[kind]
+                row = spec.queryset().first()
+                plan = keyset_page(
+                    spec.queryset(), spec.keys,
+                    [row[key] for key in spec.keys], 2,
+                ).explain()
+                self.assertIn(index_name, plan)
+                self.assertNotIn(" SCAN ", plan)
+                self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_since_exports_only_newer_posts_and_comments(self):
+        path = os.path.join(self.workdir, "new.ndjson")
+        self.export(path, since="2020-01-02", kinds=["posts", "comments"])
+        records = self.read_ndjson(path)
+        self.assertEqual(
+            [record["pub_date"][:10] for record in records],
+            ["2020-01-03", "2020-02-01"],
+        )
+
+    def test_since_with_timezone_is_rejected(self):
+        path = os.path.join(self.workdir, "aware.ndjson")
+        with self.assertRaises(CommandError):
+            self.export(path, since="2020-01-02T00:00:00+03:00")
+
+    def test_gzip_csv(self):
+        path = os.path.join(self.workdir, "posts.csv.gz")
+        self.export(path, kinds=["posts"])
+        with gzip.open(path, "rt", encoding="utf-8", newline="") as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(rows[0]["type"], "post")
+        self.assertEqual(rows[0]["group"], "")
+
+    def test_view_is_staff_only(self):
+        client = Client()
+        client.force_login(self.reader)
+        self.assertEqual(client.get(EXPORT_URL).status_code, 302)
+
+    def test_view_streams_gzip(self):
+        client = Client()
+        client.force_login(self.staff)
+        response = client.get(
+            EXPORT_URL, {"kinds": "follows", "gzip": "1"}
+        )
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        lines = gzip.decompress(b"".join(response.streaming_content))
+        self.assertEqual(json.loads(lines)["user"], ANOTHERUSER)
+
+    def test_view_rejects_bad_parameters(self):
+        client = Client()
+        client.force_login(self.staff)
+        bad_parameters = (
+            {"format": "xml"},
+            {"kinds": "users"},
+            {"since": "x"},
+            {"since": "2020-01-02T00:00:00Z"},
+        )
+        for params in bad_parameters:
+            with self.subTest(params=params):
+                self.assertEqual(
+                    client.get(EXPORT_URL, params).status_code, 400
+                )
@@ -0,0 +1,188 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..models import Comment, Group, Post, User
+from ..search import search_posts
+from .const import AUTHOR, GROUP_SLUG
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b"\x47\x49\x46\x38\x39\x61\x02\x00"
+    b"\x01\x00\x80\x00\x00\x00\x00\x00"
+    b"\xFF\xFF\xFF\x21\xF9\x04\x00\x00"
+    b"\x00\x00\x00\x2C\x00\x00\x00\x00"
+    b"\x02\x00\x01\x00\x00\x02\x02\x0C"
+    b"\x0A\x00\x3B"
+)
+RECORDS = [
+    {
+        "id": 101,
+        "text": "Импортированный пост про кошек",
+        "author": AUTHOR,
+        "group": GROUP_SLUG,
+        "pub_date": "2015-05-01T10:00:00",
+        "image": "old/cat.gif",
+    },
+    {
+        "id": 102,
+        "text": "Второй пост",
+        "author": "newcomer",
+        "pub_date": "2015-05-02T10:00:00",
+    },
+    {"type": "comment", "text": "без поста и автора"},
+    {
+        "type": "comment",
+        "id": 201,
+        "post": 101,
+        "text": "Комментарий",
+        "author": "newcomer",
+        "pub_date": "2015-05-03T10:00:00",
+    },
+]
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImportPostsTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(username=AUTHOR)
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir)
+        os.makedirs(os.path.join(self.workdir, "old"))
+        with open(os.path.join(self.workdir, "old", "cat.gif"), "wb") as gif:
+            gif.write(SMALL_GIF)
+
+    def write(self, name, content):
+        path = os.path.join(self.workdir, name)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(content)
+        return path
+
+    def import_file(self, path, **options):
+        out = StringIO()
+        call_command(
+            "import_posts",
+            path,
+            images_root=self.workdir,
+            batch_size=2,
+            chunk_size=2,
+            stdout=out,
+            **options,
+        )
+        return out.getvalue()
+
+    def ndjson(self, records=RECORDS):
+        return self.write(
+            "posts.ndjson",
+            "\n".join(json.dumps(record) for record in records) + "\n",
+        )
+
+    def test_imports_posts_comments_and_images(self):
+        output = self.import_file(self.ndjson())
+        self.assertIn("ошибок 1", output)
+        post = Post.objects.get(pk=101)
+        self.assertEqual(post.group.slug, GROUP_SLUG)
+        self.assertEqual(post.pub_date.year, 2015)
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertTrue(post.image.storage.exists(post.image.name))
+        self.assertTrue(User.objects.filter(username="newcomer").exists())
+        self.assertEqual(Comment.objects.get(pk=201).post_id, 101)
+        # Сигналы не вызывались: всё пересчитано в конце импорта.
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(Group.objects.get(slug=GROUP_SLUG).post_count, 1)
+        self.assertEqual(
+            [found.pk for found in search_posts("кошек")], [101]
+        )
+
+    def test_reimport_is_idempotent(self):
+        path = self.ndjson()
+        self.import_file(path)
+        os.remove(path + ".checkpoint")
+        self.import_file(path)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 1)
+
+    def test_resumes_from_checkpoint(self):
+        path = self.ndjson()
+        self.write(
+            "posts.ndjson.checkpoint",
+            json.dumps({"position": 1, "state": None}),
+        )
+        output = self.import_file(path)
+        self.assertIn("Продолжение с записи 1", output)
+        self.assertFalse(Post.objects.filter(pk=101).exists())
+        self.assertTrue(Post.objects.filter(pk=102).exists())
+        self.assertFalse(Comment.objects.exists())
+        self.assertIn("Нет поста 101", output)
+        with open(path + ".checkpoint") as checkpoint:
+            self.assertEqual(json.load(checkpoint)["position"], len(RECORDS))
+
+    def test_resumed_import_finalizes_rows_before_interruption(self):
+        checkpoint = os.path.join(self.workdir, "import.checkpoint")
+        self.import_file(
+            self.write(
+                "head.ndjson",
+                "\n".join(json.dumps(record) for record in RECORDS[:2]),
+            ),
+            checkpoint=checkpoint,
+            no_finalize=True,
+        )
+        self.assertEqual(Group.objects.get(slug=GROUP_SLUG).post_count, 0)
+        output = self.import_file(self.ndjson(), checkpoint=checkpoint)
+        self.assertIn("Продолжение с записи 2", output)
+        self.assertEqual(Group.objects.get(slug=GROUP_SLUG).post_count, 1)
+        self.assertEqual(Post.objects.get(pk=101).comment_count, 1)
+        self.assertEqual(
+            [found.pk for found in search_posts("кошек")], [101]
+        )
+
+    def test_finalize_leaves_untouched_rows_alone(self):
+        other = Post.objects.create(
+            text="Старый пост про кошек",
+            author=User.objects.create_user(username="old"),
+        )
+        Post.objects.filter(pk=other.pk).update(comment_count=5)
+        self.import_file(self.ndjson())
+        self.assertEqual(Post.objects.get(pk=other.pk).comment_count, 5)
+        self.assertEqual(Post.objects.get(pk=101).comment_count, 1)
+
+    @override_settings(TIME_ZONE="Europe/Moscow")
+    def test_aware_dates_become_local_time(self):
+        self.import_file(
+            self.ndjson(
+                [
+                    {
+                        "id": 5,
+                        "text": "Пост с поясом",
+                        "author": AUTHOR,
+                        "pub_date": "2015-05-01T10:00:00+00:00",
+                    }
+                ]
+            )
+        )
+        self.assertEqual(
+            Post.objects.get(pk=5).pub_date, datetime(2015, 5, 1, 13, 0)
+        )
+
+    def test_csv_input(self):
+        path = self.write(
+            "posts.csv",
+            "id,text,author,group,pub_date\n"
+            f"7,Пост из CSV,{AUTHOR},,2016-01-01T00:00:00\n",
+        )
+        self.import_file(path)
+        self.assertEqual(Post.objects.get(pk=7).text, "Пост из CSV")
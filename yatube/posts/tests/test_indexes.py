@@ -0,0 +1,39 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..management.commands.bench_indexes import feed_queries
+from ..models import Post
+
+
+class FeedIndexesTest(TestCase):
+    def test_feed_queries_use_composite_indexes(self):
+        plans = dict(
+            (name, queryset.explain())
+            for name, queryset in feed_queries(
+                {"group_id": 1, "author_id": 1, "user_id": 1, "post_id": 1}
+            )
+        )
+        expected = {
+            "index": "post_date_idx",
+            "group": "post_group_date_idx",
+            "profile": "post_author_date_idx",
+            "follow (timeline)": "timeline_user_date_idx",
+            "follow (celebrity)": "post_author_date_idx",
+            "followers": "follow_author_user_idx",
+            "comments": "comment_post_date_idx",
+        }
+        for name, index_name in expected.items():
+            with self.subTest(name=name):
+                self.assertIn(index_name, plans[name])
+                self.assertNotIn("TEMP B-TREE", plans[name])
+
+    def test_bench_command_rolls_back_seeded_rows(self):
+        out = StringIO()
+        call_command("bench_indexes", posts=50, repeat=1, stdout=out)
+        self.assertIn("Без индексов", out.getvalue())
+        self.assertFalse(Post.objects.exists())
+        self.assertIn("post_group_date_idx", feed_queries(
+            {"group_id": 1, "author_id": 1, "user_id": 1, "post_id": 1}
+        )[1][1].explain())
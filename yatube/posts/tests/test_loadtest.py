@@ -0,0 +1,91 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.signals import got_request_exception
+from django.db import OperationalError
+from django.test import (LiveServerTestCase, RequestFactory, SimpleTestCase,
+                         override_settings)
+
+from .. import benchmarks, loadtest
+from ..models import Comment, Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class HistogramTest(SimpleTestCase):
+    def test_buckets_keep_significant_digits(self):
+        histogram = loadtest.Histogram(digits=2)
+        self.assertEqual(histogram.bucket(57), 57)
+        self.assertEqual(histogram.bucket(1234), 1200)
+        self.assertEqual(histogram.bucket(98765), 98000)
+
+    def test_percentiles(self):
+        histogram = loadtest.Histogram()
+        for milliseconds in range(1, 101):
+            histogram.record(milliseconds / 1000)
+        self.assertEqual(histogram.total, 100)
+        self.assertEqual(histogram.percentile(50), 50000)
+        self.assertEqual(histogram.percentile(99), 99000)
+        self.assertEqual(histogram.max, 100000)
+        self.assertEqual(
+            sum(int(line.split()[2]) for line in histogram.lines()), 100
+        )
+
+    def test_parse_mix(self):
+        self.assertEqual(
+            loadtest.parse_mix("read=3, write=1"), {"read": 3, "write": 1}
+        )
+        for mix in ("read=1,delete=1", "read=0"):
+            with self.subTest(mix=mix):
+                with self.assertRaises(ValueError):
+                    loadtest.parse_mix(mix)
+
+    def test_lock_errors_are_counted_per_endpoint(self):
+        request = RequestFactory().get(
+            "/", HTTP_X_LOAD_ENDPOINT="add_comment"
+        )
+        with loadtest.LockCounter() as locks:
+            for error in ("database is locked", "no such table"):
+                try:
+                    raise OperationalError(error)
+                except OperationalError:
+                    got_request_exception.send(sender=None, request=request)
+        self.assertEqual(locks.counts, {"add_comment": 1})
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class LoadDriverTest(LiveServerTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_mix_reaches_every_endpoint(self):
+        benchmarks.seed("small")
+        posts = Post.objects.count()
+        comments = Comment.objects.count()
+        driver = loadtest.LoadDriver(
+            self.live_server_url,
+            loadtest.Targets(users=2),
+            loadtest.parse_mix(loadtest.DEFAULT_MIX),
+            # Общая база в памяти блокирует таблицы при параллельных
+            # запросах; параллельность проверяет bench_load на файле.
+            concurrency=1,
+            duration=2,
+        )
+        stats = driver.run()
+        self.assertEqual(
+            set(stats),
+            {name for names in loadtest.SCENARIOS.values() for name in names},
+        )
+        for endpoint, item in stats.items():
+            with self.subTest(endpoint=endpoint):
+                self.assertEqual(item.errors, 0)
+        self.assertEqual(
+            Post.objects.count() - posts, stats["post_create"].histogram.total
+        )
+        self.assertEqual(
+            Comment.objects.count() - comments,
+            stats["add_comment"].histogram.total,
+        )
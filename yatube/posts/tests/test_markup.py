@@ -0,0 +1,130 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import markup
+from ..models import Comment, Post, User
+from .const import AUTHOR
+
+TEXT = "Первый абзац <script>alert(1)</script>\nстрока\n\nВторой абзац"
+TEXT_HTML = (
+    "<p>Первый абзац &lt;script&gt;alert(1)&lt;/script&gt;<br>строка</p>"
+    "\n\n<p>Второй абзац</p>"
+)
+
+
+class RenderedTextTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username=AUTHOR)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_forms_store_escaped_html(self):
+        self.client.post(reverse("posts:post_create"), {"text": TEXT})
+        post = Post.objects.get()
+        self.assertEqual(post.text_html, TEXT_HTML)
+        self.assertEqual(post.preview_html, TEXT_HTML)
+        self.client.post(
+            reverse("posts:add_comment", args=(post.pk,)), {"text": TEXT}
+        )
+        self.assertEqual(Comment.objects.get().text_html, TEXT_HTML)
+
+    @override_settings(POST_PREVIEW_CHARS=20)
+    def test_preview_is_truncated_html(self):
+        post = Post.objects.create(text="слово " * 20, author=self.user)
+        self.assertLess(len(post.preview_html), len(post.text_html))
+        self.assertTrue(post.preview_html.startswith("<p>"))
+        self.assertTrue(post.preview_html.endswith("…</p>"))
+
+    def test_pages_show_stored_html(self):
+        post = Post.objects.create(text=TEXT, author=self.user)
+        Comment.objects.create(text=TEXT, author=self.user, post=post)
+        Post.objects.filter(pk=post.pk).update(
+            text_html="<p>Готовый текст</p>",
+            preview_html="<p>Готовое начало</p>",
+        )
+        Comment.objects.update(text_html="<p>Готовый комментарий</p>")
+        detail = self.client.get(reverse("posts:post_detail", args=(post.pk,)))
+        self.assertContains(detail, "<p>Готовый текст</p>")
+        self.assertContains(detail, "<p>Готовый комментарий</p>")
+        self.assertNotContains(detail, "alert(1)")
+        self.assertContains(
+            self.client.get(reverse("posts:index")), "<p>Готовое начало</p>"
+        )
+
+    @skipUnless(markup.markdown, "нужен пакет Markdown")
+    @override_settings(POST_MARKUP=markup.MARKDOWN)
+    def test_markdown_is_sanitized(self):
+        post = Post.objects.create(
+            text=(
+                "*важно* <b>html</b> [ссылка](https://example.com) "
+                "[плохая](javascript:alert(1)) ![](data:image/png,x)"
+            ),
+            author=self.user,
+        )
+        self.assertIn("<em>важно</em>", post.text_html)
+        self.assertIn("&lt;b&gt;html&lt;/b&gt;", post.text_html)
+        self.assertIn('href="https://example.com"', post.text_html)
+        self.assertNotIn("javascript:", post.text_html)
+        self.assertNotIn("data:", post.text_html)
+
+    @skipUnless(markup.markdown, "нужен пакет Markdown")
+    @override_settings(POST_MARKUP=markup.MARKDOWN)
+    def test_markdown_sees_raw_text(self):
+        cases = (
+            ("> цитата", "<blockquote>\n<p>цитата</p>\n</blockquote>"),
+            ("код `a < b & c`", "<code>a &lt; b &amp; c</code>"),
+            (
+                '[ссылка](https://example.com "Книги & журналы")',
+                '<a href="https://example.com" '
+                'title="Книги &amp; журналы">ссылка</a>',
+            ),
+            (
+                "<script>alert(1)</script>",
+                "&lt;script&gt;alert(1)&lt;/script&gt;",
+            ),
+        )
+        for text, html in cases:
+            with self.subTest(text=text):
+                self.assertIn(html, markup.render(text))
+
+    def test_command_fills_missing_html(self):
+        post = Post.objects.create(text=TEXT, author=self.user)
+        Comment.objects.create(text=TEXT, author=self.user, post=post)
+        updated_at = post.updated_at
+        Post.objects.update(text_html="", preview_html="")
+        Comment.objects.update(text_html="")
+        call_command("render_texts", batch_size=1, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.text_html, TEXT_HTML)
+        self.assertEqual(post.preview_html, TEXT_HTML)
+        self.assertGreater(post.updated_at, updated_at)
+        self.assertEqual(Comment.objects.get().text_html, TEXT_HTML)
+
+    def test_command_refreshes_only_affected_pages(self):
+        post = Post.objects.create(text=TEXT, author=self.user)
+        Comment.objects.create(text=TEXT, author=self.user, post=post)
+        self.client.logout()
+        urls = (
+            reverse("posts:index"),
+            reverse("posts:profile", args=(AUTHOR,)),
+            reverse("posts:post_detail", args=(post.pk,)),
+        )
+        for url in urls:
+            self.client.get(url)
+        Post.objects.update(text="Новый текст", text_html="")
+        Comment.objects.update(text="Новый комментарий", text_html="")
+        cache.set("unrelated", 1)
+        call_command("render_texts", stdout=StringIO())
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), "Новый текст")
+        self.assertContains(self.client.get(urls[-1]), "Новый комментарий")
+        self.assertEqual(cache.get("unrelated"), 1)
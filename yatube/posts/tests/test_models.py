@@ -1,5 +1,9 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
 from django.test import TestCase
 
+from ..bulk import explicit_pub_date
 from ..models import Group, Post, User
 from .const import (AUTHOR, GROUP_DESCRIPTION, GROUP_SLUG, GROUP_TITLE,
                     POST_TEXT)
@@ -60,3 +64,20 @@ class PostModelTest(TestCase):
             Group.objects.get(title="Тестовая группа").description,
             GROUP_DESCRIPTION,
         )
+
+
+class ExplicitPubDateTest(TestCase):
+    def test_given_date_is_kept_only_in_current_thread(self):
+        field = Post._meta.get_field("pub_date")
+        date = datetime(2015, 5, 1)
+        with explicit_pub_date():
+            self.assertEqual(
+                field.pre_save(Post(pub_date=date), add=True), date
+            )
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                other_thread = pool.submit(
+                    field.pre_save, Post(pub_date=date), True
+                ).result()
+        self.assertGreater(other_thread, date)
+        self.assertGreater(field.pre_save(Post(pub_date=date), True), date)
+        self.assertTrue(field.auto_now_add)
@@ -0,0 +1,214 @@
+import base64
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Group, Post, User
+from ..paginate_utils import (CountingPaginator, CursorPaginator,
+                              decode_cursor, feed_count_key)
+from .const import (AUTHOR, GROUP_DESCRIPTION, GROUP_SLUG, GROUP_TITLE,
+                    POST_TEXT, THIRTEEN)
+
+CURSOR_MODES = {
+    "index": "cursor",
+    "group": "cursor",
+    "profile": "cursor",
+    "follow": "cursor",
+}
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username=AUTHOR)
+        cls.group = Group.objects.create(
+            title=GROUP_TITLE, slug=GROUP_SLUG, description=GROUP_DESCRIPTION
+        )
+        same_date = datetime(2020, 1, 1)
+        posts = [
+            Post(
+                text=POST_TEXT + str(number),
+                author=cls.user,
+                group=cls.group,
+            )
+            for number in range(THIRTEEN)
+        ]
+        Post.objects.bulk_create(posts)
+        # Половина постов с одинаковой датой: порядок решает id.
+        for number, post in enumerate(Post.objects.order_by("pk")):
+            pub_date = same_date + timedelta(days=number // 2)
+            Post.objects.filter(pk=post.pk).update(pub_date=pub_date)
+        cls.expected = list(
+            Post.objects.order_by("-pub_date", "-pk").values_list(
+                "pk", flat=True
+            )
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def walk_forward(self, per_page):
+        paginator = CursorPaginator(Post.objects.all(), per_page)
+        page = paginator.get_page(None)
+        pages = [page]
+        while page.has_next():
+            page = paginator.get_page(page.next_cursor)
+            pages.append(page)
+        return paginator, pages
+
+    def test_forward_walk_visits_every_post_once(self):
+        _, pages = self.walk_forward(4)
+        seen = [post.pk for page in pages for post in page]
+        self.assertEqual(seen, self.expected)
+        self.assertFalse(pages[0].has_previous())
+        self.assertTrue(pages[-1].has_previous())
+
+    def test_backward_walk_returns_previous_pages(self):
+        paginator, pages = self.walk_forward(4)
+        page = pages[-1]
+        for expected_page in reversed(pages[:-1]):
+            page = paginator.get_page(page.previous_cursor)
+            self.assertEqual(
+                [post.pk for post in page],
+                [post.pk for post in expected_page],
+            )
+        self.assertFalse(page.has_previous())
+
+    def test_broken_cursor_returns_first_page(self):
+        self.assertIsNone(decode_cursor("не-курсор"))
+        paginator = CursorPaginator(Post.objects.all(), 4)
+        page = paginator.get_page("не-курсор")
+        self.assertEqual(
+            [post.pk for post in page], self.expected[:4]
+        )
+
+    def test_cursor_with_timezone_returns_first_page(self):
+        raw = "n|2020-01-01T00:00:00+00:00|1"
+        cursor = base64.urlsafe_b64encode(raw.encode()).decode()
+        self.assertIsNone(decode_cursor(cursor))
+        post = Post.objects.get(pk=self.expected[0])
+        urls = (
+            reverse("posts:post_detail", args=(post.pk,)),
+            reverse("posts:post_comments", args=(post.pk,)),
+            reverse("posts:post_comments_json", args=(post.pk,)),
+            reverse("api:v1:post_list"),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url, {"cursor": cursor})
+                self.assertEqual(response.status_code, 200)
+
+    def test_cursor_page_runs_no_count(self):
+        paginator = CursorPaginator(Post.objects.all(), 4)
+        with self.assertNumQueries(1):
+            page = paginator.get_page(None)
+        with self.assertNumQueries(1):
+            paginator.get_page(page.next_cursor)
+
+    def test_cursor_seeks_index_range_in_both_directions(self):
+        paginator = CursorPaginator(Post.objects.all(), 4)
+        page = paginator.get_page(paginator.get_page(None).next_cursor)
+        for cursor in (page.next_cursor, page.previous_cursor):
+            with self.subTest(direction=decode_cursor(cursor)[0]):
+                plan = paginator.page_queryset(decode_cursor(cursor)).explain()
+                self.assertIn("SEARCH", plan)
+                self.assertIn("post_date_idx", plan)
+                self.assertNotIn("SCAN", plan)
+                self.assertNotIn("TEMP B-TREE", plan)
+
+    @override_settings(PAGINATION_MODES=CURSOR_MODES)
+    def test_feeds_render_cursor_links(self):
+        client = Client()
+        client.force_login(self.user)
+        urls = (
+            reverse("posts:index"),
+            reverse("posts:group_list", args=(self.group.slug,)),
+            reverse("posts:profile", args=(self.user.username,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = client.get(url)
+                page_obj = response.context["page_obj"]
+                self.assertEqual(
+                    len(page_obj), settings.PAGINATION_ITEMS_PER_PAGE
+                )
+                self.assertContains(
+                    response, f"?cursor={page_obj.next_cursor}"
+                )
+                response = client.get(url, {"cursor": page_obj.next_cursor})
+                self.assertEqual(
+                    len(response.context["page_obj"]),
+                    THIRTEEN - settings.PAGINATION_ITEMS_PER_PAGE,
+                )
+
+
+class CountingPaginatorTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username=AUTHOR)
+        cls.group = Group.objects.create(
+            title=GROUP_TITLE, slug=GROUP_SLUG, description=GROUP_DESCRIPTION
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def create_posts(self, number):
+        for _ in range(number):
+            Post.objects.create(
+                text=POST_TEXT, author=self.user, group=self.group
+            )
+
+    def test_count_is_served_from_cache(self):
+        self.create_posts(THIRTEEN)
+        url = reverse("posts:group_list", args=(self.group.slug,))
+        self.client.get(url)
+        self.assertEqual(
+            cache.get(feed_count_key("group", self.group.pk)), THIRTEEN
+        )
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {"page": 2})
+        self.assertEqual(
+            len(response.context["page_obj"]),
+            THIRTEEN - settings.PAGINATION_ITEMS_PER_PAGE,
+        )
+
+    def test_saved_and_deleted_posts_adjust_cached_count(self):
+        self.create_posts(2)
+        self.client.get(reverse("posts:index"))
+        self.create_posts(1)
+        Post.objects.first().delete()
+        self.create_posts(1)
+        self.assertEqual(cache.get(feed_count_key("index")), 3)
+        self.assertEqual(
+            cache.get(feed_count_key("index")), Post.objects.count()
+        )
+
+    def test_page_window_skips_distant_pages(self):
+        paginator = CountingPaginator(
+            list(range(100)), 1, count_key="test", timeout=0
+        )
+        self.assertEqual(
+            paginator.page_window(50, 2), [1, None, 48, 49, 50, 51, 52,
+                                           None, 100]
+        )
+        self.assertEqual(paginator.page_window(1, 2), [1, 2, 3, None, 100])
+        self.assertEqual(paginator.page_window(4, 2), [1, 2, 3, 4, 5, 6,
+                                                       None, 100])
+
+    def test_template_renders_window_instead_of_full_range(self):
+        paginator_pages = 30
+        Post.objects.bulk_create(
+            Post(text=POST_TEXT, author=self.user)
+            for _ in range(
+                paginator_pages * settings.PAGINATION_ITEMS_PER_PAGE
+            )
+        )
+        response = self.client.get(reverse("posts:index"), {"page": 15})
+        self.assertContains(response, "?page=30")
+        self.assertContains(response, "?page=16")
+        self.assertNotContains(response, "?page=20")
@@ -0,0 +1,93 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from mixer.backend.django import mixer
+
+from ..management.commands.bench_read_models import feed_builders, measure
+from ..models import Follow, Group, Post, User
+from ..read_models import AuthorRow, GroupRow, PostRow
+
+POSTS = 50
+
+
+class FeedRowsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = mixer.blend(User, first_name="Лев", last_name="Толстой")
+        cls.group = mixer.blend(Group)
+        cls.posts = mixer.cycle(POSTS).blend(
+            Post, author=cls.author, group=cls.group, image=""
+        )
+        cls.reader = mixer.blend(User)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def test_feeds_read_only_card_columns(self):
+        urls = (
+            reverse("posts:index"),
+            reverse("posts:group_list", args=(self.group.slug,)),
+            reverse("posts:profile", args=(self.author.username,)),
+            reverse("posts:follow_index"),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                page = response.context["page_obj"]
+                self.assertIsInstance(page[0], PostRow)
+                self.assertEqual(page[0], Post.objects.latest("pub_date"))
+                self.assertEqual(page[0].author.get_full_name(), "Лев Толстой")
+                self.assertEqual(page[0].group, self.group)
+                feed_sql = [
+                    query["sql"] for query in queries
+                    if '"posts_post"."preview_html"' in query["sql"]
+                ]
+                self.assertEqual(len(feed_sql), 1)
+                self.assertNotIn("password", feed_sql[0])
+                self.assertNotIn("description", feed_sql[0])
+
+    def test_known_author_and_group_are_not_joined(self):
+        profile = self.client.get(
+            reverse("posts:profile", args=(self.author.username,))
+        )
+        self.assertIs(
+            profile.context["page_obj"][0].author, profile.context["author"]
+        )
+        group = self.client.get(
+            reverse("posts:group_list", args=(self.group.slug,))
+        )
+        self.assertIs(
+            group.context["page_obj"][0].group, group.context["group"]
+        )
+        index = self.client.get(reverse("posts:index"))
+        rows = list(index.context["page_obj"])
+        self.assertIsInstance(rows[0].author, AuthorRow)
+        self.assertIsInstance(rows[0].group, GroupRow)
+        # Один автор и одна группа на странице — общие объекты.
+        self.assertEqual(len({id(row.author) for row in rows}), 1)
+        self.assertEqual(len({id(row.group) for row in rows}), 1)
+
+    def test_rows_take_less_memory_than_models(self):
+        for name, models, rows in feed_builders(self.author, self.group):
+            with self.subTest(feed=name):
+                number, _, models_bytes, _ = measure(models, POSTS, 1)
+                rows_number, _, rows_bytes, _ = measure(rows, POSTS, 1)
+                self.assertEqual(number, POSTS)
+                self.assertEqual(rows_number, POSTS)
+                self.assertLess(rows_bytes, models_bytes)
+
+    def test_bench_command_rolls_back_seeded_posts(self):
+        out = StringIO()
+        call_command(
+            "bench_read_models", posts=30, sizes=[10], repeat=1, stdout=out
+        )
+        self.assertIn("10 на странице", out.getvalue())
+        self.assertEqual(Post.objects.count(), POSTS)
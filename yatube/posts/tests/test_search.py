@@ -0,0 +1,173 @@
+from io import StringIO
+
+from django.contrib.auth.models import User as AdminUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Group, Post, SearchDocument, User
+from ..search import FTS_TABLE, rebuild, search_posts, use_fts
+from .const import ANOTHERUSER, AUTHOR, GROUP_SLUG, GROUP_TITLE
+
+SEARCH_URL = reverse("posts:search")
+SEARCH_JSON_URL = reverse("posts:search_json")
+
+
+class SearchTestMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username=AUTHOR)
+        cls.another = User.objects.create_user(username=ANOTHERUSER)
+        cls.group = Group.objects.create(
+            title=GROUP_TITLE, slug=GROUP_SLUG, description=""
+        )
+        cls.often = Post.objects.create(
+            text="Кошка, кошка и ещё раз кошка", author=cls.user
+        )
+        cls.once = Post.objects.create(
+            text="Про собак, но кошка тоже есть в этом длинном тексте",
+            author=cls.another,
+            group=cls.group,
+        )
+        cls.commented = Post.objects.create(
+            text="Пост про погоду", author=cls.user, group=cls.group
+        )
+        Comment.objects.create(
+            post=cls.commented, author=cls.another, text="Где мой ёжик?"
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def ids(self, query, **kwargs):
+        return [post.pk for post in search_posts(query, **kwargs)]
+
+    def indexed_documents(self):
+        if not use_fts():
+            return SearchDocument.objects.count()
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {FTS_TABLE}")
+            return cursor.fetchone()[0]
+
+    def test_results_are_ranked_by_relevance(self):
+        self.assertEqual(self.ids("кошка"), [self.often.pk, self.once.pk])
+
+    def test_comment_match_returns_its_post(self):
+        self.assertEqual(self.ids("ежик"), [self.commented.pk])
+
+    def test_words_match_as_prefixes(self):
+        self.assertEqual(self.ids("соба"), [self.once.pk])
+        self.assertEqual(self.ids("кошка тоже"), [self.once.pk])
+
+    def test_filters_by_group_and_author(self):
+        self.assertEqual(
+            self.ids("кошка", group_id=self.group.pk), [self.once.pk]
+        )
+        self.assertEqual(
+            self.ids("кошка", author_id=self.user.pk), [self.often.pk]
+        )
+
+    def test_cursor_walks_all_results_once(self):
+        for number in range(5):
+            Post.objects.create(text=f"кошка {number}", author=self.user)
+        seen = []
+        cursor = None
+        while True:
+            page = search_posts("кошка", cursor=cursor, per_page=2)
+            seen.extend(post.pk for post in page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+
+    def test_index_follows_edits_and_deletes(self):
+        post = Post.objects.get(pk=self.often.pk)
+        post.text = "Теперь про попугаев"
+        post.save()
+        self.assertEqual(self.ids("кошка"), [self.once.pk])
+        self.assertEqual(self.ids("попуга"), [self.often.pk])
+        self.commented.comments.all().delete()
+        self.assertEqual(self.ids("ежик"), [])
+        Post.objects.get(pk=self.once.pk).delete()
+        self.assertEqual(self.ids("кошка"), [])
+
+    def test_deleting_post_removes_its_comments(self):
+        self.assertEqual(self.indexed_documents(), 4)
+        Post.objects.get(pk=self.commented.pk).delete()
+        self.assertEqual(self.ids("ежик"), [])
+        self.assertEqual(self.indexed_documents(), 2)
+
+    def test_rebuild_command_restores_index(self):
+        SearchDocument.objects.all().delete()
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual(self.ids("кошка"), [self.often.pk, self.once.pk])
+        self.assertEqual(self.ids("ежик"), [self.commented.pk])
+
+    def test_search_page_and_json(self):
+        response = self.client.get(
+            SEARCH_URL, {"q": "кошка", "group": GROUP_SLUG}
+        )
+        self.assertEqual(
+            [post.pk for post in response.context["page_obj"]],
+            [self.once.pk],
+        )
+        response = self.client.get(
+            SEARCH_JSON_URL, {"q": "кошка", "author": ANOTHERUSER}
+        )
+        data = response.json()
+        self.assertEqual([item["id"] for item in data["results"]],
+                         [self.once.pk])
+        self.assertEqual(data["results"][0]["group"], GROUP_SLUG)
+        self.assertIsNone(data["next_cursor"])
+
+    def test_unknown_filter_finds_nothing(self):
+        response = self.client.get(
+            SEARCH_JSON_URL, {"q": "кошка", "group": "missing"}
+        )
+        self.assertEqual(response.json()["results"], [])
+
+    def test_admin_search_uses_index(self):
+        admin = AdminUser.objects.create_superuser(
+            "admin", "admin@example.com", "password"
+        )
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse("admin:posts_post_changelist"), {"q": "кошк"}
+        )
+        self.assertEqual(
+            {post.pk for post in response.context["cl"].result_list},
+            {self.often.pk, self.once.pk},
+        )
+        response = self.client.get(
+            reverse("admin:posts_comment_changelist"), {"q": "ежик"}
+        )
+        self.assertEqual(len(response.context["cl"].result_list), 1)
+
+
+@override_settings(SEARCH_BACKEND="fts5")
+class FTSSearchTest(SearchTestMixin, TestCase):
+    pass
+
+
+@override_settings(SEARCH_BACKEND="index")
+class IndexSearchTest(SearchTestMixin, TestCase):
+    def ranks(self, query, filters):
+        return [
+            (post.pk, round(post.search_rank, 9))
+            for post in search_posts(query, **filters)
+        ]
+
+    def test_ranks_match_fts(self):
+        queries = (
+            ("кошка", {}),
+            ("кошка про", {}),
+            ("п", {"group_id": self.group.pk}),
+        )
+        index_ranks = [self.ranks(*query) for query in queries]
+        with override_settings(SEARCH_BACKEND="fts5"):
+            rebuild()
+            fts_ranks = [self.ranks(*query) for query in queries]
+        self.assertEqual(index_ranks, fts_ranks)
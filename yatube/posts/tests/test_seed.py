@@ -0,0 +1,123 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db.models import Count, F
+from django.test import TestCase, override_settings
+
+from ..models import (Comment, Follow, Group, Post, TimelineEntry, User,
+                      UserCounters)
+from ..search import search_posts
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+VOLUMES = {
+    "users": 60,
+    "groups": 8,
+    "posts": 400,
+    "comments": 900,
+    "follows": 6,
+    "image_share": 0.1,
+}
+
+
+def snapshot():
+    """Содержимое сгенерированных таблиц без служебных полей."""
+    return (
+        list(User.objects.order_by("pk").values_list("pk", "username")),
+        list(Group.objects.order_by("pk").values_list("slug", "title")),
+        list(
+            Post.objects.order_by("pk").values_list(
+                "pk", "text", "author_id", "group_id", "pub_date", "image"
+            )
+        ),
+        list(
+            Comment.objects.order_by("pk").values_list(
+                "pk", "post_id", "author_id", "pub_date"
+            )
+        ),
+        list(
+            Follow.objects.order_by("user_id", "author_id").values_list(
+                "user_id", "author_id"
+            )
+        ),
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedCommandTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def seed(self, **options):
+        call_command("seed", stdout=StringIO(), **{**VOLUMES, **options})
+
+    def clear(self):
+        for model in (Follow, Comment, Post, Group, UserCounters, User):
+            model.objects.all().delete()
+
+    def test_same_seed_gives_same_data_with_any_workers(self):
+        self.seed(seed=7, workers=1)
+        first = snapshot()
+        self.clear()
+        self.seed(seed=7, workers=2)
+        self.assertEqual(snapshot(), first)
+        self.clear()
+        self.seed(seed=8, workers=1)
+        self.assertNotEqual(snapshot()[2], first[2])
+
+    def test_volumes_and_relations(self):
+        self.seed()
+        self.assertEqual(User.objects.count(), VOLUMES["users"])
+        self.assertEqual(Post.objects.count(), VOLUMES["posts"])
+        self.assertEqual(Comment.objects.count(), VOLUMES["comments"])
+        self.assertFalse(
+            Follow.objects.filter(user_id=F("author_id")).exists()
+        )
+        comment = Comment.objects.select_related("post").first()
+        self.assertGreaterEqual(comment.pub_date, comment.post.pub_date)
+        self.assertTrue(Post.objects.exclude(image="").exists())
+
+    def test_distributions_are_skewed(self):
+        self.seed()
+        sizes = list(
+            Group.objects.order_by("-post_count").values_list(
+                "post_count", flat=True
+            )
+        )
+        self.assertGreater(sizes[0], 3 * sizes[-1])
+        followers = list(
+            Follow.objects.values("author_id")
+            .annotate(total=Count("pk"))
+            .order_by("-total")
+            .values_list("total", flat=True)
+        )
+        self.assertGreater(followers[0], 5 * followers[len(followers) // 2])
+
+    def test_derived_data_is_built(self):
+        self.seed()
+        author = Post.objects.first().author
+        self.assertEqual(
+            author.counters.post_count,
+            Post.objects.filter(author=author).count(),
+        )
+        reader = Follow.objects.first().user
+        self.assertEqual(
+            list(
+                TimelineEntry.objects.filter(user=reader)
+                .order_by("-pub_date", "-post_id")
+                .values_list("post_id", flat=True)
+            ),
+            list(
+                Post.objects.filter(author__following__user=reader)
+                .order_by("-pub_date", "-id")
+                .values_list("pk", flat=True)[
+                    :settings.TIMELINE_MAX_ENTRIES
+                ]
+            ),
+        )
+        word = Post.objects.first().text.split()[0].lower()
+        self.assertTrue(search_posts(word))
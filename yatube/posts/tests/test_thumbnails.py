@@ -0,0 +1,194 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import features
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore
+
+from .. import thumbnails
+from ..models import Post, ThumbnailJob, User
+from ..thumbnails import (claim_jobs, generate, pending_key, ready_variants,
+                          variant_widths)
+from .const import AUTHOR, POST_TEXT
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+THUMBNAIL_URL = settings.MEDIA_URL + "cache/"
+SMALL_GIF = (
+    b"\x47\x49\x46\x38\x39\x61\x02\x00"
+    b"\x01\x00\x80\x00\x00\x00\x00\x00"
+    b"\xFF\xFF\xFF\x21\xF9\x04\x00\x00"
+    b"\x00\x00\x00\x2C\x00\x00\x00\x00"
+    b"\x02\x00\x01\x00\x00\x02\x02\x0C"
+    b"\x0A\x00\x3B"
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAIL_WORKER=True)
+class ThumbnailPipelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=AUTHOR)
+        cls.post = Post.objects.create(
+            text=POST_TEXT,
+            author=cls.user,
+            image=SimpleUploadedFile(
+                name="thumb.gif", content=SMALL_GIF, content_type="image/gif"
+            ),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse("posts:post_detail", args=(self.post.pk,))
+
+    def assert_thumbnails_ready(self):
+        for size in settings.POST_THUMBNAILS:
+            with self.subTest(size=size):
+                self.assertIsNotNone(ready_variants(self.post, size))
+
+    def test_placeholder_is_shown_while_job_is_pending(self):
+        response = self.client.get(self.url)
+        self.assertContains(response, "thumbnail-pending")
+        self.assertNotContains(response, THUMBNAIL_URL)
+        self.assertTrue(cache.get(pending_key(self.post)))
+
+    def test_generated_thumbnails_replace_placeholder(self):
+        self.client.get(self.url)
+        generate(self.post)
+        self.assert_thumbnails_ready()
+        self.assertIsNone(cache.get(pending_key(self.post)))
+        response = self.client.get(self.url)
+        self.assertNotContains(response, "thumbnail-pending")
+        self.assertContains(response, THUMBNAIL_URL)
+
+    def test_saved_post_with_image_is_queued(self):
+        self.assertTrue(
+            ThumbnailJob.objects.filter(post=self.post).exists()
+        )
+
+    def test_worker_command_processes_queue(self):
+        call_command("process_thumbnails", once=True, stdout=StringIO())
+        self.assertFalse(ThumbnailJob.objects.exists())
+        self.assert_thumbnails_ready()
+        response = self.client.get(self.url)
+        self.assertContains(response, "<picture>")
+
+    def test_claimed_job_is_not_taken_twice(self):
+        self.assertEqual(len(claim_jobs(10)), 1)
+        self.assertEqual(claim_jobs(10), [])
+
+    def test_command_generates_thumbnails_for_existing_posts(self):
+        call_command("generate_thumbnails", stdout=StringIO())
+        self.assert_thumbnails_ready()
+
+    def test_picture_lists_variants_with_dimensions(self):
+        generate(self.post)
+        response = self.client.get(self.url)
+        self.assertContains(response, "<picture>")
+        self.assertContains(response, 'srcset="')
+        self.assertContains(response, 'sizes="(min-width: 768px) 75vw')
+        self.assertContains(response, 'width="960"')
+        self.assertContains(response, 'height="339"')
+        self.assertEqual(
+            features.check("webp"),
+            'type="image/webp"' in response.content.decode(),
+        )
+
+    def test_generate_stores_image_dimensions(self):
+        generate(self.post)
+        self.post.refresh_from_db()
+        self.assertEqual(
+            (self.post.image_width, self.post.image_height), (2, 1)
+        )
+
+    def test_form_stores_image_dimensions(self):
+        self.client.force_login(self.user)
+        self.client.post(
+            reverse("posts:post_create"),
+            {
+                "text": POST_TEXT,
+                "image": SimpleUploadedFile(
+                    name="form.gif",
+                    content=SMALL_GIF,
+                    content_type="image/gif",
+                ),
+            },
+        )
+        post = Post.objects.get(image="posts/form.gif")
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+
+    def test_small_images_are_not_upscaled_into_extra_variants(self):
+        self.post.image_width = 300
+        self.assertEqual(variant_widths(self.post, "card"), [240])
+        self.assertEqual(
+            variant_widths(self.post, "detail"),
+            sorted(settings.POST_THUMBNAILS["detail"]["widths"]),
+        )
+
+    def test_measure_images_reports_savings(self):
+        out = StringIO()
+        call_command("measure_images", size="detail", stdout=out)
+        self.assertIn("экономия", out.getvalue())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAIL_WORKER=False)
+class InlineThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=AUTHOR)
+        cls.posts = [
+            Post.objects.create(
+                text=POST_TEXT,
+                author=cls.user,
+                image=SimpleUploadedFile(
+                    name=f"inline_{number}.gif",
+                    content=SMALL_GIF,
+                    content_type="image/gif",
+                ),
+            )
+            for number in range(3)
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pictures_are_generated_without_worker(self):
+        post = self.posts[0]
+        response = self.client.get(
+            reverse("posts:post_detail", args=(post.pk,))
+        )
+        self.assertNotContains(response, "thumbnail-pending")
+        self.assertContains(response, "<picture>")
+        self.assertFalse(ThumbnailJob.objects.exists())
+        self.assertIsNotNone(ready_variants(post, "detail"))
+
+    def test_page_reads_kvstore_once(self):
+        for post in self.posts:
+            generate(post)
+        cache.clear()
+        with mock.patch.object(
+            thumbnails, "kvstore_get_many", wraps=thumbnails.kvstore_get_many
+        ) as get_many, mock.patch.object(
+            KVStore, "get", side_effect=AssertionError
+        ):
+            response = self.client.get(reverse("posts:index"))
+        self.assertEqual(response.content.decode().count("<picture>"), 3)
+        get_many.assert_called_once()
@@ -0,0 +1,129 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Post, TimelineEntry, User
+from ..paginate_utils import CountingPaginator, CursorPaginator
+from ..timeline import timeline_posts
+from .const import ANOTHERUSER, AUTHOR, POST_TEXT, THIRDUSER
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username=AUTHOR)
+        cls.reader = User.objects.create_user(username=ANOTHERUSER)
+        cls.other_reader = User.objects.create_user(username=THIRDUSER)
+
+    def setUp(self):
+        cache.clear()
+
+    def entries(self, user):
+        return set(
+            TimelineEntry.objects.filter(user=user).values_list(
+                "post_id", flat=True
+            )
+        )
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text=POST_TEXT, author=self.author)
+        self.assertEqual(self.entries(self.reader), {post.pk})
+        self.assertEqual(self.entries(self.other_reader), set())
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        posts = [
+            Post.objects.create(text=POST_TEXT, author=self.author)
+            for _ in range(3)
+        ]
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            self.entries(self.reader), {post.pk for post in posts}
+        )
+        follow.delete()
+        self.assertEqual(self.entries(self.reader), set())
+
+    def test_deleted_post_leaves_timelines(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text=POST_TEXT, author=self.author)
+        post.delete()
+        self.assertEqual(self.entries(self.reader), set())
+
+    @override_settings(TIMELINE_MAX_ENTRIES=2)
+    def test_timeline_is_capped(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [
+            Post.objects.create(text=POST_TEXT, author=self.author)
+            for _ in range(4)
+        ]
+        self.assertEqual(
+            self.entries(self.reader), {post.pk for post in posts[-2:]}
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_celebrity_posts_are_read_on_demand(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other_reader, author=self.author)
+        post = Post.objects.create(text=POST_TEXT, author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(list(timeline_posts(self.reader)), [post])
+        client = Client()
+        client.force_login(self.other_reader)
+        response = client.get(reverse("posts:follow_index"))
+        self.assertEqual(list(response.context["page_obj"]), [post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_fanned_out_and_celebrity_posts_are_merged(self):
+        Follow.objects.create(user=self.other_reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.other_reader)
+        posts = [
+            Post.objects.create(
+                text=POST_TEXT,
+                author=self.author if number % 3 else self.other_reader,
+            )
+            for number in range(10)
+        ]
+        expected = [post.pk for post in reversed(posts)]
+        self.assertEqual(
+            [post.pk for post in timeline_posts(self.reader)], expected
+        )
+        numbered = CountingPaginator(
+            timeline_posts(self.reader), 3, "follow_count", 0
+        )
+        self.assertEqual(numbered.count, 10)
+        self.assertEqual(
+            [post.pk for post in numbered.page(2)], expected[3:6]
+        )
+        paginator = CursorPaginator(timeline_posts(self.reader), 4)
+        page = paginator.get_page(None)
+        seen = [post.pk for post in page]
+        while page.has_next():
+            page = paginator.get_page(page.next_cursor)
+            seen.extend(post.pk for post in page)
+        self.assertEqual(seen, expected)
+        page = paginator.get_page(page.previous_cursor)
+        self.assertEqual([post.pk for post in page], expected[4:8])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_page_keys_are_read_by_index_range(self):
+        Follow.objects.create(user=self.other_reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text=POST_TEXT, author=self.author)
+        feed = timeline_posts(self.reader)
+        key = (post.pub_date, post.pk)
+        for page in (
+            feed.seek(("pub_date", "pk"), "<", key),
+            feed.seek(("pub_date", "pk"), ">", key).reverse(),
+        ):
+            plans = {
+                "timeline_user_date_idx": page.entry_keys()[:5].explain(),
+                "post_author_date_idx": page.author_keys(self.author.pk)[
+                    :5
+                ].explain(),
+            }
+            for index_name, plan in plans.items():
+                with self.subTest(index=index_name):
+                    self.assertIn(index_name, plan)
+                    self.assertNotIn("SCAN", plan)
+                    self.assertNotIn("TEMP B-TREE", plan)
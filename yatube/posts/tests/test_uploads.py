@@ -0,0 +1,146 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..models import Post, User
+from .const import AUTHOR, POST_TEXT
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+ORIENTATION = 0x0112
+ROTATED_90 = 6
+
+
+def animation_file(name, frames=3, size=(40, 20), **options):
+    output = BytesIO()
+    images = [
+        Image.new("RGB", size, (index * 80, 30, 30)) for index in range(frames)
+    ]
+    images[0].save(
+        output, "GIF", save_all=True, append_images=images[1:], duration=50,
+        loop=0, **options
+    )
+    return SimpleUploadedFile(name, output.getvalue())
+
+
+def image_file(name, image_format, size=(40, 20), exif=None):
+    output = BytesIO()
+    options = {"exif": exif} if exif is not None else {}
+    Image.new("RGB", size, (200, 30, 30)).save(output, image_format, **options)
+    return SimpleUploadedFile(name, output.getvalue())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class BoundedUploadTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=AUTHOR)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def create(self, image):
+        return self.client.post(
+            reverse("posts:post_create"), {"text": POST_TEXT, "image": image}
+        )
+
+    @override_settings(POST_IMAGE_MAX_BYTES=512 * 1024)
+    def test_oversized_file_is_rejected(self):
+        output = BytesIO()
+        Image.effect_noise((1024, 1024), 100).save(output, "PNG")
+        response = self.create(
+            SimpleUploadedFile("big.png", output.getvalue())
+        )
+        self.assertFormError(response, "form", "image", "Файл больше 0.5 МБ.")
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_MEGAPIXELS=0.0005)
+    def test_too_many_pixels_are_rejected_before_decoding(self):
+        response = self.create(image_file("wide.png", "PNG"))
+        self.assertFormError(
+            response, "form", "image", "Картинка больше 0.0005 мегапикселей."
+        )
+
+    def test_unknown_signature_is_rejected(self):
+        response = self.create(image_file("picture.png", "BMP"))
+        self.assertFormError(
+            response,
+            "form",
+            "image",
+            "Загрузите картинку в формате JPEG, PNG, GIF или WebP.",
+        )
+
+    @override_settings(POST_IMAGE_MAX_SIDE=10)
+    def test_image_is_reencoded_without_exif(self):
+        exif = Image.Exif()
+        exif[ORIENTATION] = ROTATED_90
+        self.create(image_file("photo.png", "JPEG", exif=exif.tobytes()))
+        post = Post.objects.get()
+        # Расширение по настоящему формату, поворот из EXIF применён.
+        self.assertEqual(post.image.name, "posts/photo.jpg")
+        self.assertEqual((post.image_width, post.image_height), (5, 10))
+        with Image.open(post.image.path) as saved:
+            self.assertEqual(saved.size, (5, 10))
+            self.assertNotIn(ORIENTATION, saved.getexif())
+
+    @override_settings(POST_IMAGE_MAX_SIDE=10)
+    def test_animation_is_reencoded_frame_by_frame(self):
+        self.create(animation_file("cat.gif", comment=b"secret"))
+        post = Post.objects.get()
+        self.assertEqual((post.image_width, post.image_height), (10, 5))
+        with Image.open(post.image.path) as saved:
+            self.assertEqual(saved.n_frames, 3)
+            self.assertEqual(saved.size, (10, 5))
+            self.assertNotIn("comment", saved.info)
+
+    @override_settings(POST_IMAGE_MAX_MEGAPIXELS=0.002)
+    def test_animation_frames_count_towards_pixel_limit(self):
+        # 800 пикселей в кадре помещаются в лимит, три кадра — нет.
+        response = self.create(animation_file("long.gif"))
+        self.assertFormError(
+            response,
+            "form",
+            "image",
+            "Кадры анимации вместе больше 0.002 мегапикселей.",
+        )
+
+    def test_post_form_views_still_check_csrf(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        response = client.post(
+            reverse("posts:post_create"), {"text": POST_TEXT}
+        )
+        self.assertTemplateUsed(response, "core/403csrf.html")
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_BYTES=16)
+    def test_other_forms_get_whole_files(self):
+        admin = User.objects.create_superuser(
+            "admin", "admin@example.com", "password"
+        )
+        self.client.force_login(admin)
+        image = image_file("admin.png", "PNG")
+        self.client.post(
+            reverse("admin:posts_post_add"),
+            {
+                "text": POST_TEXT,
+                "author": self.user.pk,
+                "image": image,
+                "pub_date_0": "2020-01-01",
+                "pub_date_1": "00:00:00",
+            },
+        )
+        post = Post.objects.get()
+        self.assertEqual(post.image.size, image.size)
@@ -1,5 +1,6 @@
 import shutil
 import tempfile
+from unittest import mock
 
 from django import forms
 from django.conf import settings
@@ -8,6 +9,8 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from .. import cache as page_cache
+from .. import timeline
 from ..forms import PostForm
 from ..models import Comment, Follow, Group, Post, User
 from .const import (ANOTHERUSER, AUTHOR, COMMENT_TEXT, GROUP_DESCRIPTION,
@@ -61,6 +64,7 @@ class TaskPagesTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
@@ -138,12 +142,15 @@ class TaskPagesTests(TestCase):
         self.assertEqual(len(response.context["page_obj"]), 0)
 
     def test_cache_index_page(self):
-        response1 = self.authorized_client.get(reverse("posts:index"))
-        Post.objects.all().delete()
-        response2 = self.authorized_client.get(reverse("posts:index"))
+        guest_client = Client()
+        response1 = guest_client.get(reverse("posts:index"))
+        # Штампы не сдвигаются: страница остаётся в кэше.
+        with mock.patch.object(page_cache, "bump"):
+            Post.objects.all().delete()
+        response2 = guest_client.get(reverse("posts:index"))
         self.assertEqual(response1.content, response2.content)
         cache.clear()
-        response3 = self.authorized_client.get(reverse("posts:index"))
+        response3 = guest_client.get(reverse("posts:index"))
         self.assertNotEqual(response1.content, response3.content)
 
 
@@ -170,8 +177,12 @@ class PaginatorViewsTest(TestCase):
             )
             posts13.append(post1)
         Post.objects.bulk_create(posts13)
+        # bulk_create не раскладывает посты по лентам подписок: как и
+        # массовые загрузки, пересобираем ленту подписчика сами.
+        timeline.rebuild(cls.anotheruser.pk)
 
     def setUp(self):
+        cache.clear()
         self.anotheruser_authorized = Client()
         self.anotheruser_authorized.force_login(self.anotheruser)
 
@@ -217,6 +228,7 @@ class FollowingTest(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.anotheruser_client = Client()
         self.anotheruser_client.force_login(self.another_user)
         self.thirduser_client = Client()
@@ -0,0 +1,316 @@
+"""Адаптивные варианты картинок постов.
+
+Для каждого места вывода из POST_THUMBNAILS готовятся варианты нескольких
+ширин в WebP (если Pillow собран с libwebp) и в JPEG как запасном формате.
+Шаблоны ищут готовые варианты в хранилище sorl-thumbnail (KV store) одним
+чтением на страницу (ready_pictures). Недостающие варианты по умолчанию
+готовятся сразу, в потоке запроса. С POST_THUMBNAIL_WORKER = True вместо
+этого выводится заглушка, а пост попадает в очередь ThumbnailJob, которую
+разбирает воркер — команда process_thumbnails; когда задача выполнена,
+страницы с постом сбрасываются в кэше.
+"""
+import hashlib
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Q
+from django.utils import timezone
+from PIL import features
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import cache as page_cache
+from . import cards
+from .models import Post, ThumbnailJob
+
+logger = logging.getLogger(__name__)
+
+MIME_TYPES = {"WEBP": "image/webp", "JPEG": "image/jpeg"}
+
+
+class ReadyThumbnailBackend(ThumbnailBackend):
+    """Находит файл миниатюры, не открывая исходную картинку."""
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault("format", self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+
+backend = ReadyThumbnailBackend()
+
+
+def kvstore_get_many(files):
+    """Как kvstore.get для списка файлов, но одним чтением.
+
+    У KV store с кэшем и базой это один get_many кэша и один запрос к
+    базе для промахов; другие хранилища читаются по одному файлу.
+    """
+    kvstore = default.kvstore
+    if not isinstance(kvstore, cached_db_kvstore.KVStore):
+        return [kvstore.get(image_file) for image_file in files]
+    # Так sorl помечает в кэше ключи, которых нет в базе.
+    empty = cached_db_kvstore.EMPTY_VALUE
+    keys = [add_prefix(image_file.key) for image_file in files]
+    values = kvstore.cache.get_many(keys)
+    missing = [key for key in set(keys) if key not in values]
+    if missing:
+        stored = dict(
+            KVStoreModel.objects.filter(key__in=missing).values_list(
+                "key", "value"
+            )
+        )
+        fetched = {key: stored.get(key, empty) for key in missing}
+        kvstore.cache.set_many(
+            fetched, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+        )
+        values.update(fetched)
+    return [
+        None if values[key] == empty else deserialize_image_file(values[key])
+        for key in keys
+    ]
+
+
+def pending_key(post):
+    image = hashlib.md5(post.image.name.encode()).hexdigest()
+    return f"thumbnail_pending:{post.pk}:{image}"
+
+
+def image_formats():
+    """Форматы вариантов: сначала современные, последним — запасной."""
+    if features.check("webp"):
+        return ("WEBP", "JPEG")
+    return ("JPEG",)
+
+
+def variant_widths(post, size):
+    """Ширины вариантов; без upscale шире оригинала не бывает."""
+    spec = settings.POST_THUMBNAILS[size]
+    widths = sorted(spec["widths"])
+    if post.image_width and not spec["options"].get("upscale"):
+        widths = [
+            width for width in widths if width <= post.image_width
+        ] or widths[:1]
+    return widths
+
+
+def variants(post, size):
+    spec = settings.POST_THUMBNAILS[size]
+    width, height = map(int, spec["geometry"].split("x"))
+    for image_format in image_formats():
+        for variant_width in variant_widths(post, size):
+            variant_height = round(height * variant_width / width)
+            yield (
+                image_format,
+                f"{variant_width}x{variant_height}",
+                {**spec["options"], "format": image_format},
+            )
+
+
+def generate(post):
+    """Готовит все варианты картинки поста и сбрасывает его страницы.
+
+    Возвращает False, если задачу стоит повторить.
+    """
+    try:
+        if not post.image or not post.image.storage.exists(post.image.name):
+            return True
+        for size in settings.POST_THUMBNAILS:
+            for _, geometry, options in variants(post, size):
+                default.backend.get_thumbnail(post.image, geometry, **options)
+        if post.image_width is None:
+            # Размеры оригинала sorl уже сохранил в KV store.
+            source = default.kvstore.get(ImageFile(post.image))
+            if source is not None:
+                post.image_width, post.image_height = source.size
+                Post.objects.filter(pk=post.pk).update(
+                    image_width=post.image_width,
+                    image_height=post.image_height,
+                )
+    except Exception:
+        logger.exception("Не удалось подготовить миниатюры поста %s", post.pk)
+        return False
+    cards.touch(Post.objects.filter(pk=post.pk))
+    page_cache.bump_post_pages(post, post.group_id)
+    cache.delete(pending_key(post))
+    return True
+
+
+def schedule(post):
+    """Ставит пост в очередь, если он ещё не ждёт обработки.
+
+    Пометка в кэше живёт POST_THUMBNAIL_PENDING_TIMEOUT и избавляет от
+    записи в базу при каждом показе страницы с заглушкой. Сброс claimed
+    заставляет воркер снова взять задачу, если картинку заменили, пока он
+    готовил варианты старой.
+    """
+    if not post.image or not settings.POST_THUMBNAIL_WORKER:
+        return
+    if not cache.add(
+        pending_key(post), True, settings.POST_THUMBNAIL_PENDING_TIMEOUT
+    ):
+        return
+    ThumbnailJob.objects.update_or_create(
+        post_id=post.pk, defaults={"claimed": None, "attempts": 0}
+    )
+
+
+def claim_jobs(limit):
+    """Забирает задачи оптимистичной блокировкой по полю claimed.
+
+    Два воркера не возьмут одну задачу: обновится только строка, claimed
+    которой не изменился с момента чтения. Зависшие задачи снова доступны
+    через POST_THUMBNAIL_CLAIM_TIMEOUT секунд.
+    """
+    stale = timezone.now() - timedelta(
+        seconds=settings.POST_THUMBNAIL_CLAIM_TIMEOUT
+    )
+    candidates = (
+        ThumbnailJob.objects.filter(
+            Q(claimed__isnull=True) | Q(claimed__lt=stale),
+            attempts__lt=settings.POST_THUMBNAIL_MAX_ATTEMPTS,
+        )
+        .order_by("created")
+        .values_list("pk", "claimed")[:limit]
+    )
+    claimed = []
+    for pk, previous in candidates:
+        now = timezone.now()
+        if ThumbnailJob.objects.filter(pk=pk, claimed=previous).update(
+            claimed=now, attempts=F("attempts") + 1
+        ):
+            claimed.append((pk, now))
+    return claimed
+
+
+def process_jobs(limit):
+    """Выполняет до limit задач из очереди; возвращает число выполненных."""
+    done = 0
+    for pk, claimed in claim_jobs(limit):
+        job = (
+            ThumbnailJob.objects.select_related("post__author")
+            .filter(pk=pk)
+            .first()
+        )
+        if job is None or not generate(job.post):
+            continue
+        # Если картинку заменили во время работы, задача остаётся.
+        ThumbnailJob.objects.filter(pk=pk, claimed=claimed).delete()
+        done += 1
+    return done
+
+
+def srcset(thumbnails):
+    return ", ".join(
+        f"{thumbnail.url} {thumbnail.width}w" for thumbnail in thumbnails
+    )
+
+
+def find_variants(posts, size):
+    """Готовые варианты постов по форматам: {pk: {формат: [...]}}.
+
+    Одно чтение KV store на все посты. Если какого-то варианта поста
+    нет, вместо словаря None.
+    """
+    wanted = [
+        (
+            post,
+            image_format,
+            backend.thumbnail_file(post.image, geometry, **options),
+        )
+        for post in posts
+        if post.image
+        for image_format, geometry, options in variants(post, size)
+    ]
+    thumbnails = kvstore_get_many([image_file for _, _, image_file in wanted])
+    found = {post.pk: {} for post in posts if post.image}
+    for (post, image_format, _), thumbnail in zip(wanted, thumbnails):
+        if found[post.pk] is None:
+            continue
+        if thumbnail is None:
+            found[post.pk] = None
+            continue
+        found[post.pk].setdefault(image_format, []).append(thumbnail)
+    return found
+
+
+def generate_variants(post, size):
+    """Готовит варианты в потоке запроса, как раньше sorl в шаблоне."""
+    try:
+        if not post.image.storage.exists(post.image.name):
+            return None
+        found = {}
+        for image_format, geometry, options in variants(post, size):
+            found.setdefault(image_format, []).append(
+                default.backend.get_thumbnail(post.image, geometry, **options)
+            )
+        return found
+    except Exception:
+        logger.exception("Не удалось подготовить миниатюры поста %s", post.pk)
+        return None
+
+
+def ready_variants(post, size):
+    """Готовые варианты по форматам или None (тогда ставит задачу)."""
+    if not post.image:
+        return None
+    found = find_variants([post], size)[post.pk]
+    if found is None:
+        schedule(post)
+    return found
+
+
+def picture(found, size):
+    fallback = found.pop("JPEG")
+    return {
+        "sources": [
+            {"type": MIME_TYPES[image_format], "srcset": srcset(thumbnails)}
+            for image_format, thumbnails in found.items()
+        ],
+        "image": fallback[-1],
+        "srcset": srcset(fallback),
+        "sizes": settings.POST_THUMBNAILS[size]["sizes"],
+    }
+
+
+def ready_pictures(posts, size):
+    """Данные для <picture> постов страницы: {pk: данные или None}.
+
+    Варианты ищутся одним чтением KV store. Недостающие готовятся сразу
+    или, с POST_THUMBNAIL_WORKER, ставятся в очередь, и тогда вместо
+    данных None — шаблон выводит заглушку. Размеры вариантов sorl хранит
+    в KV store, поэтому width и height тега <img> известны без чтения
+    файлов.
+    """
+    found = find_variants(posts, size)
+    pictures = {}
+    for post in posts:
+        variants_found = found.get(post.pk)
+        if post.image and variants_found is None:
+            if settings.POST_THUMBNAIL_WORKER:
+                schedule(post)
+            else:
+                variants_found = generate_variants(post, size)
+        pictures[post.pk] = variants_found and picture(variants_found, size)
+    return pictures
+
+
+def ready_picture(post, size):
+    """Данные для <picture> одного поста или None (см. ready_pictures)."""
+    return ready_pictures([post], size)[post.pk]
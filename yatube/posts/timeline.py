@@ -0,0 +1,290 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Новый пост сразу раскладывается в ленты подписчиков автора. Для авторов,
+у которых подписчиков больше TIMELINE_FANOUT_LIMIT, раскладка не делается:
+их посты подмешиваются в ленту при чтении (fan-out on read).
+
+Раскладку делает сигнал post_save, поэтому посты, созданные через
+bulk_create, в ленты не попадают: массовые загрузки (posts.importer,
+posts.seeding) после записи сами вызывают backfill или rebuild.
+"""
+import heapq
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Q
+from django.utils.functional import cached_property
+
+from .models import Follow, Post, TimelineEntry, UserCounters
+from .paginate_utils import cursor_key, feed_count_key, seek
+
+BATCH_SIZE = 1000
+
+
+def is_celebrity(author_id):
+    return UserCounters.objects.filter(
+        user_id=author_id,
+        follower_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).exists()
+
+
+def trim(user_ids):
+    """Оставляет в лентах пользователей не больше TIMELINE_MAX_ENTRIES."""
+    limit = settings.TIMELINE_MAX_ENTRIES
+    overfull = (
+        TimelineEntry.objects.filter(user_id__in=user_ids)
+        .order_by()
+        .values("user_id")
+        .annotate(total=Count("pk"))
+        .filter(total__gt=limit)
+        .values_list("user_id", flat=True)
+    )
+    for user_id in list(overfull):
+        entries = TimelineEntry.objects.filter(user_id=user_id)
+        pub_date, post_id = entries.order_by(
+            "-pub_date", "-post_id"
+        ).values_list("pub_date", "post_id")[limit - 1]
+        entries.filter(
+            Q(pub_date__lt=pub_date)
+            | Q(pub_date=pub_date, post_id__lt=post_id)
+        ).delete()
+
+
+def forget_counts(user_ids):
+    """Сбрасывает закэшированное число постов в лентах пользователей."""
+    cache.delete_many([feed_count_key("follow", pk) for pk in user_ids])
+
+
+def fan_out(post):
+    """Раскладывает новый пост в ленты подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        "user_id", flat=True
+    )
+    batch = []
+    for user_id in followers.iterator():
+        batch.append(user_id)
+        if len(batch) == BATCH_SIZE:
+            _fan_out_batch(post, batch)
+            batch = []
+    if batch:
+        _fan_out_batch(post, batch)
+
+
+def _fan_out_batch(post, user_ids):
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in user_ids
+        ),
+        ignore_conflicts=True,
+    )
+    trim(user_ids)
+    forget_counts(user_ids)
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту нового подписчика последние посты автора."""
+    if is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        "pk", "pub_date"
+    )[:settings.TIMELINE_MAX_ENTRIES]
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for pk, pub_date in posts
+        ),
+        ignore_conflicts=True,
+    )
+    trim([user_id])
+    forget_counts([user_id])
+
+
+def rebuild(user_id):
+    """Собирает ленту пользователя заново из постов его подписок.
+
+    Вызывается для всех пользователей после массовой загрузки, поэтому
+    строки ленты переносит один INSERT ... SELECT, минуя Python.
+    """
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    authors = Follow.objects.filter(user_id=user_id).exclude(
+        author__counters__follower_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).values_list("author_id", flat=True)
+    # Список авторов, а не подзапрос: так IN перебирает индекс
+    # (author, -pub_date, -id), а не просматривает все посты по дате.
+    posts = (
+        Post.objects.filter(author_id__in=list(authors))
+        .order_by("-pub_date", "-id")
+        .values("id", "pub_date")
+    )[:settings.TIMELINE_MAX_ENTRIES]
+    sql, params = posts.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {TimelineEntry._meta.db_table} "
+            "(user_id, post_id, pub_date) "
+            f"SELECT %s, recent.id, recent.pub_date FROM ({sql}) recent",
+            (user_id, *params),
+        )
+    forget_counts([user_id])
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты посты автора, от которого пользователь отписался."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+    forget_counts([user_id])
+
+
+class Timeline:
+    """Лента подписок: разложенные заранее посты и посты знаменитостей.
+
+    Один запрос с OR по двум источникам SQLite выполняет перебором обоих
+    целиком и сортировкой во временном B-дереве. Поэтому ключи
+    (pub_date, id) каждого источника читаются по своему индексу с
+    пределом страницы: строки ленты — по (user, -pub_date, -post), посты
+    каждой знаменитости — по (author, -pub_date, -id). Ключи сливаются в
+    Python, а сами посты выбираются одним запросом по id. Страница по
+    номеру без знаменитостей в подписках читается одним запросом.
+
+    Для пагинаторов лента ведёт себя как QuerySet, упорядоченный по
+    (-pub_date, -id): у неё есть count(), срезы, values(), order_by(),
+    reverse() и seek() для курсора. Номерами страниц листаются только
+    первые TIMELINE_MAX_ENTRIES постов.
+    """
+
+    def __init__(self, user_id, posts=None, bound=None, descending=True):
+        self.user_id = user_id
+        self.posts = Post.objects.all() if posts is None else posts
+        self.bound = bound
+        self.descending = descending
+
+    def _clone(self, **kwargs):
+        clone = Timeline(
+            **{
+                "user_id": self.user_id,
+                "posts": self.posts,
+                "bound": self.bound,
+                "descending": self.descending,
+                **kwargs,
+            }
+        )
+        if "celebrities" in self.__dict__:
+            clone.celebrities = self.celebrities
+        return clone
+
+    @cached_property
+    def celebrities(self):
+        return list(
+            Follow.objects.filter(
+                user_id=self.user_id,
+                author__counters__follower_count__gt=(
+                    settings.TIMELINE_FANOUT_LIMIT
+                ),
+            ).values_list("author_id", flat=True)
+        )
+
+    def order_by(self, *fields):
+        # Порядок ленты всегда (-pub_date, -id).
+        return self
+
+    def values(self, *fields):
+        return self._clone(posts=self.posts.values(*fields))
+
+    def reverse(self):
+        return self._clone(descending=not self.descending)
+
+    def seek(self, fields, operator, values):
+        """Посты после ключа values, как paginate_utils.seek."""
+        return self._clone(bound=(operator, values))
+
+    def _keys(self, queryset, fields):
+        if self.bound is not None:
+            operator, values = self.bound
+            queryset = seek(queryset, fields, operator, values)
+        if self.descending:
+            fields = [f"-{field}" for field in fields]
+        return queryset.order_by(*fields)
+
+    def entry_keys(self):
+        """Ключи (pub_date, id поста) разложенных постов."""
+        return self._keys(
+            TimelineEntry.objects.filter(user_id=self.user_id),
+            ("pub_date", "post_id"),
+        ).values_list("pub_date", "post_id")
+
+    def author_keys(self, author_id):
+        """Ключи (pub_date, id) постов знаменитости."""
+        return self._keys(
+            Post.objects.filter(author_id=author_id), ("pub_date", "pk")
+        ).values_list("pub_date", "pk")
+
+    def keys(self, limit):
+        """Первые limit ключей ленты после границы bound."""
+        sources = [list(self.entry_keys()[:limit])] + [
+            list(self.author_keys(author_id)[:limit])
+            for author_id in self.celebrities
+        ]
+        keys = []
+        seen = set()
+        # Знаменитость могла стать ею уже после раскладки своих постов.
+        for pub_date, pk in heapq.merge(*sources, reverse=self.descending):
+            if pk in seen:
+                continue
+            seen.add(pk)
+            keys.append((pub_date, pk))
+            if len(keys) == limit:
+                break
+        return keys
+
+    def count(self):
+        """Число постов ленты, не больше TIMELINE_MAX_ENTRIES."""
+        limit = settings.TIMELINE_MAX_ENTRIES
+        total = TimelineEntry.objects.filter(user_id=self.user_id).count()
+        for author_id in self.celebrities:
+            if total >= limit:
+                break
+            total += (
+                Post.objects.filter(author_id=author_id)
+                .values("pk")[:limit - total]
+                .count()
+            )
+        return min(total, limit)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        stop = index.stop
+        if stop is None:
+            stop = settings.TIMELINE_MAX_ENTRIES
+        if self.bound is None and not self.celebrities:
+            # Лента — только её строки: посты выбираются одним запросом
+            # с подзапросом ключей. У курсора так нельзя: условие seek()
+            # ссылается на имя таблицы, а в подзапросе у неё псевдоним.
+            rows = list(
+                self.posts.filter(
+                    pk__in=self.entry_keys().values("post_id")[start:stop]
+                ).order_by()
+            )
+            rows.sort(key=cursor_key, reverse=self.descending)
+            return rows
+        ids = [pk for _, pk in self.keys(stop)[start:]]
+        if not ids:
+            return []
+        rows = {
+            cursor_key(row)[1]: row
+            for row in self.posts.filter(pk__in=ids).order_by()
+        }
+        return [rows[pk] for pk in ids if pk in rows]
+
+    def __iter__(self):
+        return iter(self[:settings.TIMELINE_MAX_ENTRIES])
+
+
+def timeline_posts(user):
+    """Посты ленты подписок: разложенные заранее плюс посты знаменитостей."""
+    return Timeline(user.pk)
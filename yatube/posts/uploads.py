@@ -0,0 +1,192 @@
+"""Ограниченная загрузка картинок постов.
+
+BoundedUploadHandler пишет загрузку во временный файл кусками и перестаёт
+писать, когда файл превысил POST_IMAGE_MAX_BYTES: память воркера не
+растёт, а форма получает пометку oversized и сообщает об ошибке.
+Обработчик ставит декоратор bounded_uploads только на представления с
+PostForm: другие формы, например в админке, пометку не проверяют.
+Перед декодированием формат сверяется по сигнатуре, а размеры — по
+заголовку. Затем картинка перекодируется без метаданных, с уменьшением до
+POST_IMAGE_MAX_SIDE; у JPEG декодер сразу работает в уменьшенном
+масштабе (draft), поэтому большие фотографии не разворачиваются в памяти
+целиком. Анимации перекодируются покадрово, а их кадры вместе не должны
+быть больше POST_IMAGE_MAX_MEGAPIXELS.
+"""
+import os
+import tempfile
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import Image, ImageOps, ImageSequence
+
+SIGNATURES = (
+    (b"\xff\xd8\xff", "JPEG"),
+    (b"\x89PNG\r\n\x1a\n", "PNG"),
+    (b"GIF87a", "GIF"),
+    (b"GIF89a", "GIF"),
+)
+ORIENTATION = 0x0112
+EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "GIF": ".gif", "WEBP": ".webp"}
+SAVE_OPTIONS = {
+    "JPEG": {"quality": 90, "optimize": True},
+    "PNG": {"optimize": True},
+    "GIF": {"optimize": True},
+    "WEBP": {"quality": 90},
+}
+# Кадры анимации сохраняются целиком: GIF должен стирать предыдущий кадр,
+# иначе он просвечивает через прозрачные пиксели.
+ANIMATION_OPTIONS = {
+    "PNG": {},
+    "GIF": {"disposal": 2},
+    "WEBP": {"quality": 90},
+}
+# Из info картинки при сохранении остаётся только это; комментарии, XMP,
+# ICC-профиль и EXIF отбрасываются.
+KEPT_INFO = ("transparency",)
+
+
+class BoundedUploadHandler(TemporaryFileUploadHandler):
+    """Временный файл, запись в который обрывается на лимите размера."""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.oversized = False
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.POST_IMAGE_MAX_BYTES:
+            # Остаток запроса дочитывается, но никуда не пишется.
+            self.oversized = True
+            return None
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        upload = super().file_complete(file_size)
+        upload.oversized = self.oversized
+        return upload
+
+
+def bounded_uploads(view):
+    """Принимает файлы запросов view через BoundedUploadHandler.
+
+    Обработчики загрузки меняются до чтения тела запроса, а его читает
+    уже CsrfViewMiddleware, поэтому CSRF проверяется внутри обёртки.
+    """
+    protected = csrf_protect(view)
+
+    @csrf_exempt
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request.upload_handlers = [BoundedUploadHandler(request)]
+        return protected(request, *args, **kwargs)
+
+    return wrapper
+
+
+def sniff_format(file):
+    """Формат по первым байтам файла или None, если он не поддерживается."""
+    file.seek(0)
+    head = file.read(12)
+    file.seek(0)
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "WEBP"
+    for signature, image_format in SIGNATURES:
+        if head.startswith(signature):
+            return image_format
+    return None
+
+
+def check_image(file):
+    """Проверяет сигнатуру и размеры из заголовка; возвращает формат."""
+    image_format = sniff_format(file)
+    if image_format is None:
+        raise ValidationError(
+            "Загрузите картинку в формате JPEG, PNG, GIF или WebP."
+        )
+    limit = settings.POST_IMAGE_MAX_MEGAPIXELS * 1_000_000
+    with Image.open(file) as image:
+        width, height = image.size
+        if width * height > limit:
+            raise ValidationError(
+                "Картинка больше "
+                f"{settings.POST_IMAGE_MAX_MEGAPIXELS} мегапикселей."
+            )
+        # Кадры считаются только у картинки в пределах лимита: декодер
+        # держит в памяти один кадр.
+        if animated(image, image_format) and (
+            width * height * image.n_frames > limit
+        ):
+            raise ValidationError(
+                "Кадры анимации вместе больше "
+                f"{settings.POST_IMAGE_MAX_MEGAPIXELS} мегапикселей."
+            )
+    file.seek(0)
+    return image_format
+
+
+def animated(image, image_format):
+    # Многокадровый JPEG (MPO) сохраняется первым кадром.
+    return image_format != "JPEG" and getattr(image, "is_animated", False)
+
+
+def animation_frames(image, side):
+    """Кадры анимации в RGBA, уменьшенные до side, и их длительности."""
+    frames = []
+    durations = []
+    for frame in ImageSequence.Iterator(image):
+        durations.append(frame.info.get("duration", 100))
+        frame = frame.convert("RGBA")
+        frame.thumbnail((side, side))
+        frames.append(strip_info(frame))
+    return frames, durations
+
+
+def strip_info(image):
+    image.info = {
+        key: value for key, value in image.info.items() if key in KEPT_INFO
+    }
+    return image
+
+
+def reencode(file, image_format):
+    """Перекодирует картинку без метаданных в ограниченном размере."""
+    side = settings.POST_IMAGE_MAX_SIDE
+    output = tempfile.SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+    )
+    with Image.open(file) as image:
+        if animated(image, image_format):
+            loop = image.info.get("loop", 0)
+            frames, durations = animation_frames(image, side)
+            frames[0].save(
+                output,
+                image_format,
+                save_all=True,
+                append_images=frames[1:],
+                duration=durations,
+                loop=loop,
+                **ANIMATION_OPTIONS[image_format],
+            )
+            image = frames[0]
+        else:
+            if image_format == "JPEG":
+                image.draft("RGB", (side, side))
+            if image.getexif().get(ORIENTATION, 1) != 1:
+                image = ImageOps.exif_transpose(image)
+            image.thumbnail((side, side))
+            if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            strip_info(image).save(
+                output, image_format, **SAVE_OPTIONS[image_format]
+            )
+    output.seek(0)
+    name = os.path.splitext(os.path.basename(file.name))[0]
+    result = File(output, name=name + EXTENSIONS[image_format])
+    # Как у forms.ImageField: размеры доступны без повторного чтения.
+    result.image = image
+    return result
@@ -1,24 +1,38 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.http import (HttpResponseBadRequest, JsonResponse,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
 
+from . import search as post_search
+from .cache import (author_stamps, cache_page_for_anonymous, feed_stamps,
+                    group_stamps, post_stamps)
+from .exporter import FORMATS, KINDS, Exporter, parse_since
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from .paginate_utils import paginate_posts
+from .models import Follow, Group, Post, User, UserCounters
+from .paginate_utils import CursorPaginator
+from .read_models import paginate_feed
+from .timeline import timeline_posts
+from .uploads import bounded_uploads
 
 
+@cache_page_for_anonymous(feed_stamps)
 def index(request):
-    post_list = Post.objects.select_related("group", "author")
-    page_obj = paginate_posts(post_list, request)
+    page_obj = paginate_feed(Post.objects.all(), request, "index")
     context = {
         "page_obj": page_obj,
     }
     return render(request, "posts/index.html", context)
 
 
+@cache_page_for_anonymous(group_stamps)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.select_related("author")
-    page_obj = paginate_posts(post_list, request)
+    page_obj = paginate_feed(
+        group.posts.all(), request, "group", group.pk, group=group
+    )
     context = {
         "group": group,
         "page_obj": page_obj,
@@ -26,39 +40,83 @@ def group_posts(request, slug):
     return render(request, "posts/group_list.html", context)
 
 
+@cache_page_for_anonymous(author_stamps)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
     following = (
         request.user.is_authenticated and request.user != author
     ) and author.following.filter(user=request.user).exists()
-    posts = author.posts.select_related("group")
-    post_count = posts.count()
-    page_obj = paginate_posts(posts, request)
+    counters = UserCounters.for_user(author)
+    page_obj = paginate_feed(
+        author.posts.all(), request, "profile", author.pk, author=author
+    )
     context = {
         "author": author,
+        "counters": counters,
         "page_obj": page_obj,
-        "post_count": post_count,
+        "post_count": counters.post_count,
         "following": following,
     }
     return render(request, "posts/profile.html", context)
 
 
+def comment_page(request, post):
+    """Комментарии поста от новых к старым, страница по курсору."""
+    paginator = CursorPaginator(
+        post.comments.select_related("author"), settings.COMMENTS_PER_PAGE
+    )
+    return paginator.get_page(request.GET.get("cursor"))
+
+
+@cache_page_for_anonymous(post_stamps)
 def post_detail(request, post_id):
     post = get_object_or_404(
-        Post.objects.select_related("author").prefetch_related(
-            "comments__author"
-        ),
+        Post.objects.select_related("author", "author__counters", "group"),
         id=post_id,
     )
     context = {
         "post": post,
-        "comments": post.comments.select_related("author"),
+        "author_counters": UserCounters.for_user(post.author),
+        "comments": comment_page(request, post),
         "comment_form": CommentForm(),
     }
     return render(request, "posts/post_detail.html", context)
 
 
+@cache_page_for_anonymous(post_stamps)
+def post_comments(request, post_id):
+    """Фрагмент со следующей страницей комментариев для «Показать ещё»."""
+    post = get_object_or_404(Post.objects.only("pk"), id=post_id)
+    context = {
+        "post": post,
+        "comments": comment_page(request, post),
+    }
+    return render(request, "posts/includes/comment_list.html", context)
+
+
+@cache_page_for_anonymous(post_stamps)
+def post_comments_json(request, post_id):
+    post = get_object_or_404(Post.objects.only("pk"), id=post_id)
+    comments = comment_page(request, post)
+    return JsonResponse(
+        {
+            "results": [
+                {
+                    "id": comment.pk,
+                    "author": comment.author.username,
+                    "text": comment.text,
+                    "pub_date": comment.pub_date.isoformat(),
+                }
+                for comment in comments
+            ],
+            "next_cursor": comments.next_cursor,
+        },
+        json_dumps_params={"ensure_ascii": False},
+    )
+
+
 @login_required
+@bounded_uploads
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if not form.is_valid():
@@ -73,6 +131,7 @@ def post_create(request):
 
 
 @login_required
+@bounded_uploads
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     if request.user != post.author:
@@ -100,10 +159,7 @@ def post_delete(request, post_id):
 def add_comment(request, post_id):
     form = CommentForm(request.POST or None)
     if not form.is_valid():
-        context = {
-            "form": form,
-        }
-        return render(request, ("posts:post_detail", post_id), context)
+        return redirect("posts:post_detail", post_id=post_id)
     comment = form.save(commit=False)
     comment.author = request.user
     comment.post = get_object_or_404(Post, pk=post_id)
@@ -113,10 +169,9 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.select_related("author").filter(
-        author__following__user=request.user
+    page_obj = paginate_feed(
+        timeline_posts(request.user), request, "follow", request.user.pk
     )
-    page_obj = paginate_posts(post_list, request)
     context = {
         "page_obj": page_obj,
     }
@@ -137,3 +192,95 @@ def profile_unfollow(request, username):
         Follow, user=request.user, author__username=username
     ).delete()
     return redirect("posts:profile", username=username)
+
+
+def search_results(request):
+    """Страница поиска по GET-параметрам q, group, author и cursor."""
+    query = request.GET.get("q", "").strip()
+    group = author = None
+    filters = {}
+    if request.GET.get("group"):
+        group = Group.objects.filter(slug=request.GET["group"]).first()
+        filters["group_id"] = group.pk if group else 0
+    if request.GET.get("author"):
+        author = User.objects.filter(username=request.GET["author"]).first()
+        filters["author_id"] = author.pk if author else 0
+    page = post_search.search_posts(
+        query, cursor=request.GET.get("cursor"), **filters
+    )
+    next_url = None
+    if page.has_next():
+        params = request.GET.copy()
+        params["cursor"] = page.next_cursor
+        next_url = f"{request.path}?{params.urlencode()}"
+    return {
+        "query": query,
+        "group": group,
+        "author": author,
+        "page_obj": page,
+        "next_url": next_url,
+    }
+
+
+def search(request):
+    context = search_results(request)
+    context["groups"] = Group.objects.all()
+    return render(request, "posts/search.html", context)
+
+
+def search_json(request):
+    context = search_results(request)
+    results = [
+        {
+            "id": post.pk,
+            "text": post.text,
+            "author": post.author.username,
+            "group": post.group.slug if post.group else None,
+            "pub_date": post.pub_date.isoformat(),
+            "rank": post.search_rank,
+            "url": request.build_absolute_uri(
+                reverse("posts:post_detail", args=(post.pk,))
+            ),
+        }
+        for post in context["page_obj"]
+    ]
+    return JsonResponse(
+        {
+            "results": results,
+            "next_cursor": context["page_obj"].next_cursor,
+            "next": context["next_url"],
+        },
+        json_dumps_params={"ensure_ascii": False},
+    )
+
+
+@staff_member_required
+def export(request):
+    """Потоковая выгрузка для аналитики: kinds, format, gzip и since."""
+    kinds = request.GET.get("kinds", ",".join(KINDS)).split(",")
+    data_format = request.GET.get("format", "ndjson")
+    if data_format not in FORMATS or not set(kinds) <= set(KINDS):
+        return HttpResponseBadRequest("Неверный формат или тип записей")
+    since = None
+    if request.GET.get("since"):
+        try:
+            since = parse_since(request.GET["since"])
+        except ValueError as error:
+            return HttpResponseBadRequest(str(error))
+    compress = request.GET.get("gzip") == "1"
+    exporter = Exporter(
+        kinds=kinds, data_format=data_format, since=since, compress=compress
+    )
+    filename = f"yatube.{data_format}" + (".gz" if compress else "")
+    response = StreamingHttpResponse(
+        exporter.chunks(),
+        content_type=(
+            "application/gzip"
+            if compress
+            else "text/csv; charset=utf-8"
+            if data_format == "csv"
+            else "application/x-ndjson; charset=utf-8"
+        ),
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -16,14 +16,59 @@ ALLOWED_HOSTS = [
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
-CACHES = {
-    "default": {
+
+# Кэш выбирается переменной окружения YATUBE_CACHE:
+# locmem (по умолчанию, отдельный у каждого процесса), file, db
+# (нужен manage.py createcachetable), memcached (python-memcached),
+# redis (django-redis) или two-tier — LRU в памяти процесса перед общим
+# кэшем, заданным YATUBE_SHARED_CACHE (db, memcached или redis: общему
+# кэшу нужен атомарный add).
+CACHE_LOCATION = os.environ.get("YATUBE_CACHE_LOCATION")
+SHARED_CACHES = {
+    "locmem": {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-    }
+    },
+    "file": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": CACHE_LOCATION or os.path.join(BASE_DIR, "cache"),
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+    "db": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": CACHE_LOCATION or "yatube_cache",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+    "memcached": {
+        "BACKEND": "django.core.cache.backends.memcached.MemcachedCache",
+        "LOCATION": CACHE_LOCATION or "127.0.0.1:11211",
+    },
+    "redis": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": CACHE_LOCATION or "redis://127.0.0.1:6379/1",
+    },
 }
+CACHE_BACKEND = os.environ.get("YATUBE_CACHE", "locmem")
+if CACHE_BACKEND == "two-tier":
+    CACHES = {
+        "default": {
+            "BACKEND": "core.cache_backends.TwoTierCache",
+            "OPTIONS": {
+                "SHARED": "shared",
+                "LOCAL_MAX_ENTRIES": 1000,
+                "LOCAL_TIMEOUT": 5,
+                "SYNC_INTERVAL": 0.5,
+            },
+        },
+        "shared": SHARED_CACHES[
+            os.environ.get("YATUBE_SHARED_CACHE", "db")
+        ],
+    }
+else:
+    CACHES = {"default": SHARED_CACHES[CACHE_BACKEND]}
 
 INSTALLED_APPS = [
     "about.apps.AboutConfig",
+    "api.apps.ApiConfig",
     "core.apps.CoreConfig",
     "posts.apps.PostsConfig",
     "users.apps.UsersConfig",
@@ -39,10 +84,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "core.middleware.QueryInspectMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.middleware.ProfileMiddleware",
+    "core.middleware.TemplateTimingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -115,3 +163,127 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
 # Paginator settings
 PAGINATION_ITEMS_PER_PAGE = 10
+# Режим пагинации для каждой ленты: "numbered" (номера страниц)
+# или "cursor" (переход по курсору без COUNT(*) и OFFSET)
+PAGINATION_MODES = {
+    "index": "numbered",
+    "group": "numbered",
+    "profile": "numbered",
+    "follow": "numbered",
+}
+# Сколько секунд доверять закэшированному числу постов ленты
+# (0 — считать COUNT(*) на каждый запрос)
+PAGINATION_COUNT_TIMEOUTS = {
+    "index": 300,
+    "group": 300,
+    "profile": 300,
+    # Число постов ленты подписок сбрасывается при раскладке в неё, но не
+    # при новых постах знаменитостей
+    "follow": 60,
+}
+# Сколько номеров страниц показывать по обе стороны от текущей
+PAGINATION_PAGE_WINDOW = 2
+# Комментарии поста: сколько новых выводить сразу и догружать кнопкой
+# «Показать ещё»
+COMMENTS_PER_PAGE = 20
+# JSON API (api): размер страницы по умолчанию и наибольший ?limit=
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+
+# Лента подписок: сколько постов хранить в ленте каждого пользователя
+TIMELINE_MAX_ENTRIES = 1000
+# При большем числе подписчиков посты автора не раскладываются по лентам,
+# а подмешиваются при чтении
+TIMELINE_FANOUT_LIMIT = 10000
+
+# Кэш страниц для анонимных посетителей. Копии сбрасываются сигналами
+# изменения постов, групп и комментариев, а таймаут лишь освобождает место
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Картинки постов в шаблонах: рамка geometry, ширины вариантов для srcset
+# и атрибут sizes. Варианты (WebP, если Pillow его поддерживает, и JPEG)
+# готовит posts.thumbnails при первом показе поста или воркер
+# process_thumbnails, см. POST_THUMBNAIL_WORKER
+POST_THUMBNAILS = {
+    "card": {
+        "geometry": "450x450",
+        "widths": (240, 360, 450),
+        "sizes": "(min-width: 768px) 33vw, 100vw",
+        "options": {"crop": "center"},
+    },
+    "detail": {
+        "geometry": "960x339",
+        "widths": (480, 720, 960),
+        "sizes": "(min-width: 768px) 75vw, 100vw",
+        "options": {"crop": "center", "upscale": True},
+    },
+}
+# False — недостающие варианты готовятся при первом показе поста, в потоке
+# запроса. True — вместо них выводится заглушка, а пост попадает в очередь
+# ThumbnailJob; тогда рядом с сайтом должен работать воркер
+# `python manage.py process_thumbnails`, иначе картинки не появятся
+POST_THUMBNAIL_WORKER = os.environ.get("YATUBE_THUMBNAIL_WORKER") == "1"
+# Сколько секунд не ставить повторную задачу для того же поста
+POST_THUMBNAIL_PENDING_TIMEOUT = 60
+# Через сколько секунд задача зависшего воркера снова доступна другим
+POST_THUMBNAIL_CLAIM_TIMEOUT = 5 * 60
+POST_THUMBNAIL_MAX_ATTEMPTS = 3
+
+# Загрузка картинок постов (posts.uploads): в формах постов файл пишется
+# во временный файл кусками, больше POST_IMAGE_MAX_BYTES не принимается;
+# картинки больше POST_IMAGE_MAX_MEGAPIXELS (у анимаций — все кадры
+# вместе) отклоняются до декодирования, остальные перекодируются без
+# метаданных с уменьшением до POST_IMAGE_MAX_SIDE
+POST_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+POST_IMAGE_MAX_MEGAPIXELS = 40
+POST_IMAGE_MAX_SIDE = 2048
+
+# Поиск (posts.search): auto — FTS5, если SQLite его поддерживает, иначе
+# встроенный обратный индекс; fts5 или index — выбрать явно. После смены
+# бэкенда нужна команда rebuild_search_index
+SEARCH_BACKEND = "auto"
+
+# Админка (posts.admin): в режиме производительности внешние ключи
+# выбираются автокомплитом, а число записей без фильтров кэшируется на
+# ADMIN_COUNT_TIMEOUT секунд
+ADMIN_PERFORMANCE_MODE = True
+ADMIN_COUNT_TIMEOUT = 60
+
+# Учёт SQL (core.middleware): у какой доли запросов считать число и время
+# запросов к базе (заголовок Server-Timing) и искать N+1 — отпечаток SQL,
+# повторившийся SQL_INSPECT_REPEAT_THRESHOLD раз, пишется в лог
+SQL_INSPECT_SAMPLE_RATE = float(
+    os.environ.get("YATUBE_SQL_SAMPLE_RATE", 1 if DEBUG else 0.01)
+)
+SQL_INSPECT_REPEAT_THRESHOLD = 5
+
+# Профили запросов (core.profiling): персонал включает профиль заголовком
+# X-Profile или параметром ?profile, остальные запросы профилируются с
+# вероятностью PROFILE_SAMPLE_RATE. Стеки снимаются раз в PROFILE_INTERVAL
+# секунд, в PROFILE_DIR хранятся PROFILE_MAX_FILES последних профилей
+PROFILE_SAMPLE_RATE = float(os.environ.get("YATUBE_PROFILE_SAMPLE_RATE", 0))
+PROFILE_INTERVAL = 0.001
+PROFILE_DIR = os.path.join(BASE_DIR, "profiles")
+PROFILE_MAX_FILES = 200
+
+# Время отрисовки (core.template_timing): у какой доли запросов мерить
+# шаблоны и include, теги TEMPLATE_TIMING_TAGS и фильтры
+# TEMPLATE_TIMING_FILTERS. Итоги по представлениям — на /profiles/templates/
+TEMPLATE_TIMING_SAMPLE_RATE = float(
+    os.environ.get("YATUBE_TEMPLATE_SAMPLE_RATE", 1 if DEBUG else 0.01)
+)
+TEMPLATE_TIMING_TAGS = ("post_cards", "post_picture", "thumbnail", "cache")
+TEMPLATE_TIMING_FILTERS = ("addclass", "uglify", "linebreaks")
+
+# Кэш карточек постов (posts.cards): ключ включает Post.updated_at, так что
+# таймаут только освобождает место. Версию нужно увеличить при изменении
+# шаблона posts/includes/post_card.html
+POST_CARD_CACHE_TIMEOUT = 24 * 60 * 60
+POST_CARD_CACHE_VERSION = 2
+
+# Разметка текста постов и комментариев (posts.markup): plain — абзацы и
+# переносы строк, markdown — Markdown (нужен пакет Markdown). HTML
+# готовится при сохранении, в карточке выводятся первые POST_PREVIEW_CHARS
+# символов. После смены разметки нужна команда render_texts --all
+POST_MARKUP = os.environ.get("YATUBE_POST_MARKUP", "plain")
+POST_PREVIEW_CHARS = 500